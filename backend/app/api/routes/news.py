@@ -4,7 +4,7 @@ API routes for news data.
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 
-from app.core.news_service import news_service
+from app.services.news_service import news_service
 from app.schemas.news import NewsResponse
 
 router = APIRouter()
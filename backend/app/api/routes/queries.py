@@ -2,16 +2,28 @@
 API routes for handling client queries.
 """
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional
 import uuid
 from datetime import datetime
 import json
 
-from app.schemas.query import QueryRequest, QueryResponse, CardData, QueryType
-from app.core.polygon_service import polygon_service
-from app.core.news_service import news_service
+from app.schemas.query import QueryRequest, QueryResponse, CardData, QueryType, StockQuery
+from app.services.bar_store import ms_to_date
+from app.services.config import (
+    QUERY_CHART_DEADLINE_SECONDS,
+    QUERY_NEWS_DEADLINE_SECONDS,
+    QUERY_PRICE_DEADLINE_SECONDS,
+)
+from app.services.fan_out import Source, fan_out, gather_sources
+from app.services.stock_service import stock_service
+from app.services.news_service import news_service
 
 router = APIRouter()
 
+# Order of the cards in a stock query response
+STOCK_SOURCES = ("price", "chart", "news")
+
 @router.post("/process", response_model=QueryResponse)
 async def process_query(query: QueryRequest):
     """Process a client query and return relevant data."""
@@ -31,8 +43,26 @@ async def process_query(query: QueryRequest):
             cards=[]
         )
 
+@router.post("/process/stream")
+async def stream_query(query: QueryRequest):
+    """
+    Process a client query, streaming each card as NDJSON as soon as it is ready.
+
+    For stock queries every source is sent on its own line when it completes;
+    a source that fails or misses its deadline is sent as
+    {"source": ..., "error": ...}.
+    """
+    if query.query_type == QueryType.STOCK and (not query.stock_data or not query.stock_data.ticker):
+        raise HTTPException(status_code=400, detail="No ticker symbol provided")
+    return StreamingResponse(_query_lines(query), media_type="application/x-ndjson")
+
 async def process_stock_query(query: QueryRequest) -> QueryResponse:
-    """Process a stock-specific query."""
+    """
+    Process a stock-specific query.
+
+    Price, chart and news are fetched concurrently, each with its own
+    deadline. Sources that miss it are left out and named in the message.
+    """
     if not query.stock_data or not query.stock_data.ticker:
         return QueryResponse(
             success=False,
@@ -41,98 +71,119 @@ async def process_stock_query(query: QueryRequest) -> QueryResponse:
         )
     
     ticker = query.stock_data.ticker.upper()
+    results = await gather_sources(_stock_sources(ticker, query.stock_data))
     cards = []
-    
-    # Get stock price
-    try:
-        price_data = await polygon_service.get_stock_price(ticker)
-        if "error" not in price_data and price_data.get("results"):
-            result = price_data["results"][0]
-            close_price = result.get("c", 0)
-            prev_close = result.get("o", close_price)
-            change = close_price - prev_close
-            change_percent = (change / prev_close) * 100 if prev_close else 0
-            
-            cards.append(CardData(
-                id=str(uuid.uuid4()),
-                type="stock_price",
-                title=f"{ticker} Price Update",
-                content=f"Current price: ${close_price:.2f} ({'+' if change >= 0 else ''}{change:.2f}, {'+' if change_percent >= 0 else ''}{change_percent:.2f}%)",
-                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ticker=ticker,
-                price_data={
-                    "price": close_price,
-                    "change": round(change, 2),
-                    "change_percent": round(change_percent, 2)
-                }
-            ))
-    except Exception as e:
-        print(f"Error getting stock price: {str(e)}")
-    
-    # Get chart data
-    try:
-        timespan = query.stock_data.timespan or "day"
-        from_date = query.stock_data.from_date
-        to_date = query.stock_data.to_date
-        
-        chart_data = await polygon_service.get_stock_chart_data(ticker, timespan, from_date, to_date)
-        if "error" not in chart_data and chart_data.get("results"):
-            formatted_data = []
-            for point in chart_data["results"]:
-                formatted_data.append({
-                    "timestamp": point.get("t"),
-                    "open": point.get("o"),
-                    "high": point.get("h"),
-                    "low": point.get("l"),
-                    "close": point.get("c"),
-                    "volume": point.get("v")
-                })
-            
-            cards.append(CardData(
-                id=str(uuid.uuid4()),
-                type="chart",
-                title=f"{ticker} Price Chart",
-                content=f"Price chart for {ticker} over the past 30 days",
-                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ticker=ticker,
-                chart_data=formatted_data
-            ))
-    except Exception as e:
-        print(f"Error getting chart data: {str(e)}")
-    
-    # Get news
-    try:
-        news_data = await news_service.get_stock_news(ticker)
-        if "error" not in news_data and news_data.get("articles"):
-            articles = news_data["articles"][:5]  # Limit to 5 articles
-            formatted_articles = []
-            
-            for article in articles:
-                formatted_articles.append({
-                    "title": article.get("title", ""),
-                    "source": article.get("source", {}).get("name", ""),
-                    "url": article.get("url", ""),
-                    "publishedAt": article.get("publishedAt", ""),
-                    "urlToImage": article.get("urlToImage", "")
-                })
-            
-            cards.append(CardData(
-                id=str(uuid.uuid4()),
-                type="news",
-                title=f"Latest {ticker} News",
-                content=f"Recent news articles about {ticker}",
-                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ticker=ticker,
-                news=formatted_articles
-            ))
-    except Exception as e:
-        print(f"Error getting news data: {str(e)}")
+    for name in STOCK_SOURCES:
+        card = _stock_card(ticker, name, results[name])
+        if card is not None:
+            cards.append(card)
+    missed = [name for name in STOCK_SOURCES if results[name].get("timed_out")]
     
     return QueryResponse(
         success=True,
+        message=f"Timed out: {', '.join(missed)}" if missed else None,
         cards=cards
     )
 
+async def _query_lines(query: QueryRequest) -> AsyncIterator[str]:
+    if query.query_type != QueryType.STOCK:
+        response = await process_query(query)
+        for card in response.cards:
+            yield card.model_dump_json() + "\n"
+        return
+    ticker = query.stock_data.ticker.upper()
+    async for name, result in fan_out(_stock_sources(ticker, query.stock_data)):
+        card = _stock_card(ticker, name, result)
+        if card is not None:
+            yield card.model_dump_json() + "\n"
+        elif "error" in result:
+            yield json.dumps({"source": name, "error": result["error"]}) + "\n"
+
+def _stock_sources(ticker: str, stock_data: StockQuery) -> List[Source]:
+    timespan = stock_data.timespan or "day"
+    return [
+        Source("price", lambda: stock_service.get_stock_price(ticker), QUERY_PRICE_DEADLINE_SECONDS),
+        Source(
+            "chart",
+            lambda: stock_service.get_stock_chart_data(ticker, timespan, stock_data.from_date, stock_data.to_date),
+            QUERY_CHART_DEADLINE_SECONDS,
+        ),
+        Source("news", lambda: news_service.get_stock_news(ticker), QUERY_NEWS_DEADLINE_SECONDS),
+    ]
+
+def _stock_card(ticker: str, name: str, result: Dict[str, Any]) -> Optional[CardData]:
+    """Build the card for one source's result, or None if it has nothing to show."""
+    if "error" in result:
+        return None
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    if name == "price" and result.get("results"):
+        price = result["results"][0]
+        close_price = price.get("c", 0)
+        prev_close = price.get("o", close_price)
+        change = close_price - prev_close
+        change_percent = (change / prev_close) * 100 if prev_close else 0
+        # The bar is the last completed trading day's, not a live quote
+        label = f"Close on {ms_to_date(price['t'])}" if price.get("t") else "Last close"
+        return CardData(
+            id=str(uuid.uuid4()),
+            type="stock_price",
+            title=f"{ticker} Price Update",
+            content=f"{label}: ${close_price:.2f} ({'+' if change >= 0 else ''}{change:.2f}, {'+' if change_percent >= 0 else ''}{change_percent:.2f}%)",
+            timestamp=timestamp,
+            ticker=ticker,
+            price_data={
+                "price": close_price,
+                "change": round(change, 2),
+                "change_percent": round(change_percent, 2)
+            }
+        )
+    
+    if name == "chart" and result.get("results"):
+        formatted_data = []
+        for point in result["results"]:
+            formatted_data.append({
+                "timestamp": point.get("t"),
+                "open": point.get("o"),
+                "high": point.get("h"),
+                "low": point.get("l"),
+                "close": point.get("c"),
+                "volume": point.get("v")
+            })
+        return CardData(
+            id=str(uuid.uuid4()),
+            type="chart",
+            title=f"{ticker} Price Chart",
+            content=f"Price chart for {ticker} over the past 30 days",
+            timestamp=timestamp,
+            ticker=ticker,
+            chart_data=formatted_data
+        )
+    
+    if name == "news" and result.get("articles"):
+        articles = result["articles"][:5]  # Limit to 5 articles
+        formatted_articles = []
+        
+        for article in articles:
+            formatted_articles.append({
+                "title": article.get("title", ""),
+                "source": article.get("source", {}).get("name", ""),
+                "url": article.get("url", ""),
+                "publishedAt": article.get("publishedAt", ""),
+                "urlToImage": article.get("urlToImage", "")
+            })
+        return CardData(
+            id=str(uuid.uuid4()),
+            type="news",
+            title=f"Latest {ticker} News",
+            content=f"Recent news articles about {ticker}",
+            timestamp=timestamp,
+            ticker=ticker,
+            news=formatted_articles
+        )
+    
+    return None
+
 async def process_market_query(query: QueryRequest) -> QueryResponse:
     """Process a market-related query."""
     cards = []
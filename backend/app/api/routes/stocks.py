@@ -2,19 +2,25 @@
 API routes for stock data.
 """
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
-from datetime import datetime, timedelta
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import json
 import uuid
 
-from app.core.polygon_service import polygon_service
-from app.schemas.stock import StockChartData, StockPriceData, StockTickerSearchResults
+from app.services.config import STOCK_BATCH_MAX_ITEMS
+from app.services.downsampling import MIN_POINTS
+from app.services.stock_batch import BatchItem, stream_batch
+from app.services.stock_service import stock_service
+from app.services.ticker_resolver import ticker_resolver
+from app.schemas.stock import StockBatchRequest, StockChartData, StockPriceData, StockTickerSearchResults
 
 router = APIRouter()
 
 @router.get("/price/{ticker}", response_model=StockPriceData)
 async def get_stock_price(ticker: str):
     """Get current stock price for a ticker."""
-    response = await polygon_service.get_stock_price(ticker.upper())
+    response = await stock_service.get_stock_price(ticker.upper())
     
     if "error" in response:
         raise HTTPException(status_code=400, detail=response["error"])
@@ -22,21 +28,12 @@ async def get_stock_price(ticker: str):
     if not response.get("results"):
         raise HTTPException(status_code=404, detail=f"No data found for ticker {ticker}")
     
-    # Extract the latest price data
     result = response["results"][0]
-    
-    # Calculate change and percentage change
-    close_price = result.get("c", 0)
-    prev_close = result.get("o", close_price)  # Use open as previous if available
-    change = close_price - prev_close
-    change_percent = (change / prev_close) * 100 if prev_close else 0
-    
     return StockPriceData(
         ticker=ticker.upper(),
-        price=close_price,
-        change=round(change, 2),
-        change_percent=round(change_percent, 2),
-        timestamp=datetime.now()
+        # The close is as of its bar, which may be days old around weekends and holidays
+        timestamp=datetime.fromtimestamp(result["t"] / 1000, tz=timezone.utc) if result.get("t") else datetime.now(),
+        **_price_fields(result)
     )
 
 @router.get("/chart/{ticker}", response_model=StockChartData)
@@ -44,20 +41,25 @@ async def get_stock_chart(
     ticker: str,
     timespan: str = Query("day", description="Timespan unit: minute, hour, day, week, month, quarter, year"),
     from_date: Optional[str] = None,
-    to_date: Optional[str] = None
+    to_date: Optional[str] = None,
+    max_points: Optional[int] = Query(
+        None, ge=0, description=f"Most points to return, downsampled server-side; 0 returns every bar, otherwise at least {MIN_POINTS}"
+    )
 ):
     """Get historical stock data for charting."""
+    _check_max_points(max_points)
     # Set default dates if not provided
     if not to_date:
         to_date = datetime.now().strftime("%Y-%m-%d")
     if not from_date:
         from_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
     
-    response = await polygon_service.get_stock_chart_data(
+    response = await stock_service.get_stock_chart_data(
         ticker.upper(), 
         timespan, 
         from_date, 
-        to_date
+        to_date,
+        max_points
     )
     
     if "error" in response:
@@ -67,16 +69,7 @@ async def get_stock_chart(
         raise HTTPException(status_code=404, detail=f"No chart data found for ticker {ticker}")
     
     # Format the data for the chart
-    chart_points = []
-    for point in response["results"]:
-        chart_points.append({
-            "timestamp": point.get("t"),
-            "open": point.get("o"),
-            "high": point.get("h"),
-            "low": point.get("l"),
-            "close": point.get("c"),
-            "volume": point.get("v")
-        })
+    chart_points = [_chart_point(point) for point in response["results"]]
     
     return StockChartData(
         ticker=ticker.upper(),
@@ -86,16 +79,133 @@ async def get_stock_chart(
         data=chart_points
     )
 
+@router.get("/chart/{ticker}/stream")
+async def stream_stock_chart(
+    ticker: str,
+    timespan: str = Query("day", description="Timespan unit: minute, hour, day, week, month, quarter, year"),
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None
+):
+    """
+    Stream every bar in a range as NDJSON, one chart point per line.
+
+    Bars are sent as Polygon pages download, so ranges of any length are served
+    with bounded memory. A failure after the first line ends the stream with an
+    {"error": ...} line.
+    """
+    batches = stock_service.stream_aggregates(ticker.upper(), 1, timespan, from_date, to_date)
+    # Pull the first batch here so that early failures still get a status code
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=404, detail=f"No chart data found for ticker {ticker}")
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(_chart_lines(first, batches), media_type="application/x-ndjson")
+
+@router.post("/batch")
+async def get_stock_batch(request: StockBatchRequest):
+    """
+    Get prices and chart data for many tickers at once, streamed as NDJSON.
+
+    Duplicate tickers and ranges are fetched once and the rest are fetched
+    concurrently. Each line answers one item, in the order items complete:
+    its index in the request, the ticker and range, and "price" and "data"
+    (chart points) or an "error" for either.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No tickers requested")
+    if len(request.items) > STOCK_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {STOCK_BATCH_MAX_ITEMS} items per batch"
+        )
+    for item in request.items:
+        _check_max_points(item.max_points)
+    items = [BatchItem(**item.model_dump()) for item in request.items]
+    results = stream_batch(items, request.include_price, request.include_bars)
+    return StreamingResponse(_batch_lines(items, results), media_type="application/x-ndjson")
+
+def _check_max_points(max_points: Optional[int]) -> None:
+    # 0 means every bar; a chart cannot be downsampled to fewer than MIN_POINTS
+    if max_points is not None and (max_points < 0 or 0 < max_points < MIN_POINTS):
+        raise HTTPException(
+            status_code=400, detail=f"max_points must be 0 (every bar) or at least {MIN_POINTS}"
+        )
+
+def _price_fields(result: Dict[str, Any]) -> Dict[str, float]:
+    # Calculate change and percentage change
+    close_price = result.get("c", 0)
+    prev_close = result.get("o", close_price)  # Use open as previous if available
+    change = close_price - prev_close
+    change_percent = (change / prev_close) * 100 if prev_close else 0
+    return {
+        "price": close_price,
+        "change": round(change, 2),
+        "change_percent": round(change_percent, 2)
+    }
+
+async def _batch_lines(items: List[BatchItem], results: AsyncIterator[Tuple[List[int], Dict[str, Any]]]) -> AsyncIterator[str]:
+    try:
+        async for indices, result in results:
+            body: Dict[str, Any] = {}
+            if "price" in result:
+                price = result["price"]
+                if "error" in price:
+                    body["price"] = {"error": price["error"]}
+                elif price.get("results"):
+                    body["price"] = _price_fields(price["results"][0])
+                else:
+                    body["price"] = {"error": "No price data found"}
+            if "bars" in result:
+                bars = result["bars"]
+                if "error" in bars:
+                    body["data"] = {"error": bars["error"]}
+                else:
+                    body["data"] = [_chart_point(point) for point in bars.get("results") or []]
+            lines = []
+            for index in indices:
+                item = items[index]
+                lines.append(json.dumps({
+                    "index": index,
+                    "ticker": item.ticker.upper(),
+                    "timespan": item.timespan,
+                    "from_date": item.from_date,
+                    "to_date": item.to_date,
+                    **body
+                }))
+            yield "\n".join(lines) + "\n"
+    finally:
+        await results.aclose()
+
+def _chart_point(point: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "timestamp": point.get("t"),
+        "open": point.get("o"),
+        "high": point.get("h"),
+        "low": point.get("l"),
+        "close": point.get("c"),
+        "volume": point.get("v")
+    }
+
+async def _chart_lines(first: List[Dict[str, Any]], batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[str]:
+    try:
+        yield "".join(json.dumps(_chart_point(point)) + "\n" for point in first)
+        async for points in batches:
+            yield "".join(json.dumps(_chart_point(point)) + "\n" for point in points)
+    except (RuntimeError, ValueError) as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+    finally:
+        await batches.aclose()
+
 @router.get("/search", response_model=StockTickerSearchResults)
-async def search_tickers(query: str = Query(..., min_length=1)):
-    """Search for stock tickers."""
-    response = await polygon_service.search_ticker(query)
-    
-    if "error" in response:
-        raise HTTPException(status_code=400, detail=response["error"])
-    
+async def search_tickers(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Search for stock tickers by symbol, company name or misspelled name."""
     results = []
-    for item in response.get("results", []):
+    for item in ticker_resolver.search(query, limit):
         results.append({
             "ticker": item.get("ticker"),
             "name": item.get("name"),
@@ -1,5 +1,4 @@
 import asyncio
-import base64
 import json
 import logging
 from fastapi import (
@@ -8,20 +7,42 @@ from fastapi import (
     WebSocketDisconnect,
     HTTPException,
     Path,
+    Query,
 )
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import urllib.parse
 
+from app.api.api import api_router
 from app.twilio_transcriber import TwilioTranscriber
-from app.websocket_manager import connect, disconnect, send_card
+from app.media_ingest import MediaIngest, sniff_event
+from app.media_recording import open_recorder
+from app.websocket_manager import connect, disconnect, handle_message, send_card
 from app.services.profile_service import ProfileService
 from app.services.portfolio_service import PortfolioService
 from app.services.buckets_service import BucketsService
-from app.services.summary_service import summary_service
+from app.session_registry import session_registry
+from app.transcript_pipeline import transcript_pipeline
+from app.services.intent_cache import intent_cache
+from app.services.bar_store import bar_store
+from app.services.call_warmup import warmup_stats
+from app.services.daily_snapshot import daily_snapshot
+from app.services.fan_out import fan_out_stats
+from app.services.http_client import http_client
+from app.services.key_cycling_service import polygon_key_service
+from app.services.llm_gateway import llm_gateway
+from app.services.news_service import news_service
+from app.services.price_feed import price_feed
+from app.services.stock_service import stock_service
+from app.services.config import (
+    DAILY_SNAPSHOT_ENABLED,
+    HTTP_PREWARM_ENABLED,
+    MEDIA_RECORD_DIR,
+    TRANSCRIBER_MODE,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -45,6 +66,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stock, news and query routes
+app.include_router(api_router, prefix="/api")
+
 # Initialize profile service
 profile_service = ProfileService()
 portfolio_service = PortfolioService()
@@ -59,6 +83,40 @@ BUCKETS_PATH = os.path.join(
     os.path.dirname(__file__), "database", "buckets.json"
 )
 
+# Transcriber used for /media calls; replays swap in a scripted stand-in
+if TRANSCRIBER_MODE == "scripted":
+    from app.media_replay import ScriptedTranscriber
+
+    transcriber_factory = ScriptedTranscriber
+else:
+    transcriber_factory = TwilioTranscriber
+
+
+@app.on_event("startup")
+async def start_transcript_pipeline():
+    intent_cache.load()
+    await http_client.start()
+    if HTTP_PREWARM_ENABLED:
+        # Open upstream connections without holding up startup
+        asyncio.create_task(http_client.warm())
+    transcript_pipeline.start()
+    session_registry.start()
+    if DAILY_SNAPSHOT_ENABLED:
+        daily_snapshot.start()
+    news_service.start()
+
+
+@app.on_event("shutdown")
+async def stop_transcript_pipeline():
+    await transcript_pipeline.stop()
+    await session_registry.stop()
+    await daily_snapshot.stop()
+    await price_feed.stop()
+    await news_service.stop()
+    intent_cache.save()
+    await llm_gateway.close()
+    await http_client.close()
+
 
 @app.get("/api/health")
 async def health_check():
@@ -68,6 +126,30 @@ async def health_check():
     )
 
 
+@app.get("/api/metrics", response_model=Dict[str, Any])
+async def get_metrics():
+    """
+    Report runtime metrics for the transcript pipeline and call sessions
+    """
+    return {
+        "transcript_pipeline": transcript_pipeline.stats(),
+        "sessions": session_registry.stats(),
+        "llm": llm_gateway.stats(),
+        "http": http_client.stats(),
+        "bar_store": bar_store.stats(),
+        "polygon_keys": polygon_key_service.stats(),
+        "call_warmup": warmup_stats.stats(),
+        "daily_snapshot": daily_snapshot.stats(),
+        "price_feed": price_feed.stats(),
+        "fan_out": fan_out_stats.stats(),
+        "news": news_service.stats(),
+        "single_flight": {
+            "polygon": stock_service.single_flight.stats(),
+            "news": news_service.single_flight.stats(),
+        },
+    }
+
+
 @app.get("/api/portfolio/", response_model=Dict[str, Any])
 async def get_preloaded_portfolio():
     """
@@ -75,7 +157,7 @@ async def get_preloaded_portfolio():
     """
     try:
         portfolio = portfolio_service.load_portfolio(PORTFOLIOS_PATH)
-        return portfolio
+        return portfolio_service.with_latest_closes(portfolio)
     except Exception as e:
         logger.error(f"Error retrieving portfolio: {str(e)}")
         raise HTTPException(
@@ -128,12 +210,30 @@ async def get_buckets():
 
 
 @app.get("/api/summary", response_model=Dict[str, Any])
-async def get_meeting_summary():
+async def get_meeting_summary(
+    session_id: Optional[str] = Query(
+        None,
+        description="Session id, Twilio streamSid or callSid (defaults to the latest call)",
+    )
+):
     """
-    Generate and retrieve a summary of the current conversation
+    Generate and retrieve a summary of a call's conversation
     """
+    session = (
+        session_registry.get(session_id)
+        if session_id
+        else session_registry.latest()
+    )
+    if not session:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Session '{session_id}' not found"
+            if session_id
+            else "No call session available",
+        )
+
     try:
-        summary = await summary_service.generate_meeting_summary()
+        summary = await session.summary.generate_meeting_summary()
         return summary
     except Exception as e:
         logger.error(f"Error generating meeting summary: {str(e)}")
@@ -145,13 +245,15 @@ async def get_meeting_summary():
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await connect(websocket)
+    await connect(websocket, websocket.query_params.get("session_id"))
     try:
         while True:
-            # Keep connection open
+            # Price subscriptions for the cards on screen
             data = await websocket.receive_text()
-            # You can handle any incoming messages here
+            await handle_message(websocket, data)
     except WebSocketDisconnect:
+        pass
+    finally:
         disconnect(websocket)
 
 
@@ -159,28 +261,55 @@ async def websocket_endpoint(websocket: WebSocket):
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     transcriber = None
+    session = None
+    ingest = None
+    recorder = None
 
     try:
         logger.info("WebSocket connection established")
 
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
-            event_type = message.get("event")
+
+            # Media frames are sniffed and decoded without a full JSON parse
+            message = None
+            event_type = sniff_event(data)
+            if event_type != "media":
+                message = json.loads(data)
+                event_type = message.get("event")
+                if recorder:
+                    recorder.record_text(data)
 
             if event_type == "connected":
-                # Initialize the transcriber when the client connects
-                transcriber = TwilioTranscriber()
+                # Initialize the session and transcriber when the client connects
+                session = session_registry.create()
+                recorder = open_recorder(MEDIA_RECORD_DIR, session.session_id)
+                if recorder:
+                    recorder.record_text(data)
+                if session.warmup is not None:
+                    # Fetch the client's holdings while the call is set up
+                    session.warmup.start()
+                transcriber = transcriber_factory(session)
                 transcriber.connect()
+                ingest = MediaIngest(
+                    transcriber.stream_chunk,
+                    tap=recorder.record_media if recorder else None,
+                )
                 logger.info("Transcriber connected")
-                transcriber.send_start()
+                await transcriber.send_start()
 
             elif event_type == "start":
                 logger.info("Transcription started")
-                # Any additional start logic can go here
+                if session:
+                    start = message.get("start", {})
+                    session_registry.bind(
+                        session,
+                        stream_sid=message.get("streamSid") or start.get("streamSid"),
+                        call_sid=start.get("callSid"),
+                    )
 
             elif event_type == "media":
-                if not transcriber:
+                if not ingest:
                     logger.error(
                         "Received media before transcriber was connected"
                     )
@@ -194,9 +323,11 @@ async def websocket_endpoint(websocket: WebSocket):
                     continue
 
                 try:
-                    payload_b64 = message["media"]["payload"]
-                    payload_mulaw = base64.b64decode(payload_b64)
-                    transcriber.stream(payload_mulaw)
+                    session.touch()
+                    if message is None:
+                        ingest.push_frame(data)
+                    else:
+                        ingest.push_payload(message["media"]["payload"])
                 except KeyError as e:
                     logger.error(f"Missing expected field in media event: {e}")
                     await websocket.send_text(
@@ -214,8 +345,9 @@ async def websocket_endpoint(websocket: WebSocket):
 
             elif event_type == "stop":
                 logger.info("Transcription stopped")
-                # Any additional stop logic can go here
-                transcriber.send_stop()
+                if ingest:
+                    ingest.flush()
+                await transcriber.send_stop()
 
             else:
                 logger.warning(f"Unknown event type: {event_type}")
@@ -226,10 +358,14 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.error(f"WebSocket error: {e}")
     finally:
         # Clean up resources
+        if session:
+            session_registry.end(session)
+        if recorder:
+            recorder.close()
         if transcriber:
             try:
-                # Assuming TwilioTranscriber has a disconnect method
-                transcriber.disconnect()
+                # Closing joins the transcriber's threads, keep it off the loop
+                await asyncio.to_thread(transcriber.close)
                 logger.info("Transcriber disconnected")
             except Exception as e:
                 logger.error(f"Error disconnecting transcriber: {e}")
@@ -0,0 +1,185 @@
+"""
+Low-allocation ingest path for Twilio media stream frames.
+
+Twilio sends a JSON text frame every 20 ms per call. Media frames are
+recognised by sniffing the event type from the raw text, their base64 payload
+is sliced out without parsing the JSON, decoded and copied into a
+preallocated ring buffer, and frames are coalesced into larger chunks before
+they are handed to the transcriber. Control frames (connected, start, stop)
+still go through json.loads.
+"""
+import binascii
+import json
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from app.services.config import MEDIA_CHUNK_MS, MEDIA_RING_CHUNKS
+
+logger = logging.getLogger(__name__)
+
+TWILIO_SAMPLE_RATE = 8000  # Hz
+BYTES_PER_MS = TWILIO_SAMPLE_RATE // 1000  # 8-bit mu-law, one byte per sample
+
+_EVENT_KEY = '"event"'
+_PAYLOAD_KEY = '"payload"'
+
+
+def _quoted_value_span(raw: str, key: str, start: int = 0):
+    """
+    Locate the string value following a JSON key in raw text.
+
+    Returns:
+        (begin, end) indices of the value without quotes, or None
+    """
+    index = raw.find(key, start)
+    if index < 0:
+        return None
+    begin = raw.find('"', index + len(key))
+    if begin < 0:
+        return None
+    begin += 1
+    end = raw.find('"', begin)
+    if end < 0:
+        return None
+    return begin, end
+
+
+def sniff_event(raw: str) -> Optional[str]:
+    """
+    Read the event type of a Twilio frame without parsing the JSON.
+
+    Args:
+        raw: The raw text frame
+
+    Returns:
+        The event type, or None if it cannot be located
+    """
+    span = _quoted_value_span(raw, _EVENT_KEY)
+    if span is None:
+        return None
+    return raw[span[0]:span[1]]
+
+
+class MediaIngest:
+    """
+    Decodes media frames into a ring buffer and emits fixed-size chunks.
+
+    The ring holds `ring_chunks` contiguous chunk slots. Each emitted chunk is
+    a memoryview into the ring, valid until the ring wraps back to that slot,
+    so the sink must consume or copy it before returning.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[memoryview], None],
+        chunk_ms: int = MEDIA_CHUNK_MS,
+        ring_chunks: int = MEDIA_RING_CHUNKS,
+        tap: Optional[Callable[[bytes], None]] = None,
+    ):
+        """
+        Initialize the ingest buffer.
+
+        Args:
+            sink: Called with each coalesced chunk of mu-law audio
+            chunk_ms: Duration of audio per emitted chunk
+            ring_chunks: Number of chunk slots in the ring buffer
+            tap: Optional callback receiving every decoded frame, e.g. a recorder
+        """
+        self.sink = sink
+        self.tap = tap
+        self.chunk_bytes = chunk_ms * BYTES_PER_MS
+        self.slots = ring_chunks
+        self._ring = bytearray(self.chunk_bytes * ring_chunks)
+        self._view = memoryview(self._ring)
+        self._slot = 0
+        self._fill = 0
+
+        self.frames = 0
+        self.chunks = 0
+        self.bytes = 0
+        self.slow_path = 0
+
+    def push_frame(self, raw: str) -> None:
+        """
+        Decode a raw media frame and add its audio to the buffer.
+
+        Args:
+            raw: The raw JSON text of a media event
+
+        Raises:
+            KeyError: If the frame has no media payload
+            binascii.Error: If the payload is not valid base64
+        """
+        span = _quoted_value_span(raw, _PAYLOAD_KEY)
+        if span is None:
+            # Unusual layout, fall back to a full parse
+            self.slow_path += 1
+            self.push_payload(json.loads(raw)["media"]["payload"])
+        else:
+            self.push_payload(raw[span[0]:span[1]])
+
+    def push_payload(self, payload: str) -> None:
+        """
+        Decode a base64 media payload and add its audio to the buffer.
+
+        Args:
+            payload: The base64 encoded mu-law audio of one frame
+        """
+        decoded = binascii.a2b_base64(payload)
+        self.frames += 1
+        if self.tap is not None:
+            self.tap(decoded)
+        self.push(decoded)
+
+    def push(self, data) -> None:
+        """
+        Copy decoded audio into the ring, emitting every chunk that fills up.
+
+        Args:
+            data: Bytes-like mu-law audio
+        """
+        size = len(data)
+        self.bytes += size
+        room = self.chunk_bytes - self._fill
+
+        if size <= room:
+            base = self._slot * self.chunk_bytes + self._fill
+            self._view[base:base + size] = data
+            self._fill += size
+            if self._fill == self.chunk_bytes:
+                self._emit()
+            return
+
+        data = memoryview(data)
+        offset = 0
+        while offset < size:
+            take = min(self.chunk_bytes - self._fill, size - offset)
+            base = self._slot * self.chunk_bytes + self._fill
+            self._view[base:base + take] = data[offset:offset + take]
+            self._fill += take
+            offset += take
+            if self._fill == self.chunk_bytes:
+                self._emit()
+
+    def flush(self) -> None:
+        """Emit whatever partial chunk is buffered."""
+        if self._fill:
+            self._emit()
+
+    def _emit(self) -> None:
+        base = self._slot * self.chunk_bytes
+        chunk = self._view[base:base + self._fill]
+        self._slot = (self._slot + 1) % self.slots
+        self._fill = 0
+        self.chunks += 1
+        self.sink(chunk)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report frame and chunk counters."""
+        return {
+            "frames": self.frames,
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "slow_path": self.slow_path,
+            "buffered_bytes": self._fill,
+        }
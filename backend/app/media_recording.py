@@ -0,0 +1,186 @@
+"""
+Compact binary recordings of Twilio /media WebSocket sessions.
+
+A recording starts with a small header followed by one record per event:
+
+    header:  b"LSMR" | u8 version
+    record:  u32 offset_ms | u8 kind | u32 length | payload
+
+Control events (connected, start, stop, mark, ...) are stored as their raw
+JSON text. Media events are stored as the decoded mu-law audio only, which is
+less than half the size of the base64 JSON frame, and are turned back into
+Twilio-shaped frames on replay.
+"""
+import base64
+import json
+import logging
+import os
+import struct
+import time
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LSMR"
+VERSION = 1
+HEADER = struct.Struct("<4sB")
+RECORD = struct.Struct("<IBI")
+
+KIND_TEXT = 0
+KIND_MEDIA = 1
+
+FRAME_BYTES = 160  # 20 ms of 8 kHz mu-law
+
+
+class MediaRecorder:
+    """
+    Appends the events of one /media connection to a recording file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a new recording.
+
+        Args:
+            path: File to write the recording to
+        """
+        self.path = path
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._start = time.monotonic()
+        self.events = 0
+
+    def _offset_ms(self) -> int:
+        return int((time.monotonic() - self._start) * 1000)
+
+    def record_text(self, raw: str) -> None:
+        """Record a control event as raw JSON text."""
+        payload = raw.encode()
+        self._file.write(RECORD.pack(self._offset_ms(), KIND_TEXT, len(payload)))
+        self._file.write(payload)
+        self.events += 1
+
+    def record_media(self, audio: bytes) -> None:
+        """Record the decoded audio of a media event."""
+        self._file.write(RECORD.pack(self._offset_ms(), KIND_MEDIA, len(audio)))
+        self._file.write(audio)
+        self.events += 1
+
+    def close(self) -> None:
+        """Flush and close the recording."""
+        if not self._file.closed:
+            self._file.close()
+            logger.info(f"Saved recording with {self.events} events to {self.path}")
+
+
+def open_recorder(directory: str, session_id: str) -> Optional[MediaRecorder]:
+    """
+    Start recording a session if a recording directory is configured.
+
+    Args:
+        directory: Directory for recordings, recording is disabled if empty
+        session_id: Used as the file name
+
+    Returns:
+        A recorder, or None when recording is disabled
+    """
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return MediaRecorder(os.path.join(directory, f"{session_id}.lsmr"))
+
+
+def read_recording(path: str) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Iterate over the events of a recording.
+
+    Args:
+        path: Recording file
+
+    Yields:
+        (offset_ms, kind, payload) tuples in recorded order
+    """
+    with open(path, "rb") as file:
+        magic, version = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a media recording: {path}")
+
+        while True:
+            head = file.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            offset_ms, kind, length = RECORD.unpack(head)
+            yield offset_ms, kind, file.read(length)
+
+
+def media_frame(audio: bytes, stream_sid: str, sequence: int) -> str:
+    """
+    Rebuild a Twilio media event around recorded audio.
+
+    Args:
+        audio: Decoded mu-law audio of one frame
+        stream_sid: Stream identifier to put in the frame
+        sequence: Sequence number of the frame within the stream
+
+    Returns:
+        The JSON text of the media event
+    """
+    return json.dumps(
+        {
+            "event": "media",
+            "sequenceNumber": str(sequence),
+            "media": {
+                "track": "inbound",
+                "chunk": str(sequence),
+                "timestamp": str(sequence * 20),
+                "payload": base64.b64encode(audio).decode(),
+            },
+            "streamSid": stream_sid,
+        },
+        separators=(",", ":"),
+    )
+
+
+def synthesize_recording(
+    path: str,
+    seconds: float,
+    speech_spans: List[Tuple[float, float]],
+    stream_sid: str = "MZ00000000000000000000000000000000",
+) -> None:
+    """
+    Write a recording of a synthetic call, for load tests without a real one.
+
+    Args:
+        path: File to write
+        seconds: Call duration
+        speech_spans: (start, end) seconds during which a loud tone plays
+        stream_sid: Stream identifier used in the control events
+    """
+    # Alternating high-amplitude mu-law codes stand in for speech
+    tone = bytes([0x10, 0x90]) * (FRAME_BYTES // 2)
+    silence = bytes([0xFF]) * FRAME_BYTES
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION))
+
+        def write(offset_ms: int, kind: int, payload: bytes) -> None:
+            file.write(RECORD.pack(offset_ms, kind, len(payload)))
+            file.write(payload)
+
+        write(0, KIND_TEXT, json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}).encode())
+        write(
+            0,
+            KIND_TEXT,
+            json.dumps(
+                {
+                    "event": "start",
+                    "streamSid": stream_sid,
+                    "start": {"streamSid": stream_sid, "callSid": f"CA{stream_sid[2:]}"},
+                }
+            ).encode(),
+        )
+        for frame in range(int(seconds * 50)):
+            at = frame * 0.02
+            speaking = any(start <= at < end for start, end in speech_spans)
+            write(frame * 20, KIND_MEDIA, tone if speaking else silence)
+        write(int(seconds * 1000), KIND_TEXT, json.dumps({"event": "stop", "streamSid": stream_sid}).encode())
@@ -0,0 +1,309 @@
+"""
+Replay recorded Twilio media streams against /media.
+
+Drives one or more concurrent replays of a recording at real time, N times
+real time or as fast as possible, against a backend whose transcriber is the
+ScriptedTranscriber stand-in. The stand-in emits scripted
+RealtimeFinalTranscript events as audio time passes, so the whole
+utterance -> intent -> data -> card path runs without AssemblyAI.
+
+Run from the backend directory:
+    python -m app.media_replay --synthesize call.lsmr --seconds 60
+    python -m app.media_replay call.lsmr --speed max --calls 20
+    python -m app.media_replay call.lsmr --speed 1 --url http://localhost:8000
+
+Without --url an in-process server is started with the stand-in installed.
+An external server must run with TRANSCRIBER_MODE=scripted (and optionally
+REPLAY_SCRIPT_PATH) to use the stand-in.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import socket
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+import assemblyai as aai
+
+from app.media_recording import (
+    KIND_MEDIA,
+    media_frame,
+    read_recording,
+    synthesize_recording,
+)
+from app.services.config import REPLAY_SCRIPT_PATH
+from app.session_registry import CallSession
+from app.twilio_transcriber import TwilioTranscriber
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_MS = 8
+
+DEFAULT_PHRASES = [
+    "How has Apple been doing this month",
+    "Can you pull up Tesla for me",
+    "I would like my portfolio to be more sustainable",
+    "What about Palantir lately",
+    "Let's move into the iShares ESG Aware fund",
+    "Show me how Microsoft is trading",
+]
+
+
+def load_script(path: str = REPLAY_SCRIPT_PATH) -> Iterator[Tuple[int, str]]:
+    """
+    Load the transcripts the stand-in should emit.
+
+    Args:
+        path: JSON file with a list of {"at_ms": ..., "text": ...} entries;
+            if empty, a default phrase is emitted every six seconds of audio
+
+    Returns:
+        Iterator of (audio offset in ms, text) in ascending order
+    """
+    if path:
+        with open(path, "r") as file:
+            entries = json.load(file)
+        return iter(sorted((int(entry["at_ms"]), entry["text"]) for entry in entries))
+
+    return (
+        (3000 + index * 6000, DEFAULT_PHRASES[index % len(DEFAULT_PHRASES)])
+        for index in itertools.count()
+    )
+
+
+class ScriptedTranscriber(TwilioTranscriber):
+    """
+    Stand-in for TwilioTranscriber that never contacts AssemblyAI.
+
+    Audio still flows through the voice-activity gate, and scripted final
+    transcripts are delivered to on_data once enough audio has been received.
+    """
+
+    def __init__(self, session: CallSession, script: Optional[Iterator[Tuple[int, str]]] = None):
+        # RealtimeTranscriber.__init__ is skipped on purpose: no realtime client
+        self.session = session
+        self._script = script if script is not None else load_script()
+        self._next = next(self._script, None)
+        self.audio_ms = 0.0
+        self.streamed_bytes = 0
+        self.emitted = 0
+        self._attach_voice_gate()
+
+    def connect(self, timeout: Optional[float] = None):
+        pass
+
+    def stream(self, data: bytes):
+        self.streamed_bytes += len(data)
+
+    def close(self):
+        pass
+
+    def stream_chunk(self, chunk: memoryview):
+        self.audio_ms += len(chunk) / BYTES_PER_MS
+        super().stream_chunk(chunk)
+
+        while self._next is not None and self._next[0] <= self.audio_ms:
+            at_ms, text = self._next
+            self._next = next(self._script, None)
+            self.emitted += 1
+            self.on_data(
+                aai.RealtimeFinalTranscript(
+                    audio_start=max(at_ms - 1500, 0),
+                    audio_end=at_ms,
+                    confidence=1.0,
+                    text=text,
+                    words=[],
+                    created=datetime.datetime.now(),
+                    punctuated=True,
+                    text_formatted=True,
+                )
+            )
+
+
+def _prepare_call(events: List[Tuple[int, int, bytes]], call_index: int) -> List[Tuple[float, str]]:
+    """
+    Turn recorded events into (offset seconds, text frame) pairs for one call.
+
+    Each replayed call gets its own streamSid/callSid so it maps to its own
+    session on the server.
+    """
+    stream_sid = f"MZ{call_index:032d}"
+    call_sid = f"CA{call_index:032d}"
+    frames = []
+    sequence = 0
+    for offset_ms, kind, payload in events:
+        if kind == KIND_MEDIA:
+            sequence += 1
+            frames.append((offset_ms / 1000, media_frame(payload, stream_sid, sequence)))
+            continue
+
+        message = json.loads(payload)
+        if "streamSid" in message:
+            message["streamSid"] = stream_sid
+        if isinstance(message.get("start"), dict):
+            message["start"]["streamSid"] = stream_sid
+            message["start"]["callSid"] = call_sid
+        frames.append((offset_ms / 1000, json.dumps(message)))
+    return frames
+
+
+async def _replay_call(
+    http: aiohttp.ClientSession,
+    base_url: str,
+    frames: List[Tuple[float, str]],
+    speed: float,
+) -> Dict[str, Any]:
+    """Send one call's frames to /media, paced by the requested speed."""
+    max_lag = 0.0
+    async with http.ws_connect(f"{base_url}/media") as ws:
+        start = time.perf_counter()
+        for offset, text in frames:
+            if speed > 0:
+                due = offset / speed
+                elapsed = time.perf_counter() - start
+                if due > elapsed:
+                    await asyncio.sleep(due - elapsed)
+                else:
+                    max_lag = max(max_lag, elapsed - due)
+            await ws.send_str(text)
+        elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "frames": len(frames), "max_lag": max_lag}
+
+
+async def _watch_cards(http: aiohttp.ClientSession, base_url: str, cards: List[Dict[str, Any]]):
+    """Collect every card pushed on /ws."""
+    async with http.ws_connect(f"{base_url}/ws") as ws:
+        async for message in ws:
+            if message.type == aiohttp.WSMsgType.TEXT:
+                cards.append(json.loads(message.data))
+
+
+async def _drained_metrics(
+    http: aiohttp.ClientSession, base_url: str, timeout: float = 60.0
+) -> Dict[str, Any]:
+    """Wait for the transcript pipeline to go idle, then return /api/metrics."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        async with http.get(f"{base_url}/api/metrics") as response:
+            metrics = await response.json()
+        pipeline = metrics.get("transcript_pipeline", {})
+        idle = not pipeline.get("queue_depth") and not pipeline.get("in_flight")
+        if idle or time.perf_counter() > deadline:
+            return metrics
+        await asyncio.sleep(0.2)
+
+
+async def replay(path: str, base_url: str, speed: float = 1.0, calls: int = 1) -> Dict[str, Any]:
+    """
+    Replay a recording as `calls` concurrent calls and report throughput.
+
+    Args:
+        path: Recording file
+        base_url: HTTP base URL of the backend
+        speed: Playback speed multiplier, 0 for as fast as possible
+        calls: Number of concurrent calls
+
+    Returns:
+        Throughput, pacing and pipeline latency figures
+    """
+    events = list(read_recording(path))
+    prepared = [_prepare_call(events, index) for index in range(calls)]
+    ws_url = base_url.replace("http", "ws", 1)
+    cards: List[Dict[str, Any]] = []
+
+    async with aiohttp.ClientSession() as http:
+        watcher = asyncio.create_task(_watch_cards(http, ws_url, cards))
+        await asyncio.sleep(0.1)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(_replay_call(http, ws_url, frames, speed) for frames in prepared)
+        )
+        wall = time.perf_counter() - start
+
+        metrics = await _drained_metrics(http, base_url)
+
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+
+    frames = sum(result["frames"] for result in results)
+    audio_seconds = events[-1][0] / 1000 if events else 0.0
+    pipeline = metrics.get("transcript_pipeline", {})
+    return {
+        "calls": calls,
+        "speed": speed or "max",
+        "audio_seconds_per_call": audio_seconds,
+        "wall_seconds": round(wall, 3),
+        "frames": frames,
+        "frames_per_second": round(frames / wall, 1) if wall else None,
+        "max_pacing_lag_ms": round(max(result["max_lag"] for result in results) * 1000, 1),
+        "cards_received": sum(1 for card in cards if "card" in card),
+        "pipeline_counters": pipeline.get("counters"),
+        "utterance_to_card_latency": pipeline.get("latency", {}).get("total"),
+        "speculation": pipeline.get("speculation"),
+        "suppressed_audio_fraction": metrics.get("sessions", {}).get("suppressed_audio_fraction"),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def replay_locally(path: str, speed: float, calls: int) -> Dict[str, Any]:
+    """Start an in-process server with the scripted stand-in and replay against it."""
+    import uvicorn
+
+    import app.main as main
+
+    main.transcriber_factory = ScriptedTranscriber
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        return await replay(path, f"http://127.0.0.1:{port}", speed, calls)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded /media streams")
+    parser.add_argument("recording", nargs="?", help="Recording file (.lsmr)")
+    parser.add_argument("--speed", default="1", help="Playback speed multiplier, or 'max'")
+    parser.add_argument("--calls", type=int, default=1, help="Number of concurrent calls")
+    parser.add_argument("--url", help="Backend base URL; starts an in-process server if omitted")
+    parser.add_argument("--synthesize", metavar="PATH", help="Write a synthetic recording and exit")
+    parser.add_argument("--seconds", type=float, default=60, help="Duration of a synthetic recording")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        # Two seconds of "speech" out of every six
+        spans = [(start, start + 2.0) for start in range(1, int(args.seconds), 6)]
+        synthesize_recording(args.synthesize, args.seconds, spans)
+        print(f"Wrote {args.seconds:.0f}s synthetic recording to {args.synthesize}")
+        return
+
+    if not args.recording:
+        parser.error("a recording is required unless --synthesize is given")
+
+    speed = 0.0 if args.speed == "max" else float(args.speed)
+    if args.url:
+        report = asyncio.run(replay(args.recording, args.url.rstrip("/"), speed, args.calls))
+    else:
+        report = asyncio.run(replay_locally(args.recording, speed, args.calls))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,18 @@ class StockChartData(BaseModel):
     to_date: str
     data: List[StockChartPoint]
 
+class StockBatchItem(BaseModel):
+    ticker: str
+    timespan: str = "day"
+    from_date: Optional[str] = None
+    to_date: Optional[str] = None
+    max_points: Optional[int] = None
+
+class StockBatchRequest(BaseModel):
+    items: List[StockBatchItem]
+    include_price: bool = True
+    include_bars: bool = True
+
 class StockTickerInfo(BaseModel):
     ticker: str
     name: str
@@ -0,0 +1,165 @@
+"""
+Vectorized analytics over aggregate bars for stock cards.
+
+Everything is computed with NumPy over column arrays, in one pass with no
+per-bar Python work. That keeps multi-month windows of minute bars, tens of
+thousands of rows, well within a card's latency budget.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Bars per year, used to annualize volatility (US regular trading hours)
+PERIODS_PER_YEAR = {
+    "minute": 252 * 390,
+    "hour": 252 * 7,
+    "day": 252,
+    "week": 52,
+    "month": 12,
+    "quarter": 4,
+    "year": 1,
+}
+
+YEAR_MS = 365 * 86_400_000
+MOVING_AVERAGE_WINDOW = 20
+# An EMA only depends on this many spans of history to within float precision
+EMA_HISTORY_SPANS = 40
+
+
+def columns_from_results(results: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Convert Polygon aggregate results to column arrays.
+
+    Args:
+        results: Bars with t, o, h, l, c, v and optionally vw
+
+    Returns:
+        Mapping of column name to a float64 array ("t" is int64 milliseconds)
+    """
+    count = len(results)
+    columns = {
+        name: np.fromiter((bar.get(name, np.nan) for bar in results), dtype=np.float64, count=count)
+        for name in ("o", "h", "l", "c", "v", "vw")
+    }
+    columns["t"] = np.fromiter((bar["t"] for bar in results), dtype=np.int64, count=count)
+    return columns
+
+
+def results_from_columns(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """
+    Convert column arrays back to Polygon aggregate results.
+
+    Args:
+        columns: Mapping of column name to array
+
+    Returns:
+        One dict per bar, leaving out columns Polygon did not provide (NaN)
+    """
+    names = list(columns)
+    results = []
+    for row in zip(*(columns[name].tolist() for name in names)):
+        bar = {name: value for name, value in zip(names, row) if value == value}
+        if "t" in bar:
+            bar["t"] = int(bar["t"])
+        if "n" in bar:
+            bar["n"] = int(bar["n"])
+        results.append(bar)
+    return results
+
+
+def format_dates(timestamps: np.ndarray) -> List[str]:
+    """Format epoch-millisecond timestamps as UTC YYYY-MM-DD strings."""
+    return np.datetime_as_string(timestamps.astype("datetime64[ms]"), unit="D").tolist()
+
+
+def sma(values: np.ndarray, window: int) -> Optional[float]:
+    """Simple moving average of the last window values."""
+    if len(values) < window:
+        return None
+    return float(values[-window:].mean())
+
+
+def ema(values: np.ndarray, span: int) -> Optional[float]:
+    """
+    Latest exponential moving average, seeded with the first value.
+
+    Computed as a weighted sum instead of a recursive loop: older values
+    carry weight alpha * (1 - alpha) ** age.
+    """
+    if len(values) == 0:
+        return None
+    alpha = 2.0 / (span + 1)
+    history = values[-EMA_HISTORY_SPANS * span:]
+    ages = np.arange(len(history) - 1, -1, -1)
+    weights = alpha * (1 - alpha) ** ages
+    if len(history) == len(values):
+        # The seed keeps the weight alpha would have given to everything before it
+        weights[0] = (1 - alpha) ** ages[0]
+    return float(np.dot(weights, history))
+
+
+def analyze(
+    columns: Dict[str, np.ndarray],
+    timespan: str = "day",
+    window_start: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Compute card analytics for a series of bars.
+
+    Returns, volatility, drawdown, moving averages and VWAP describe the bars
+    from window_start on. The 52-week range uses every bar in the last year,
+    so callers can pass more history than they display.
+
+    Args:
+        columns: Column arrays as returned by columns_from_results
+        timespan: Bar size, used to annualize volatility
+        window_start: First timestamp (ms) of the displayed window, defaults to all bars
+
+    Returns:
+        Dict of analytics, with None for values that need more bars
+    """
+    timestamps, close = columns["t"], columns["c"]
+    if len(close) == 0:
+        return {}
+
+    start = 0 if window_start is None else int(np.searchsorted(timestamps, window_start))
+    start = min(start, len(close) - 1)
+    window = slice(start, None)
+    closes, volumes = close[window], columns["v"][window]
+
+    log_returns = np.diff(np.log(closes))
+    volatility = None
+    if len(log_returns) > 1:
+        volatility = float(log_returns.std(ddof=1) * np.sqrt(PERIODS_PER_YEAR.get(timespan, 252)))
+
+    peaks = np.maximum.accumulate(closes)
+    drawdown = float((closes / peaks - 1).min())
+
+    vw = columns["vw"][window]
+    priced = ~np.isnan(vw)
+    if not priced.all():
+        # Fall back to the typical price where Polygon gave no VWAP
+        typical = (columns["h"][window] + columns["l"][window] + closes) / 3
+        vw = np.where(priced, vw, typical)
+    total_volume = volumes.sum()
+    vwap = float(np.dot(vw, volumes) / total_volume) if total_volume else None
+
+    year = timestamps >= timestamps[-1] - YEAR_MS
+    first_open = columns["o"][start]
+
+    return {
+        "return_pct": round(float((closes[-1] / first_open - 1) * 100), 4),
+        "volatility_annualized_pct": round(volatility * 100, 4) if volatility is not None else None,
+        "max_drawdown_pct": round(drawdown * 100, 4),
+        f"sma_{MOVING_AVERAGE_WINDOW}": _rounded(sma(closes, MOVING_AVERAGE_WINDOW)),
+        f"ema_{MOVING_AVERAGE_WINDOW}": _rounded(ema(closes, MOVING_AVERAGE_WINDOW)),
+        "vwap": _rounded(vwap),
+        "range_52w": {
+            "low": float(columns["l"][year].min()),
+            "high": float(columns["h"][year].max()),
+        },
+    }
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
@@ -0,0 +1,422 @@
+"""
+Persistent columnar cache for Polygon aggregate bars.
+
+Each series, keyed by (ticker, multiplier, timespan, adjusted), is a single
+.npy file holding one row per column (t, o, h, l, c, v, vw, n). Every column
+is contiguous on disk, and the file is memory-mapped on load. Range queries
+binary-search the timestamp column. A sidecar JSON file records which time
+ranges have already been fetched, so a read only asks Polygon for the gaps:
+usually just the latest bar, which is never considered settled.
+
+Workers on the same host share the files. A merge holds an exclusive flock
+on the series' lock file while it folds new bars into what is on disk, so
+one worker never overwrites bars another has just saved.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+)
+
+import numpy as np
+
+from app.services.bar_analytics import results_from_columns
+from app.services.config import BAR_STORE_DIR
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("t", "o", "h", "l", "c", "v", "vw", "n")
+
+DAY_MS = 86_400_000
+SPAN_MS = {
+    "second": 1_000,
+    "minute": 60_000,
+    "hour": 3_600_000,
+    "day": DAY_MS,
+    "week": 7 * DAY_MS,
+    "month": 31 * DAY_MS,
+    "quarter": 92 * DAY_MS,
+    "year": 366 * DAY_MS,
+}
+
+# Called with the from/to bounds of one gap; returns Polygon results or an error dict
+Fetcher = Callable[[Union[str, int], Union[str, int]], Awaitable[Union[List[Dict[str, Any]], Dict[str, Any]]]]
+# Called with the from/to bounds of one gap; yields Polygon results in batches as they download
+StreamFetcher = Callable[[Union[str, int], Union[str, int]], AsyncIterator[List[Dict[str, Any]]]]
+
+# Cached bars are streamed in batches of this many
+STREAM_BATCH_BARS = 5_000
+# Streamed bars are merged into the series whenever this many are pending
+STREAM_MERGE_BARS = 50_000
+
+
+class BarKey(NamedTuple):
+    ticker: str
+    multiplier: int
+    timespan: str
+    adjusted: bool
+
+    @property
+    def filename(self) -> str:
+        ticker = re.sub(r"[^A-Za-z0-9.]", "_", self.ticker)
+        return f"{ticker}_{self.multiplier}_{self.timespan}_{'adj' if self.adjusted else 'raw'}"
+
+
+def date_to_ms(date: str, end_of_day: bool = False) -> int:
+    """
+    Convert a YYYY-MM-DD date to epoch milliseconds at UTC midnight.
+
+    Args:
+        date: Date string
+        end_of_day: Return the last millisecond of the day instead
+    """
+    day = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    if end_of_day:
+        day += timedelta(days=1)
+    return int(day.timestamp() * 1000) - (1 if end_of_day else 0)
+
+
+def ms_to_date(ms: int) -> str:
+    """Convert epoch milliseconds to a UTC YYYY-MM-DD date."""
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def subtract_intervals(start: int, end: int, covered: List[List[int]]) -> List[Tuple[int, int]]:
+    """
+    Find the parts of [start, end] not inside any covered interval.
+
+    Args:
+        start: Range start, inclusive
+        end: Range end, inclusive
+        covered: Sorted, non-overlapping inclusive intervals
+
+    Returns:
+        The uncovered inclusive intervals, in order
+    """
+    gaps = []
+    cursor = start
+    for low, high in covered:
+        if high < cursor:
+            continue
+        if low > end:
+            break
+        if low > cursor:
+            gaps.append((cursor, low - 1))
+        cursor = max(cursor, high + 1)
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def add_interval(covered: List[List[int]], start: int, end: int) -> List[List[int]]:
+    """Insert [start, end] into sorted intervals, merging touching ones."""
+    merged: List[List[int]] = []
+    for low, high in sorted(covered + [[start, end]]):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return merged
+
+
+class BarStore:
+    """
+    Read-through cache of aggregate bars backed by memory-mapped column files.
+    """
+
+    def __init__(self, directory: str = BAR_STORE_DIR):
+        """
+        Initialize the store; series are loaded lazily.
+
+        Args:
+            directory: Where series and coverage files are kept
+        """
+        self.directory = directory
+        self._columns: Dict[BarKey, np.ndarray] = {}
+        self._coverage: Dict[BarKey, List[List[int]]] = {}
+        self._locks: Dict[BarKey, asyncio.Lock] = {}
+        self.counters = {
+            "reads": 0,
+            "hits": 0,
+            "partial_hits": 0,
+            "misses": 0,
+            "upstream_requests": 0,
+            "upstream_errors": 0,
+            "bars_fetched": 0,
+        }
+
+    def _paths(self, key: BarKey) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key.filename)
+        return f"{base}.npy", f"{base}.json"
+
+    def _read(self, key: BarKey) -> Tuple[np.ndarray, List[List[int]]]:
+        columns_path, coverage_path = self._paths(key)
+        try:
+            if os.path.exists(columns_path) and os.path.exists(coverage_path):
+                columns = np.load(columns_path, mmap_mode="r")
+                with open(coverage_path) as file:
+                    return columns, json.load(file)["covered"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable bar series {key.filename}: {e}")
+        return np.empty((len(COLUMNS), 0)), []
+
+    def _load(self, key: BarKey) -> None:
+        if key in self._columns:
+            return
+        self._columns[key], self._coverage[key] = self._read(key)
+
+    def _replace(self, path: str, write: Callable[[Any], None], mode: str) -> None:
+        # A uniquely named temporary file, so workers never write over each other's
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode) as file:
+                write(file)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def _merge_series(
+        self, key: BarKey, results: List[Dict[str, Any]], covered: Optional[Tuple[int, int]]
+    ) -> Tuple[np.ndarray, List[List[int]]]:
+        # Runs in a worker thread; the flock serializes merges across threads and workers
+        os.makedirs(self.directory, exist_ok=True)
+        columns_path, coverage_path = self._paths(key)
+        with open(f"{os.path.join(self.directory, key.filename)}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Start from the saved series, which may hold bars another worker merged
+                columns, coverage = self._read(key)
+                if results:
+                    fresh = np.array(
+                        [[float(bar.get(column, np.nan)) for bar in results] for column in COLUMNS]
+                    )
+                    combined = np.concatenate([fresh, np.asarray(columns)], axis=1)
+                    # Sorted unique timestamps, keeping the fetched bar over the cached one
+                    _, first = np.unique(combined[0], return_index=True)
+                    columns = combined[:, first]
+                if covered is not None:
+                    coverage = add_interval(coverage, *covered)
+                # Columns first and coverage last, so a crash in between only causes a refetch
+                self._replace(columns_path, lambda file: np.save(file, columns), "wb")
+                self._replace(coverage_path, lambda file: json.dump({"covered": coverage}, file), "w")
+                return np.load(columns_path, mmap_mode="r"), coverage
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def query(self, key: BarKey, start: int, end: int) -> np.ndarray:
+        """
+        Get the cached bars with start <= t <= end.
+
+        Args:
+            key: Series key
+            start: Range start in epoch milliseconds
+            end: Range end in epoch milliseconds
+
+        Returns:
+            A (columns, bars) array view, ordered by timestamp
+        """
+        self._load(key)
+        columns = self._columns[key]
+        timestamps = columns[0]
+        low = np.searchsorted(timestamps, start, side="left")
+        high = np.searchsorted(timestamps, end, side="right")
+        return columns[:, low:high]
+
+    def missing(self, key: BarKey, start: int, end: int) -> List[Tuple[int, int]]:
+        """Get the parts of [start, end] that have not been fetched yet."""
+        self._load(key)
+        return subtract_intervals(start, end, self._coverage[key])
+
+    async def merge(self, key: BarKey, results: List[Dict[str, Any]], covered: Optional[Tuple[int, int]]) -> None:
+        """
+        Merge fetched bars into a series and persist it.
+
+        Sorting and rewriting the series takes a while for long ones, so it
+        runs in a worker thread.
+
+        Args:
+            key: Series key
+            results: Polygon aggregate results
+            covered: Range now known to be complete, or None if still unsettled
+        """
+        self._load(key)
+        if not results and covered is None:
+            return
+        self._columns[key], self._coverage[key] = await asyncio.to_thread(
+            self._merge_series, key, results, covered
+        )
+
+    def _gaps(self, key: BarKey, start: int, end: int) -> List[Tuple[int, int]]:
+        gaps = self.missing(key, start, end)
+        if not gaps:
+            self.counters["hits"] += 1
+        elif gaps == [(start, end)]:
+            self.counters["misses"] += 1
+        else:
+            self.counters["partial_hits"] += 1
+        return gaps
+
+    @staticmethod
+    def _settled(span: int) -> int:
+        # A bar is final once its whole window has passed
+        return int(datetime.now(timezone.utc).timestamp() * 1000) - span
+
+    def _cached_batches(self, key: BarKey, start: int, end: int, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        bars = self.query(key, start, end)
+        for offset in range(0, bars.shape[1], batch_size):
+            batch = np.array(bars[:, offset:offset + batch_size])
+            yield results_from_columns({name: batch[index] for index, name in enumerate(COLUMNS)})
+
+    async def read_columns(
+        self, key: BarKey, from_date: str, to_date: str, fetch: Fetcher
+    ) -> Dict[str, Any]:
+        """
+        Get bars for a date range as column arrays, fetching only the ranges not cached yet.
+
+        Args:
+            key: Series key
+            from_date: First date (YYYY-MM-DD), inclusive
+            to_date: Last date (YYYY-MM-DD), inclusive
+            fetch: Fetches one gap from Polygon
+
+        Returns:
+            Mapping of column name to array ("t" as int64 milliseconds), or error information
+        """
+        start, end = date_to_ms(from_date), date_to_ms(to_date, end_of_day=True)
+        span = key.multiplier * SPAN_MS.get(key.timespan, DAY_MS)
+        intraday = SPAN_MS.get(key.timespan, DAY_MS) < DAY_MS
+        self.counters["reads"] += 1
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            gaps = self._gaps(key, start, end)
+            settled = self._settled(span)
+            for low, high in gaps:
+                self.counters["upstream_requests"] += 1
+                if intraday:
+                    results = await fetch(low, high)
+                else:
+                    results = await fetch(ms_to_date(low), ms_to_date(high))
+                if isinstance(results, dict):
+                    self.counters["upstream_errors"] += 1
+                    return results
+                self.counters["bars_fetched"] += len(results)
+                covered = (low, min(high, settled)) if low <= settled else None
+                await self.merge(key, results, covered)
+
+            bars = self.query(key, start, end)
+
+        # Copy out of the memory map so a later merge cannot change the arrays
+        columns = {name: np.array(bars[index]) for index, name in enumerate(COLUMNS)}
+        columns["t"] = columns["t"].astype(np.int64)
+        return columns
+
+    async def read(
+        self, key: BarKey, from_date: str, to_date: str, fetch: Fetcher
+    ) -> Dict[str, Any]:
+        """
+        Get bars for a date range, fetching only the ranges not cached yet.
+
+        Args:
+            key: Series key
+            from_date: First date (YYYY-MM-DD), inclusive
+            to_date: Last date (YYYY-MM-DD), inclusive
+            fetch: Fetches one gap from Polygon
+
+        Returns:
+            A Polygon-style aggregates response or error information
+        """
+        columns = await self.read_columns(key, from_date, to_date, fetch)
+        if "error" in columns:
+            return columns
+
+        results = results_from_columns(columns)
+        return {
+            "ticker": key.ticker,
+            "adjusted": key.adjusted,
+            "status": "OK",
+            "queryCount": len(results),
+            "resultsCount": len(results),
+            "results": results,
+        }
+
+    async def stream(
+        self,
+        key: BarKey,
+        from_date: str,
+        to_date: str,
+        fetch: StreamFetcher,
+        batch_size: int = STREAM_BATCH_BARS,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream bars for a date range in order: cached ranges from the series, gaps from Polygon.
+
+        Fetched bars are yielded as they download and merged into the series as
+        they accumulate; a gap is only marked covered once it has been read to
+        the end. The series lock is not held while the consumer handles a
+        batch, so two streams over the same gap may both fetch it, and merge
+        drops the duplicates.
+
+        Args:
+            key: Series key
+            from_date: First date (YYYY-MM-DD), inclusive
+            to_date: Last date (YYYY-MM-DD), inclusive
+            fetch: Streams one gap from Polygon
+            batch_size: Most bars per batch served from the cache
+
+        Yields:
+            Lists of Polygon-style bars, ascending and without duplicates
+
+        Raises:
+            ValueError: If a date is malformed
+        """
+        start, end = date_to_ms(from_date), date_to_ms(to_date, end_of_day=True)
+        span = key.multiplier * SPAN_MS.get(key.timespan, DAY_MS)
+        intraday = SPAN_MS.get(key.timespan, DAY_MS) < DAY_MS
+        self.counters["reads"] += 1
+        gaps = self._gaps(key, start, end)
+        settled = self._settled(span)
+
+        # Last timestamp yielded; a gap fetched by date can repeat the bar before it
+        emitted = start - 1
+        for low, high in gaps:
+            for batch in self._cached_batches(key, emitted + 1, low - 1, batch_size):
+                emitted = batch[-1]["t"]
+                yield batch
+
+            self.counters["upstream_requests"] += 1
+            pending: List[Dict[str, Any]] = []
+            bounds = (low, high) if intraday else (ms_to_date(low), ms_to_date(high))
+            try:
+                async for bars in fetch(*bounds):
+                    self.counters["bars_fetched"] += len(bars)
+                    pending.extend(bars)
+                    if len(pending) >= STREAM_MERGE_BARS:
+                        await self.merge(key, pending, None)
+                        pending = []
+                    fresh = [bar for bar in bars if emitted < bar["t"] <= end]
+                    if fresh:
+                        emitted = fresh[-1]["t"]
+                        yield fresh
+            except RuntimeError:
+                self.counters["upstream_errors"] += 1
+                raise
+            await self.merge(key, pending, (low, min(high, settled)) if low <= settled else None)
+
+        for batch in self._cached_batches(key, emitted + 1, end, batch_size):
+            yield batch
+
+    def stats(self) -> Dict[str, Any]:
+        """Report cache hit counters and how many Polygon requests were made."""
+        return {"counters": dict(self.counters), "series_loaded": len(self._columns)}
+
+
+# Shared by the stock service and the chart routes
+bar_store = BarStore()
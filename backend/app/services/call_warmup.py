@@ -0,0 +1,197 @@
+"""
+Call-start warm-up of market data for the client's holdings.
+
+When a call connects, the stock bars and news for every portfolio holding and
+every ESG fund in buckets.json are fetched in the background. The fetches are
+paced through the Polygon key scheduler at prefetch priority, so live cards
+always go first. When a later utterance resolves to one of those tickers,
+the card is built from the warmed data instead of waiting on Polygon.
+
+Warmed data is served for CALL_WARMUP_MAX_AGE_SECONDS; after that cards fetch
+live again. Calls that start within that time of each other share the data
+instead of warming every ticker anew.
+"""
+import asyncio
+import copy
+import functools
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.buckets_service import BucketsService
+from app.services.company_aliases import load_holdings
+from app.services.config import BUCKETS_PATH, CALL_WARMUP_CONCURRENCY, CALL_WARMUP_MAX_AGE_SECONDS
+from app.services.key_cycling_service import PREFETCH, use_priority
+from app.services.metrics import LatencyRecorder
+from app.services.news_service import news_service
+from app.services.stock_service import stock_service
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupStats:
+    """Process-wide counters for call warm-ups."""
+
+    def __init__(self):
+        self.calls = 0
+        self.tickers_warmed = 0
+        self.tickers_failed = 0
+        self.tickers_reused = 0
+        self.hits = 0
+        self.expired = 0
+        self.duration = LatencyRecorder()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report warm-up volume, duration and how many cards it served."""
+        return {
+            "calls": self.calls,
+            "tickers_warmed": self.tickers_warmed,
+            "tickers_failed": self.tickers_failed,
+            "tickers_reused": self.tickers_reused,
+            "hits": self.hits,
+            "expired": self.expired,
+            "duration": self.duration.stats(),
+        }
+
+
+warmup_stats = WarmupStats()
+
+# Most recent warm-up of each ticker across calls: (time.monotonic() it finished, data)
+_recent: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+@functools.lru_cache(maxsize=1)
+def warmup_tickers() -> Dict[str, Optional[str]]:
+    """
+    Tickers warmed at call start: the holdings, then the ESG funds.
+
+    Returns:
+        Mapping of ticker to company or fund name
+    """
+    tickers: Dict[str, Optional[str]] = dict(load_holdings())
+    for bucket in BucketsService().get_buckets(BUCKETS_PATH):
+        if bucket.get("esg") and bucket.get("ticker"):
+            tickers.setdefault(bucket["ticker"], bucket.get("name"))
+    return tickers
+
+
+class CallWarmup:
+    """
+    One call's warm-up. All methods must be called on the event loop thread.
+    """
+
+    def __init__(self, concurrency: int = CALL_WARMUP_CONCURRENCY, max_age: float = CALL_WARMUP_MAX_AGE_SECONDS):
+        """
+        Initialize the warm-up; nothing is fetched until start().
+
+        Args:
+            concurrency: Most tickers fetched at once
+            max_age: Seconds warmed data is served and shared with later calls
+        """
+        self.concurrency = concurrency
+        self.max_age = max_age
+        self.tasks: Dict[str, asyncio.Task] = {}
+        # ticker -> time.monotonic() its data was fetched
+        self.warmed_at: Dict[str, float] = {}
+        self.started_at: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.hits = 0
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self, tickers: Optional[Dict[str, Optional[str]]] = None) -> None:
+        """
+        Start warming, once per call.
+
+        Args:
+            tickers: Ticker -> company mapping, defaults to warmup_tickers()
+        """
+        if self._runner is not None:
+            return
+        if tickers is None:
+            tickers = warmup_tickers()
+        self.started_at = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.tasks = {
+            ticker: asyncio.create_task(self._fetch(ticker, company, semaphore))
+            for ticker, company in tickers.items()
+        }
+        self._runner = asyncio.create_task(self._finish(list(self.tasks.values())))
+        warmup_stats.calls += 1
+
+    async def _fetch(self, ticker: str, company: Optional[str], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        recent = _recent.get(ticker)
+        if recent is not None and time.monotonic() - recent[0] < self.max_age:
+            # Warmed by a call that started moments ago
+            warmup_stats.tickers_reused += 1
+            self.warmed_at[ticker] = recent[0]
+            return recent[1]
+        async with semaphore:
+            with use_priority(PREFETCH):
+                bars, news = await asyncio.gather(
+                    stock_service.get_stock_bars(ticker),
+                    news_service.get_stock_news(ticker, company),
+                    return_exceptions=True,
+                )
+        if isinstance(bars, Exception):
+            raise bars
+        if "error" in bars:
+            raise RuntimeError(bars["error"])
+        if isinstance(news, Exception):
+            logger.error(f"Warm-up news fetch for {ticker} failed: {news}")
+            news = None
+        result = {"bars": bars, "news": news}
+        self.warmed_at[ticker] = time.monotonic()
+        _recent[ticker] = (self.warmed_at[ticker], result)
+        return result
+
+    async def _finish(self, tasks: List[asyncio.Task]) -> None:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        failed = sum(1 for result in results if isinstance(result, BaseException))
+        self.duration = time.perf_counter() - self.started_at
+        warmup_stats.duration.record(self.duration)
+        warmup_stats.tickers_warmed += len(results) - failed
+        warmup_stats.tickers_failed += failed
+        logger.info(
+            f"Warmed {len(results) - failed}/{len(results)} tickers in {self.duration:.2f}s"
+        )
+
+    def claim(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the warmed data for a ticker if it has finished loading.
+
+        Args:
+            ticker: Ticker the intent resolved to
+
+        Returns:
+            A copy of the dict with "bars" and "news", or None if it is not
+            ready or older than max_age
+        """
+        ticker = ticker.upper()
+        task = self.tasks.get(ticker)
+        if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        if time.monotonic() - self.warmed_at[ticker] >= self.max_age:
+            warmup_stats.expired += 1
+            return None
+        self.hits += 1
+        warmup_stats.hits += 1
+        # Cards are built by mutating the data, and a ticker can come up more than once
+        return copy.deepcopy(task.result())
+
+    def cancel(self) -> None:
+        """Stop any warm-up still running."""
+        for task in self.tasks.values():
+            if not task.done():
+                task.cancel()
+        if self._runner is not None and not self._runner.done():
+            self._runner.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Report this call's warm-up progress, duration and hits."""
+        done = [task for task in self.tasks.values() if task.done()]
+        return {
+            "tickers": len(self.tasks),
+            "warmed": sum(1 for task in done if not task.cancelled() and task.exception() is None),
+            "duration_seconds": round(self.duration, 3) if self.duration is not None else None,
+            "hits": self.hits,
+        }
@@ -0,0 +1,149 @@
+"""
+Spoken aliases for the tickers the app knows about.
+
+Built from StockService.TICKER_TO_COMPANY and the portfolio holdings, so that
+"apple", "palantir" or "msft" in a transcript can be mapped to a ticker
+without an LLM round-trip.
+"""
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from app.services.config import PORTFOLIO_PATH
+from app.services.stock_service import StockService
+
+logger = logging.getLogger(__name__)
+
+# Corporate suffixes that nobody says out loud
+_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "plc",
+    "holdings", "technologies", "platforms", "group", "ltd", "the", "com",
+}
+
+# Leading words that are not distinctive enough to stand alone
+_WEAK_FIRST_WORDS = {"the", "advanced", "walt", "general", "american", "united"}
+
+# Tickers that are ordinary words and would fire on normal speech
+_AMBIGUOUS_TICKERS = {"V", "MA", "BA", "DIS", "META"}
+
+# Trailing words dropped from fund names to get the spoken form
+_FUND_SUFFIXES = {"etf", "fund", "trust", "index"}
+
+# Names people use that cannot be derived from the legal name
+EXTRA_ALIASES = {
+    "GOOGL": ["google"],
+    "META": ["facebook", "meta platforms"],
+    "DIS": ["disney"],
+    "AMD": ["amd"],
+    "BRK.A": ["berkshire", "berkshire hathaway"],
+    "JPM": ["jp morgan", "jpmorgan"],
+    "BA": ["boeing"],
+}
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a company name and strip punctuation and corporate suffixes."""
+    words = re.findall(r"[a-z0-9]+", name.lower().replace(".com", ""))
+    while words and words[-1] in _SUFFIXES:
+        words.pop()
+    while words and words[0] == "the":
+        words.pop(0)
+    return " ".join(words)
+
+
+def load_holdings(path: str = PORTFOLIO_PATH) -> Dict[str, str]:
+    """
+    Load the portfolio holdings as a ticker -> company mapping.
+
+    Args:
+        path: Path of portfolio.json
+
+    Returns:
+        Mapping of ticker to company name, empty if the file cannot be read
+    """
+    try:
+        with open(path, "r") as file:
+            portfolio = json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Error loading portfolio holdings from {path}: {e}")
+        return {}
+    holdings = portfolio.get("portfolio", {}).get("holdings", [])
+    return {holding["ticker"]: holding["company"] for holding in holdings}
+
+
+def fund_aliases(bucket: Dict[str, Any]) -> List[str]:
+    """
+    Spoken forms of a fund from buckets.json.
+
+    Args:
+        bucket: Fund entry with "name" and "ticker"
+
+    Returns:
+        Full name, name without the provider, short name and ticker, lowercase
+    """
+    words = normalize_name(bucket.get("name", "")).split()
+    while words and words[-1] in _FUND_SUFFIXES:
+        words.pop()
+    aliases = []
+    if words:
+        aliases.append(" ".join(words))
+    if len(words) > 2:
+        aliases.append(" ".join(words[1:]))
+        aliases.append(" ".join(words[1:3]))
+    if bucket.get("ticker"):
+        aliases.append(bucket["ticker"].lower())
+    return aliases
+
+
+@lru_cache(maxsize=1)
+def company_aliases() -> Dict[str, str]:
+    """
+    Build the alias -> ticker mapping.
+
+    Returns:
+        Mapping of lowercase spoken alias to ticker
+    """
+    companies = dict(StockService.TICKER_TO_COMPANY)
+    companies.update(load_holdings())
+
+    aliases: Dict[str, str] = {}
+    for ticker, company in companies.items():
+        name = normalize_name(company)
+        if name:
+            aliases.setdefault(name, ticker)
+            first = name.split()[0]
+            if len(first) >= 4 and first not in _WEAK_FIRST_WORDS:
+                aliases.setdefault(first, ticker)
+        if len(ticker) >= 3 and ticker not in _AMBIGUOUS_TICKERS:
+            aliases.setdefault(ticker.lower().replace(".", " "), ticker)
+
+    for ticker, extra in EXTRA_ALIASES.items():
+        for alias in extra:
+            aliases.setdefault(alias, ticker)
+    return aliases
+
+
+def find_tickers(text: str, max_words: int = 3) -> Dict[str, str]:
+    """
+    Find ticker mentions in free text by looking up word n-grams.
+
+    Args:
+        text: Transcript text
+        max_words: Longest alias, in words, to look for
+
+    Returns:
+        Mapping of ticker to the alias that matched, in order of appearance
+    """
+    aliases = company_aliases()
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    found: Dict[str, str] = {}
+    for start in range(len(words)):
+        for size in range(max_words, 0, -1):
+            phrase = " ".join(words[start:start + size])
+            ticker = aliases.get(phrase)
+            if ticker and ticker not in found:
+                found[ticker] = phrase
+                break
+    return found
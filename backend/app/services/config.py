@@ -2,6 +2,7 @@
 Configuration settings for the application.
 """
 import os
+import tempfile
 from typing import List
 from dotenv import load_dotenv
 
@@ -12,9 +13,156 @@ load_dotenv()
 POLYGON_API_KEYS = os.getenv("POLYGON_API_KEYS", "").split(",")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY", "")
 
+# Local data files
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "database")
+PORTFOLIO_PATH = os.path.join(DATABASE_DIR, "portfolio.json")
+BUCKETS_PATH = os.path.join(DATABASE_DIR, "buckets.json")
+
 # API Settings
 POLYGON_BASE_URL = "https://api.polygon.io"
 NEWS_API_BASE_URL = "https://newsapi.org/v2"
 
 # API Rate Limiting
-POLYGON_REQUESTS_PER_MINUTE = 5 
\ No newline at end of file
+POLYGON_REQUESTS_PER_MINUTE = 5
+# Requests a rested key may make back to back; defaults to the per-minute limit
+POLYGON_KEY_BURST = int(os.getenv("POLYGON_KEY_BURST", "0")) or None
+# How long a request waits for a key before giving up with an error
+POLYGON_KEY_MAX_WAIT_SECONDS = float(os.getenv("POLYGON_KEY_MAX_WAIT_SECONDS", "15"))
+# Where per-key quotas live: "memory" (this process), "file" (every worker on
+# this host) or a redis:// URL (every host)
+POLYGON_QUOTA_BACKEND = os.getenv("POLYGON_QUOTA_BACKEND", "file")
+POLYGON_QUOTA_PATH = os.getenv(
+    "POLYGON_QUOTA_PATH", os.path.join(tempfile.gettempdir(), "lightspeed-polygon-quota")
+)
+# Attempts per request when upstream answers 429
+POLYGON_MAX_ATTEMPTS = int(os.getenv("POLYGON_MAX_ATTEMPTS", "3"))
+
+# Transcript pipeline
+TRANSCRIPT_PIPELINE_WORKERS = int(os.getenv("TRANSCRIPT_PIPELINE_WORKERS", "4"))
+TRANSCRIPT_QUEUE_SIZE = int(os.getenv("TRANSCRIPT_QUEUE_SIZE", "64"))
+TRANSCRIPT_MERGE_WINDOW_SECONDS = float(os.getenv("TRANSCRIPT_MERGE_WINDOW_SECONDS", "2.0"))
+
+# Call sessions
+SESSION_IDLE_TIMEOUT_SECONDS = float(os.getenv("SESSION_IDLE_TIMEOUT_SECONDS", "900"))
+SESSION_REAPER_INTERVAL_SECONDS = float(os.getenv("SESSION_REAPER_INTERVAL_SECONDS", "30"))
+SESSION_MAX_ACTIVE = int(os.getenv("SESSION_MAX_ACTIVE", "500"))
+SESSION_MAX_TRANSCRIPT_CHARS = int(os.getenv("SESSION_MAX_TRANSCRIPT_CHARS", "200000"))
+SESSION_CARD_HISTORY = int(os.getenv("SESSION_CARD_HISTORY", "50"))
+
+# Media ingest
+MEDIA_CHUNK_MS = int(os.getenv("MEDIA_CHUNK_MS", "100"))
+MEDIA_RING_CHUNKS = int(os.getenv("MEDIA_RING_CHUNKS", "8"))
+
+# Voice activity gating
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_THRESHOLD_DBFS = float(os.getenv("VAD_THRESHOLD_DBFS", "-45"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "400"))
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "300"))
+VAD_KEEPALIVE_MS = int(os.getenv("VAD_KEEPALIVE_MS", "1000"))
+
+# Media recording and replay
+MEDIA_RECORD_DIR = os.getenv("MEDIA_RECORD_DIR", "")
+TRANSCRIBER_MODE = os.getenv("TRANSCRIBER_MODE", "assemblyai")
+REPLAY_SCRIPT_PATH = os.getenv("REPLAY_SCRIPT_PATH", "")
+
+# Speculative prefetch
+SPECULATIVE_PREFETCH_ENABLED = os.getenv("SPECULATIVE_PREFETCH_ENABLED", "true").lower() == "true"
+SPECULATIVE_MAX_TICKERS = int(os.getenv("SPECULATIVE_MAX_TICKERS", "2"))
+# Warm holdings and ESG fund data when a call connects
+CALL_WARMUP_ENABLED = os.getenv("CALL_WARMUP_ENABLED", "true").lower() == "true"
+CALL_WARMUP_CONCURRENCY = int(os.getenv("CALL_WARMUP_CONCURRENCY", "2"))
+# Warmed data older than this is not served, and calls starting within it reuse it
+CALL_WARMUP_MAX_AGE_SECONDS = float(os.getenv("CALL_WARMUP_MAX_AGE_SECONDS", "300"))
+
+# Local intent classification
+INTENT_FAST_PATH_ENABLED = os.getenv("INTENT_FAST_PATH_ENABLED", "true").lower() == "true"
+INTENT_FAST_PATH_MIN_CONFIDENCE = float(os.getenv("INTENT_FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+# Intent result cache
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "2048"))
+INTENT_CACHE_TTL_SECONDS = float(os.getenv("INTENT_CACHE_TTL_SECONDS", "3600"))
+INTENT_CACHE_PATH = os.getenv("INTENT_CACHE_PATH", "")
+
+# LLM gateway
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-4o-mini")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Keep the per-purpose limits summing to at most LLM_MAX_CONCURRENCY so that
+# long summary calls can never take the slots intent calls need
+LLM_INTENT_CONCURRENCY = int(os.getenv("LLM_INTENT_CONCURRENCY", "12"))
+LLM_SUMMARY_CONCURRENCY = int(os.getenv("LLM_SUMMARY_CONCURRENCY", "4"))
+LLM_INTENT_DEADLINE_SECONDS = float(os.getenv("LLM_INTENT_DEADLINE_SECONDS", "5"))
+LLM_SUMMARY_DEADLINE_SECONDS = float(os.getenv("LLM_SUMMARY_DEADLINE_SECONDS", "45"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.25"))
+# Stream LLM intent results and start the data fetch once the intent is known
+INTENT_STREAMING_ENABLED = os.getenv("INTENT_STREAMING_ENABLED", "true").lower() == "true"
+
+# Ticker resolution
+REFERENCE_TICKERS_PATH = os.getenv(
+    "REFERENCE_TICKERS_PATH", os.path.join(DATABASE_DIR, "reference_tickers.json")
+)
+
+# Outbound HTTP client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", "300"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "10"))
+HTTP_TOTAL_TIMEOUT_SECONDS = float(os.getenv("HTTP_TOTAL_TIMEOUT_SECONDS", "15"))
+HTTP_PREWARM_ENABLED = os.getenv("HTTP_PREWARM_ENABLED", "true").lower() == "true"
+
+# Aggregate bar cache
+BAR_STORE_ENABLED = os.getenv("BAR_STORE_ENABLED", "true").lower() == "true"
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", os.path.join(DATABASE_DIR, "bars"))
+
+# Chart downsampling; 0 sends every bar
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "500"))
+CHART_DOWNSAMPLING = os.getenv("CHART_DOWNSAMPLING", "lttb")
+
+# End-of-day prices for every US ticker, from Polygon's grouped daily bars
+DAILY_SNAPSHOT_ENABLED = os.getenv("DAILY_SNAPSHOT_ENABLED", "true").lower() == "true"
+DAILY_SNAPSHOT_PATH = os.getenv("DAILY_SNAPSHOT_PATH", os.path.join(DATABASE_DIR, "daily_snapshot.sqlite3"))
+DAILY_SNAPSHOT_BACKFILL_DAYS = int(os.getenv("DAILY_SNAPSHOT_BACKFILL_DAYS", "7"))
+# Grouped daily bars are complete a few hours after the US close (20:00 or 21:00 UTC)
+DAILY_SNAPSHOT_REFRESH_HOUR_UTC = int(os.getenv("DAILY_SNAPSHOT_REFRESH_HOUR_UTC", "23"))
+# Stored closes older than this are not served as the latest price
+DAILY_SNAPSHOT_MAX_AGE_DAYS = int(os.getenv("DAILY_SNAPSHOT_MAX_AGE_DAYS", "5"))
+
+# News API response cache; stale entries are served while they refresh in the background
+NEWS_CACHE_ENABLED = os.getenv("NEWS_CACHE_ENABLED", "true").lower() == "true"
+NEWS_CACHE_SIZE = int(os.getenv("NEWS_CACHE_SIZE", "512"))
+NEWS_CACHE_TTL_SECONDS = float(os.getenv("NEWS_CACHE_TTL_SECONDS", "300"))
+# Oldest entry still served while a refresh runs; older ones are fetched before answering
+NEWS_CACHE_STALE_SECONDS = float(os.getenv("NEWS_CACHE_STALE_SECONDS", "21600"))
+# Market news and the most requested tickers are refreshed before anyone asks
+NEWS_CACHE_HOT_TICKERS = int(os.getenv("NEWS_CACHE_HOT_TICKERS", "10"))
+NEWS_CACHE_REFRESH_CHECK_SECONDS = float(os.getenv("NEWS_CACHE_REFRESH_CHECK_SECONDS", "30"))
+# News API requests per UTC day (100 on the developer plan) and the share background refreshes may use
+NEWS_API_DAILY_QUOTA = int(os.getenv("NEWS_API_DAILY_QUOTA", "100"))
+NEWS_CACHE_REFRESH_SHARE = float(os.getenv("NEWS_CACHE_REFRESH_SHARE", "0.5"))
+
+# Live price updates on the dashboard WebSocket
+# Every subscribed ticker is refreshed in one snapshot request per interval; the
+# default is one request a minute, a fifth of one key's POLYGON_REQUESTS_PER_MINUTE
+PRICE_FEED_POLL_SECONDS = float(os.getenv("PRICE_FEED_POLL_SECONDS", "60"))
+# After failed polls the interval doubles, up to this many seconds
+PRICE_FEED_MAX_BACKOFF_SECONDS = float(os.getenv("PRICE_FEED_MAX_BACKOFF_SECONDS", "900"))
+PRICE_FEED_TICKERS_PER_REQUEST = int(os.getenv("PRICE_FEED_TICKERS_PER_REQUEST", "50"))
+PRICE_FEED_CLIENT_INTERVAL_SECONDS = float(os.getenv("PRICE_FEED_CLIENT_INTERVAL_SECONDS", "1"))
+PRICE_FEED_MAX_TICKERS_PER_CLIENT = int(os.getenv("PRICE_FEED_MAX_TICKERS_PER_CLIENT", "25"))
+
+# Per-source deadlines when several sources build one response
+# A source that misses its deadline is left out and the other cards are still returned
+QUERY_PRICE_DEADLINE_SECONDS = float(os.getenv("QUERY_PRICE_DEADLINE_SECONDS", "3"))
+QUERY_CHART_DEADLINE_SECONDS = float(os.getenv("QUERY_CHART_DEADLINE_SECONDS", "5"))
+QUERY_NEWS_DEADLINE_SECONDS = float(os.getenv("QUERY_NEWS_DEADLINE_SECONDS", "3"))
+# Related news on live-call stock cards, counted from the bars request; news still
+# loading when the bars arrive gets until this deadline, then the card goes without it
+STOCK_CARD_NEWS_DEADLINE_SECONDS = float(os.getenv("STOCK_CARD_NEWS_DEADLINE_SECONDS", "1.5"))
+
+# Multi-ticker batch endpoint
+STOCK_BATCH_MAX_ITEMS = int(os.getenv("STOCK_BATCH_MAX_ITEMS", "100"))
+STOCK_BATCH_CONCURRENCY = int(os.getenv("STOCK_BATCH_CONCURRENCY", "16"))
@@ -1,17 +1,113 @@
+import asyncio
 import logging
-import os
 import re
-import json
-from typing import Any, Dict, List, Optional, Union
-from openai import OpenAI
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from app.services.profile_service import ProfileService
 from app.services.buckets_service import BucketsService
+from app.services.config import (
+    INTENT_FAST_PATH_ENABLED,
+    INTENT_FAST_PATH_MIN_CONFIDENCE,
+    INTENT_STREAMING_ENABLED,
+    STOCK_CARD_NEWS_DEADLINE_SECONDS,
+)
+
+
+from .fan_out import Source, gather_sources
+from .intent_cache import intent_cache
+from .key_cycling_service import LIVE, use_priority
+from .llm_gateway import INTENT, llm_gateway
+from .news_service import news_service
+from .incremental_json import IncrementalJSONParser
+from .intent_classifier import IntentClassifier
+from .speculative_prefetch import Speculation
+from .stock_service import stock_service
+from .ticker_resolver import ticker_resolver
 
+logger = logging.getLogger(__name__)
 
-from .stock_service import StockService
+# Intents whose data fetch can start before the intent analysis completes
+DISPATCHABLE_INTENTS = {"stock_analysis", "esg_card", "highlight_esg"}
 
-logger = logging.getLogger(__name__)
+
+def dispatch_key(intent: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    Identify the data fetch an intent needs.
+
+    Args:
+        intent: A complete or partially parsed intent
+
+    Returns:
+        (intent_type, ticker), or None if the intent is not ready to fetch for
+    """
+    intent_type = intent.get("intent_type")
+    if intent_type not in DISPATCHABLE_INTENTS:
+        return None
+    ticker = (intent.get("parameters") or {}).get("ticker") or ""
+    if intent_type == "stock_analysis" and not ticker:
+        return None
+    return intent_type, ticker.upper()
+
+
+class EarlyFetch:
+    """
+    A data fetch started from a partially streamed intent.
+
+    start() is handed to analyze_intent as the on_partial callback. Once the
+    full intent is known, result_for() reuses the early fetch if the final
+    intent agrees with the partial one, and fetches again otherwise.
+    """
+
+    def __init__(
+        self,
+        context_manager: "ContextManager",
+        text: str,
+        speculation: Optional[Speculation] = None,
+    ):
+        self.context_manager = context_manager
+        self.text = text
+        self.speculation = speculation
+        self.key: Optional[Tuple[str, str]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, intent: Dict[str, Any]) -> None:
+        """Start fetching for a partial intent; later calls are ignored."""
+        if self.task is not None:
+            return
+        self.key = dispatch_key(intent)
+        logger.info(f"Dispatching fetch early for partial intent {intent}")
+        self.task = asyncio.create_task(
+            self.context_manager.fetch_for_intent(intent, self.text, self.speculation)
+        )
+        self.context_manager.early_fetch_counters["dispatched"] += 1
+
+    async def result_for(self, intent: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the card for the final intent.
+
+        Args:
+            intent: The complete intent
+
+        Returns:
+            Response from the appropriate service
+        """
+        counters = self.context_manager.early_fetch_counters
+        if self.task is not None:
+            if self.key == dispatch_key(intent):
+                counters["reused"] += 1
+                return await self.task
+            counters["discarded"] += 1
+            self.cancel()
+        return await self.context_manager.fetch_for_intent(
+            intent, self.text, self.speculation
+        )
+
+    def cancel(self) -> None:
+        """Cancel the early fetch if it is still running."""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task = None
 
 
 class ContextManager:
@@ -23,15 +119,16 @@ class ContextManager:
     def __init__(self):
         """Initialize the context manager with available services."""
 
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-        )
+        self.llm = llm_gateway
 
-        self.stock_service = StockService()
+        # Shared so identical requests from concurrent calls are coalesced
+        self.stock_service = stock_service
+        self.news_service = news_service
         self.bucket_service = BucketsService()
+        self.intent_classifier = IntentClassifier() if INTENT_FAST_PATH_ENABLED else None
+        self.intent_cache = intent_cache
+        self.early_fetch_counters = {"dispatched": 0, "reused": 0, "discarded": 0}
         # Add other services as needed
-        # self.news_service = NewsService()
         # self.weather_service = WeatherService()
 
     async def process_text(self, text: str) -> Dict[str, Any]:
@@ -46,29 +143,115 @@ class ContextManager:
         """
         logger.info(f"Processing text input: {text}")
 
-        # Determine the intent of the text
-        intent = self._analyze_intent(text)
+        # Determine the intent of the text, fetching data as soon as it is known
+        early = EarlyFetch(self, text)
+        try:
+            intent = await self.analyze_intent(text, on_partial=early.start)
+            return await early.result_for(intent)
+        finally:
+            early.cancel()
+
+    async def analyze_intent(
+        self,
+        text: str,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Determine the intent of the text without blocking the event loop.
+
+        Obvious utterances are classified locally; the rest are answered from
+        the intent cache or, on a miss, by the LLM.
+
+        Args:
+            text: The text to analyze
+            on_partial: Called once with a partial intent as soon as a streamed
+                LLM answer reveals enough to start the data fetch
+
+        Returns:
+            Dict containing intent type and extracted parameters
+        """
+        if self.intent_classifier is not None:
+            local = self.intent_classifier.classify(text)
+            confident = local["confidence"] >= INTENT_FAST_PATH_MIN_CONFIDENCE
+            self.intent_classifier.record_outcome(confident)
+            if confident:
+                logger.info(f"Local intent match: {local}")
+                return local
+
+        cached = self.intent_cache.get(text)
+        if cached is not None:
+            logger.info(f"Intent cache hit: {cached}")
+            return cached
+
+        intent = await self._analyze_intent(text, on_partial)
+        # Failed analyses come back without an intent_type and are not cached
+        if "intent_type" in intent:
+            self.intent_cache.put(text, intent)
+        return intent
+
+    async def fetch_for_intent(
+        self,
+        intent: Dict[str, Any],
+        text: str,
+        speculation: Optional[Speculation] = None,
+    ) -> Dict[str, Any]:
+        """
+        Call the service matching an analyzed intent and build the card.
+
+        Args:
+            intent: Result of intent analysis
+            text: The original text input
+            speculation: Data prefetched from interim transcripts, if any
+
+        Returns:
+            Response from the appropriate service
+        """
+        intent_type = intent.get("intent_type")
 
-        if intent["intent_type"] == "stock_analysis":
+        if intent_type == "stock_analysis":
             # Extract stock ticker from the input
-            ticker = intent.get("parameters").get("ticker")
+            ticker = (intent.get("parameters") or {}).get("ticker")
             if not ticker:
                 return {
                     "status": "skipped",
                     "error": "No stock symbol found in the request",
                 }
 
-            # Call the stock service
-            stock_data = await self.stock_service.get_stock_bars(
-                ticker,
-            )
+            # The LLM may return a company name; a symbol the index lacks is kept as given
+            resolved = ticker_resolver.resolve(ticker)
+            if resolved is not None:
+                ticker = resolved["ticker"]
+
+            # Serve from the speculative prefetch when it guessed right
+            prefetched = await speculation.claim(ticker) if speculation else None
+            if prefetched:
+                stock_data = prefetched["bars"]
+                if "error" not in stock_data:
+                    stock_data["relatedNews"] = self._format_related_news(prefetched["news"])
+                return {"card": "stock_card", "data": stock_data}
+
+            # Fetch news alongside the bars; live-call cards go ahead of background requests
+            company = self.stock_service.company_name(ticker)
+            started = time.monotonic()
+            with use_priority(LIVE):
+                news = asyncio.create_task(self.news_service.get_stock_news(ticker, company))
+                try:
+                    stock_data = await self.stock_service.get_stock_bars(ticker)
+                except BaseException:
+                    news.cancel()
+                    raise
+            # News may run until the bars are ready or its own deadline, whichever is later
+            remaining = started + STOCK_CARD_NEWS_DEADLINE_SECONDS - time.monotonic()
+            results = await gather_sources([Source("stock_news", lambda: news, max(0.0, remaining))])
+            if "error" not in stock_data:
+                stock_data["relatedNews"] = self._format_related_news(results["stock_news"])
             return {"card": "stock_card", "data": stock_data}
 
-        elif intent["intent_type"] == "esg_card":
+        elif intent_type == "esg_card":
             buckets = self.bucket_service.get_buckets()
             return {"card": "esg_card", "data": buckets}
 
-        elif intent["intent_type"] == "highlight_esg":
+        elif intent_type == "highlight_esg":
             return {"card": "highlight_esg"}
 
         # elif intent["type"] == "stock_history":
@@ -100,12 +283,44 @@ class ContextManager:
                 "input": text,
             }
 
-    def _analyze_intent(self, text: str) -> Dict[str, Any]:
+    @staticmethod
+    def _format_related_news(
+        news: Optional[Dict[str, Any]], limit: int = 3
+    ) -> List[Dict[str, str]]:
+        """
+        Convert a News API response into the stock card's relatedNews entries.
+
+        Args:
+            news: Response from NewsService.get_stock_news
+            limit: Maximum number of articles
+
+        Returns:
+            List of headline entries, empty if there is no usable news
+        """
+        if not news or "error" in news:
+            return []
+        return [
+            {
+                "headline": article.get("title", ""),
+                "source": (article.get("source") or {}).get("name", ""),
+                "timestamp": article.get("publishedAt", ""),
+                "sentiment": "neutral",
+            }
+            for article in news.get("articles", [])[:limit]
+        ]
+
+    async def _analyze_intent(
+        self,
+        text: str,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
         """
         Analyze the text to determine the user's intent.
 
         Args:
             text: The text to analyze
+            on_partial: If given, the answer is streamed and this is called
+                once intent_type (and ticker, for stocks) have been generated
 
         Returns:
             Dict containing intent type and extracted parameters
@@ -135,19 +350,28 @@ class ContextManager:
         Respond with ONLY the JSON object, nothing else.
         """
 
+        on_delta = None
+        if on_partial is not None and INTENT_STREAMING_ENABLED:
+            parser = IncrementalJSONParser()
+            dispatched = False
+
+            def feed_delta(delta: str) -> None:
+                nonlocal dispatched
+                if dispatched or not parser.feed(delta):
+                    return
+                partial = {
+                    "intent_type": parser.fields.get("intent_type"),
+                    "parameters": {"ticker": parser.fields.get("parameters.ticker")},
+                }
+                if dispatch_key(partial) is not None:
+                    dispatched = True
+                    on_partial(partial)
+
+            on_delta = feed_delta
+
         try:
-            completion = self.client.chat.completions.create(
-                model="openai/gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"},
-            )
-
-            # Parse the response
-            response_content = completion.choices[0].message.content
-            logger.info(f"Intent analysis response: {response_content}")
-
-            # Parse the JSON response
-            intent_data = json.loads(response_content)
+            intent_data = await self.llm.complete_json(INTENT, prompt, on_delta=on_delta)
+            logger.info(f"Intent analysis response: {intent_data}")
 
             return intent_data
 
@@ -0,0 +1,279 @@
+"""
+Local table of end-of-day bars for the whole US stock market.
+
+Polygon's grouped daily endpoint returns every US ticker's bar for a date in
+a single request. A nightly job loads each new trading day into a SQLite
+table, and on startup it backfills the days that are missing. "Latest close"
+questions are then answered locally: StockService.get_stock_price, the
+/stocks/price route and the portfolio holdings read the table instead of
+spending one Polygon request per ticker out of a budget of 5 per minute per
+key.
+"""
+import argparse
+import asyncio
+import logging
+import sqlite3
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.services.config import (
+    DAILY_SNAPSHOT_BACKFILL_DAYS,
+    DAILY_SNAPSHOT_MAX_AGE_DAYS,
+    DAILY_SNAPSHOT_PATH,
+    DAILY_SNAPSHOT_REFRESH_HOUR_UTC,
+)
+
+logger = logging.getLogger(__name__)
+
+BAR_FIELDS = ("o", "h", "l", "c", "v", "vw", "n", "t")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_bars (
+    ticker TEXT NOT NULL,
+    date TEXT NOT NULL,
+    o REAL, h REAL, l REAL, c REAL, v REAL, vw REAL, n INTEGER, t INTEGER,
+    PRIMARY KEY (ticker, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshot_days (
+    date TEXT PRIMARY KEY,
+    tickers INTEGER NOT NULL,
+    loaded_at REAL NOT NULL
+);
+"""
+
+
+def trading_days(start: date, end: date) -> List[str]:
+    """Weekdays from start to end inclusive, as YYYY-MM-DD; holidays are found by loading them."""
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+def previous_trading_day(today: Optional[date] = None) -> str:
+    """The last weekday before today (UTC), as YYYY-MM-DD: the day Polygon's previous close is for."""
+    day = (today or datetime.now(timezone.utc).date()) - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.isoformat()
+
+
+class DailySnapshot:
+    """
+    Per-day price table filled from Polygon's grouped daily bars.
+    """
+
+    def __init__(self, path: str = DAILY_SNAPSHOT_PATH, max_age_days: int = DAILY_SNAPSHOT_MAX_AGE_DAYS):
+        """
+        Initialize the table; the database is opened on first use.
+
+        Args:
+            path: SQLite database file
+            max_age_days: Oldest bar, in days, still served as the latest close
+        """
+        self.path = path
+        self.max_age_days = max_age_days
+        self._db: Optional[sqlite3.Connection] = None
+        self._job: Optional[asyncio.Task] = None
+        self.counters = {"lookups": 0, "hits": 0, "days_loaded": 0, "load_errors": 0}
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            self._db.row_factory = sqlite3.Row
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def loaded_days(self) -> List[str]:
+        """Dates already loaded, oldest first, including holidays that had no bars."""
+        return [row["date"] for row in self.db.execute("SELECT date FROM snapshot_days ORDER BY date")]
+
+    def store(self, day: str, results: List[Dict[str, Any]]) -> int:
+        """
+        Save one date's grouped daily bars, replacing any already stored.
+
+        Args:
+            day: Date the bars are for (YYYY-MM-DD)
+            results: Polygon grouped daily results, with the ticker in "T"
+
+        Returns:
+            Number of tickers stored
+        """
+        rows = [
+            (bar["T"], day, *(bar.get(field) for field in BAR_FIELDS))
+            for bar in results
+            if bar.get("T") and bar.get("c") is not None
+        ]
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO daily_bars (ticker, date, o, h, l, c, v, vw, n, t) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO snapshot_days (date, tickers, loaded_at) VALUES (?, ?, ?)",
+                (day, len(rows), time.time()),
+            )
+        return len(rows)
+
+    async def load_day(self, day: str) -> Optional[int]:
+        """
+        Fetch and store the grouped daily bars for a date.
+
+        Args:
+            day: Date to load (YYYY-MM-DD)
+
+        Returns:
+            Number of tickers stored, 0 for a market holiday, or None if the fetch failed
+        """
+        # Imported here because the stock service reads prices from this table
+        from app.services.stock_service import stock_service
+
+        data = await stock_service.get_grouped_daily(day)
+        if "error" in data:
+            self.counters["load_errors"] += 1
+            logger.error(f"Could not load the daily snapshot for {day}: {data['error']}")
+            return None
+        count = self.store(day, data.get("results") or [])
+        self.counters["days_loaded"] += 1
+        logger.info(f"Loaded daily snapshot for {day}: {count} tickers")
+        return count
+
+    async def backfill(self, days: int = DAILY_SNAPSHOT_BACKFILL_DAYS) -> int:
+        """
+        Load every missing trading day in the recent past, newest first.
+
+        Today is included once its session has closed; its data may still be
+        incomplete, so it is loaded again the next night.
+
+        Args:
+            days: How many calendar days to look back
+
+        Returns:
+            Number of dates loaded
+        """
+        now = datetime.now(timezone.utc)
+        last = now.date() if now.hour >= DAILY_SNAPSHOT_REFRESH_HOUR_UTC else now.date() - timedelta(days=1)
+        loaded = set(self.loaded_days())
+        # The most recent loaded day may have been taken before Polygon finalized it
+        if loaded:
+            loaded.discard(max(loaded))
+        missing = [day for day in trading_days(last - timedelta(days=days - 1), last) if day not in loaded]
+        count = 0
+        for day in reversed(missing):
+            if await self.load_day(day) is None:
+                # Out of quota or Polygon is failing; the next run picks up from here
+                break
+            count += 1
+        return count
+
+    def latest(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a ticker's most recent stored daily bar, if it is recent enough.
+
+        Args:
+            ticker: Stock ticker symbol
+
+        Returns:
+            The bar with its "date", or None if the ticker has no recent bar
+        """
+        return self.latest_many([ticker]).get(ticker.upper())
+
+    def latest_many(self, tickers: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the most recent stored daily bar for several tickers in one query.
+
+        Args:
+            tickers: Stock ticker symbols
+
+        Returns:
+            Mapping of upper-cased ticker to bar, leaving out tickers without a recent bar
+        """
+        tickers = sorted({ticker.upper() for ticker in tickers})
+        self.counters["lookups"] += len(tickers)
+        if not tickers:
+            return {}
+        oldest = (datetime.now(timezone.utc).date() - timedelta(days=self.max_age_days)).isoformat()
+        placeholders = ",".join("?" * len(tickers))
+        rows = self.db.execute(
+            f"SELECT * FROM daily_bars WHERE ticker IN ({placeholders}) AND date >= ? "
+            "AND date = (SELECT MAX(date) FROM daily_bars AS latest WHERE latest.ticker = daily_bars.ticker)",
+            (*tickers, oldest),
+        ).fetchall()
+        self.counters["hits"] += len(rows)
+        return {row["ticker"]: dict(row) for row in rows}
+
+    def start(self) -> None:
+        """Backfill missing days, then load each new day nightly, on the running loop."""
+        if self._job is None:
+            self._job = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the nightly job and close the database."""
+        if self._job is not None:
+            self._job.cancel()
+            await asyncio.gather(self._job, return_exceptions=True)
+            self._job = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.backfill()
+            except Exception as e:
+                logger.error(f"Error refreshing the daily snapshot: {e}")
+            now = datetime.now(timezone.utc)
+            next_run = now.replace(hour=DAILY_SNAPSHOT_REFRESH_HOUR_UTC, minute=0, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            await asyncio.sleep((next_run - now).total_seconds())
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the loaded date range and how many lookups the table answered."""
+        days = self.loaded_days() if self._db is not None else []
+        return {
+            "counters": dict(self.counters),
+            "days": len(days),
+            "first_day": days[0] if days else None,
+            "last_day": days[-1] if days else None,
+        }
+
+
+# Shared by the stock service, the portfolio routes and the nightly job
+daily_snapshot = DailySnapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily snapshot utilities")
+    parser.add_argument("--backfill", type=int, metavar="DAYS", help="Load missing days from the last DAYS")
+    parser.add_argument("--path", default=DAILY_SNAPSHOT_PATH, help="SQLite database file")
+    parser.add_argument("tickers", nargs="*", help="Print the latest close of these tickers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    snapshot = DailySnapshot(args.path)
+
+    async def backfill():
+        from app.services.http_client import http_client
+
+        await http_client.start()
+        try:
+            return await snapshot.backfill(args.backfill)
+        finally:
+            await http_client.close()
+
+    if args.backfill:
+        print(f"Loaded {asyncio.run(backfill())} days into {args.path}")
+    for ticker, bar in sorted(snapshot.latest_many(args.tickers).items()):
+        print(f"{ticker} {bar['date']} close {bar['c']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Server-side downsampling of aggregate bars for charts.
+
+A chart a few hundred pixels wide cannot show more points than it has
+pixels, so long ranges of minute bars are reduced before serialization.
+Both methods pick existing bars rather than averaging them, so every point
+sent is a real bar with its own timestamp and OHLCV values:
+
+- lttb: Largest-Triangle-Three-Buckets over the close. Keeps the visual
+  shape of the line, including its peaks and troughs.
+- minmax: the lowest and highest close of each bucket. Keeps every extreme
+  exactly, which suits range-style rendering.
+"""
+from typing import Dict
+
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+# Fewest points a chart can be reduced to: both ends and one low and high between them
+MIN_POINTS = 4
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Select points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The rest are split into
+    max_points - 2 buckets, and from each bucket the point forming the largest
+    triangle with the previously selected point and the next bucket's average
+    is kept. Bucket averages are computed for all buckets at once; only the
+    choice of point runs bucket by bucket, as it depends on the previous one.
+
+    Args:
+        x: Ascending x values (timestamps)
+        y: Values to preserve the shape of
+        max_points: Number of points to keep, at least 3
+
+    Returns:
+        Ascending indices of the selected points
+    """
+    count = len(x)
+    if max_points >= count or max_points < 3:
+        return np.arange(count)
+
+    # Relative timestamps keep the area products well within float precision
+    x = np.asarray(x, dtype=np.float64) - float(x[0])
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, count - 1, max_points - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    averages_x = np.add.reduceat(x[:-1], edges[:-1]) / sizes
+    averages_y = np.add.reduceat(y[:-1], edges[:-1]) / sizes
+    # The last bucket looks ahead to the final point itself
+    next_x = np.append(averages_x[1:], x[-1])
+    next_y = np.append(averages_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        anchor_x, anchor_y = x[previous], y[previous]
+        areas = np.abs(
+            (anchor_x - next_x[bucket]) * (y[low:high] - anchor_y)
+            - (anchor_x - x[low:high]) * (next_y[bucket] - anchor_y)
+        )
+        previous = low + int(areas.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Select the lowest and highest point of each bucket.
+
+    Args:
+        y: Values whose extremes must be kept
+        max_points: Most points to keep, at least 4
+
+    Returns:
+        Ascending indices of the selected points, first and last included
+    """
+    count = len(y)
+    if max_points >= count or max_points < 4:
+        return np.arange(count)
+
+    buckets = (max_points - 2) // 2
+    size = -(-(count - 2) // buckets)
+    # Pad the interior to whole buckets so that they can be reduced as rows
+    interior = np.full(buckets * size, np.nan)
+    interior[: count - 2] = y[1:-1]
+    rows = interior.reshape(buckets, size)
+    filled = ~np.isnan(rows).all(axis=1)
+    offsets = 1 + np.arange(buckets)[filled] * size
+    lows = offsets + np.nanargmin(rows[filled], axis=1)
+    highs = offsets + np.nanargmax(rows[filled], axis=1)
+    return np.unique(np.concatenate([[0, count - 1], lows, highs]))
+
+
+def downsample(
+    columns: Dict[str, np.ndarray], max_points: int, method: str = "lttb"
+) -> Dict[str, np.ndarray]:
+    """
+    Reduce column arrays of bars to at most max_points bars.
+
+    Args:
+        columns: Mapping of column name to array, with "t" and "c"
+        max_points: Most bars to keep; values below MIN_POINTS keep MIN_POINTS
+        method: "lttb" or "minmax"
+
+    Returns:
+        The same columns, holding only the selected bars
+    """
+    max_points = max(max_points, MIN_POINTS)
+    count = len(columns["t"])
+    if count <= max_points:
+        return columns
+    if method == "minmax":
+        indices = minmax_indices(columns["c"], max_points)
+    elif method == "lttb":
+        indices = lttb_indices(columns["t"], columns["c"], max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method {method!r}, expected one of {METHODS}")
+    return {name: values[indices] for name, values in columns.items()}
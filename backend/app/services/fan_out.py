@@ -0,0 +1,89 @@
+"""
+Concurrent fetches from several sources, each with its own deadline.
+
+A card set built from price, chart and news used to wait for each source in
+turn, so it took as long as all of them together and one slow source held up
+the rest. fan_out starts every source at once and yields each result as soon
+as it arrives. A source that misses its deadline is cancelled and yields an
+error dict instead, so callers can still answer with the cards that did make
+it.
+"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Source(NamedTuple):
+    name: str
+    call: Callable[[], Awaitable[Dict[str, Any]]]
+    # Seconds from the start of the fan-out; None waits as long as the call takes
+    deadline: Optional[float] = None
+
+
+class FanOutStats:
+    """Process-wide outcome counters per source name."""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, outcome: str) -> None:
+        counters = self.counters.setdefault(name, {"completed": 0, "failed": 0, "timed_out": 0})
+        counters[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Report how often each source completed, failed or missed its deadline."""
+        return {name: dict(counters) for name, counters in self.counters.items()}
+
+
+fan_out_stats = FanOutStats()
+
+
+async def _run(source: Source) -> Tuple[str, Dict[str, Any]]:
+    try:
+        result = await asyncio.wait_for(source.call(), source.deadline)
+    except asyncio.TimeoutError:
+        fan_out_stats.record(source.name, "timed_out")
+        logger.warning(f"{source.name} missed its {source.deadline:.3g}s deadline")
+        return source.name, {"error": f"{source.name} timed out after {source.deadline:.3g}s", "timed_out": True}
+    except Exception as e:
+        fan_out_stats.record(source.name, "failed")
+        logger.error(f"Error fetching {source.name}: {e}")
+        return source.name, {"error": str(e)}
+    fan_out_stats.record(source.name, "failed" if "error" in result else "completed")
+    return source.name, result
+
+
+async def fan_out(sources: Iterable[Source]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Run sources concurrently, yielding each result as it completes.
+
+    Args:
+        sources: Sources to fetch; all start immediately
+
+    Yields:
+        (name, result) once per source, where result is an error dict if the
+        source failed, or one with "timed_out" set if it missed its deadline
+    """
+    tasks = [asyncio.create_task(_run(source)) for source in sources]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def gather_sources(sources: Iterable[Source]) -> Dict[str, Dict[str, Any]]:
+    """
+    Run sources concurrently and collect every result.
+
+    Args:
+        sources: Sources to fetch
+
+    Returns:
+        Mapping of source name to result or error dict, as from fan_out
+    """
+    return {name: result async for name, result in fan_out(sources)}
@@ -0,0 +1,164 @@
+"""
+Application-scoped HTTP client for outbound market-data requests.
+
+Every service that calls Polygon or News API shares one aiohttp session, so
+TCP and TLS connections are kept alive and reused across cards instead of
+being set up per request. The session is created on startup, upstream
+connections are opened ahead of the first card, and it is closed on shutdown.
+A trace hook counts new versus reused connections.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from app.services.config import (
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_DNS_CACHE_SECONDS,
+    HTTP_KEEPALIVE_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_READ_TIMEOUT_SECONDS,
+    HTTP_TOTAL_TIMEOUT_SECONDS,
+    NEWS_API_BASE_URL,
+    POLYGON_BASE_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+WARM_URLS = [POLYGON_BASE_URL, NEWS_API_BASE_URL]
+
+
+class HttpClient:
+    """
+    Owns the shared aiohttp session and its connection pool.
+    """
+
+    def __init__(
+        self,
+        limit: int = HTTP_MAX_CONNECTIONS,
+        limit_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+        dns_cache_seconds: int = HTTP_DNS_CACHE_SECONDS,
+        keepalive_seconds: float = HTTP_KEEPALIVE_SECONDS,
+    ):
+        """
+        Initialize the client; the session is created by start() or on first use.
+
+        Args:
+            limit: Most open connections in total
+            limit_per_host: Most open connections per upstream host
+            dns_cache_seconds: How long resolved addresses are cached
+            keepalive_seconds: How long idle connections are kept open
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_seconds = dns_cache_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout = aiohttp.ClientTimeout(
+            total=HTTP_TOTAL_TIMEOUT_SECONDS,
+            connect=HTTP_CONNECT_TIMEOUT_SECONDS,
+            sock_read=HTTP_READ_TIMEOUT_SECONDS,
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.counters = {
+            "requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        def counter(name):
+            async def increment(session, context, params):
+                self.counters[name] += 1
+            return increment
+
+        trace.on_request_start.append(counter("requests"))
+        trace.on_connection_create_end.append(counter("new_connections"))
+        trace.on_connection_reuseconn.append(counter("reused_connections"))
+        trace.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        return trace
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_seconds,
+            keepalive_timeout=self.keepalive_seconds,
+        )
+        self._loop = asyncio.get_running_loop()
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            trace_configs=[self._trace_config()],
+        )
+
+    async def start(self) -> None:
+        """Create the session on the running event loop."""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+            logger.info("Shared HTTP client started")
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The shared session, created on first use if start() was not called.
+
+        Must be accessed from a coroutine. Do not close it, and do not use it
+        as a context manager.
+        """
+        if (
+            self._session is None
+            or self._session.closed
+            or self._loop is not asyncio.get_running_loop()
+        ):
+            # Scripts that run outside the app lifecycle get a session per loop
+            self._session = self._create_session()
+        return self._session
+
+    async def warm(self, urls: List[str] = WARM_URLS) -> None:
+        """
+        Open connections to upstream hosts before the first real request.
+
+        Failures are logged and ignored; the first request will connect instead.
+
+        Args:
+            urls: Base URLs of the upstream APIs
+        """
+        async def touch(url):
+            try:
+                async with self.session.head(url, allow_redirects=False) as response:
+                    await response.read()
+            except Exception as e:
+                logger.warning(f"Could not pre-warm connection to {url}: {e}")
+
+        await asyncio.gather(*(touch(url) for url in urls))
+        logger.info(f"Pre-warmed connections to {len(urls)} upstream hosts")
+
+    async def close(self) -> None:
+        """Close the session and every pooled connection."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Report request and connection counters and the connection reuse ratio."""
+        connections = self.counters["new_connections"] + self.counters["reused_connections"]
+        return {
+            "counters": dict(self.counters),
+            "reuse_ratio": (
+                round(self.counters["reused_connections"] / connections, 4)
+                if connections else None
+            ),
+        }
+
+
+# Shared by every outbound market-data client
+http_client = HttpClient()
@@ -0,0 +1,209 @@
+"""
+Incremental JSON parsers for streamed responses.
+
+IncrementalJSONParser reports scalar fields of a JSON document as soon as
+their value is complete, before the document itself is, so a caller can act
+on "intent_type" and "ticker" while the model is still generating the rest
+of its answer.
+
+JSONArrayStream pulls the objects of one large array out of a response body
+as it downloads, so Polygon's aggregate results can be handled page chunk by
+page chunk instead of buffering and decoding the whole body.
+"""
+import codecs
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+_LITERALS = {"true": True, "false": False, "null": None}
+_SCALAR_CHARS = set("-+.0123456789eEtruefalsn")
+
+
+class IncrementalJSONParser:
+    """
+    Feeds JSON text in arbitrary chunks and collects completed scalar values.
+
+    Values are keyed by their dotted path, e.g. "parameters.ticker" or
+    "items.0". Malformed input is not rejected; the complete text should
+    still be parsed with json.loads once the stream ends.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        # One entry per open container: [is_object, key or index, expecting_key]
+        self._stack: List[List[Union[bool, str, int]]] = []
+        self._in_string = False
+        self._escape = False
+        self._token: List[str] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume the next chunk of text.
+
+        Args:
+            chunk: Next piece of the JSON document
+
+        Returns:
+            (path, value) for every scalar completed by this chunk
+        """
+        completed: List[Tuple[str, Any]] = []
+        for char in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._string(json.loads('"' + "".join(self._token) + '"'), completed)
+                    self._token = []
+                    continue
+                self._token.append(char)
+                continue
+
+            if char in _SCALAR_CHARS:
+                self._token.append(char)
+                continue
+            if self._token:
+                self._scalar("".join(self._token), completed)
+                self._token = []
+
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._stack.append([True, "", True])
+            elif char == "[":
+                self._stack.append([False, 0, False])
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+            elif char == ":":
+                if self._stack and self._stack[-1][0]:
+                    self._stack[-1][2] = False
+            elif char == ",":
+                if self._stack:
+                    top = self._stack[-1]
+                    if top[0]:
+                        top[2] = True
+                    else:
+                        top[1] += 1
+        return completed
+
+    def _path(self) -> str:
+        return ".".join(str(entry[1]) for entry in self._stack)
+
+    def _string(self, value: str, completed: List[Tuple[str, Any]]) -> None:
+        if self._stack and self._stack[-1][0] and self._stack[-1][2]:
+            # An object key
+            self._stack[-1][1] = value
+            return
+        self._record(value, completed)
+
+    def _scalar(self, token: str, completed: List[Tuple[str, Any]]) -> None:
+        if token in _LITERALS:
+            value = _LITERALS[token]
+        else:
+            try:
+                value = json.loads(token)
+            except ValueError:
+                return
+        self._record(value, completed)
+
+    def _record(self, value: Any, completed: List[Tuple[str, Any]]) -> None:
+        path = self._path()
+        self.fields[path] = value
+        completed.append((path, value))
+
+
+class JSONArrayStream:
+    """
+    Feeds a JSON object in arbitrary byte chunks and yields the objects of one array field.
+
+    The array's items are decoded one at a time as soon as they are complete
+    and are not kept. Everything else in the document is, and is parsed into
+    the document attribute once the body ends. The array must hold objects
+    and its key must not appear as text before it, which holds for Polygon's
+    "results".
+    """
+
+    def __init__(self, field: str):
+        """
+        Initialize the parser.
+
+        Args:
+            field: Top-level key of the array to stream
+        """
+        self.document: Optional[Dict[str, Any]] = None
+        self._opening = re.compile(r'"%s"\s*:\s*\[' % re.escape(field))
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._outside: List[str] = []
+        # before -> inside -> after the array
+        self._state = "before"
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """
+        Consume the next chunk of the body.
+
+        Args:
+            chunk: Next bytes of the JSON document
+
+        Returns:
+            The array items completed by this chunk, in order
+        """
+        self._buffer += self._text.decode(chunk)
+        items: List[Dict[str, Any]] = []
+
+        if self._state == "before":
+            match = self._opening.search(self._buffer)
+            if match is None:
+                return items
+            # Stand in an empty array for the streamed one
+            self._outside.append(self._buffer[: match.end()] + "]")
+            self._buffer = self._buffer[match.end():]
+            self._state = "inside"
+
+        if self._state == "inside":
+            position, length = 0, len(self._buffer)
+            while position < length:
+                char = self._buffer[position]
+                if char in " \t\r\n,":
+                    position += 1
+                elif char == "]":
+                    self._state = "after"
+                    position += 1
+                    break
+                else:
+                    try:
+                        item, position = self._decoder.raw_decode(self._buffer, position)
+                    except ValueError:
+                        # Incomplete: wait for the rest of the object
+                        break
+                    items.append(item)
+            self._buffer = self._buffer[position:]
+
+        if self._state == "after":
+            self._outside.append(self._buffer)
+            self._buffer = ""
+        return items
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finish the body and parse the fields outside the array.
+
+        Returns:
+            The document with the streamed array left empty
+
+        Raises:
+            ValueError: If the body ended before the array or document was complete
+        """
+        self._buffer += self._text.decode(b"", final=True)
+        if self._state == "before":
+            # No array at all, e.g. a response without results
+            self.document = json.loads(self._buffer)
+        elif self._state == "inside":
+            raise ValueError("Response ended inside the streamed array")
+        else:
+            self.document = json.loads("".join(self._outside) + self._buffer)
+        return self.document
@@ -0,0 +1,234 @@
+"""
+Cache of LLM intent results keyed on normalized utterance text.
+
+Advisors repeat the same requests ("show me Tesla", "pull up Palantir"), so
+LLM intent results are kept in an LRU cache with a TTL, shared by every call
+session. Keys are normalized so that "Um, show me Tesla please." and
+"show me tesla" hit the same entry. The cache can optionally be saved to and
+loaded from a JSON file so a restart does not start cold.
+"""
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.config import (
+    INTENT_CACHE_PATH,
+    INTENT_CACHE_SIZE,
+    INTENT_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+FILLER_WORDS = {
+    "um", "umm", "uh", "uhh", "er", "erm", "ah", "hmm", "oh", "so", "well",
+    "okay", "ok", "please", "just", "actually", "basically", "really", "hey",
+    "right", "yeah",
+}
+FILLER_PHRASES = ["you know", "i mean", "kind of", "sort of"]
+
+NUMBER_WORDS = {
+    word: str(value)
+    for value, word in enumerate(
+        "zero one two three four five six seven eight nine ten eleven twelve "
+        "thirteen fourteen fifteen sixteen seventeen eighteen nineteen twenty".split()
+    )
+}
+NUMBER_WORDS.update(
+    {"thirty": "30", "forty": "40", "fifty": "50", "sixty": "60", "seventy": "70",
+     "eighty": "80", "ninety": "90", "hundred": "100", "thousand": "1000"}
+)
+
+_FILLER_PHRASES_RE = re.compile(r"\b(?:" + "|".join(FILLER_PHRASES) + r")\b")
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def _canonical_number(match: "re.Match") -> str:
+    number = match.group(0).replace(",", "")
+    if "." in number:
+        number = number.rstrip("0").rstrip(".")
+    return number.lstrip("0") or "0"
+
+
+def normalize_utterance(text: str) -> str:
+    """
+    Normalize an utterance into a cache key.
+
+    Lowercases, canonicalizes numbers ("1,000.50" -> "1000.5", "five" -> "5"),
+    strips punctuation and drops filler words.
+
+    Args:
+        text: Transcript text
+
+    Returns:
+        The normalized key
+    """
+    text = text.lower().replace("%", " percent ")
+    text = _NUMBER_RE.sub(_canonical_number, text)
+    text = _FILLER_PHRASES_RE.sub(" ", text)
+    words = re.findall(r"[a-z]+(?:'[a-z]+)?|\d+(?:\.\d+)?", text)
+    return " ".join(_join_number_words(word for word in words if word not in FILLER_WORDS))
+
+
+def _join_number_words(words: Iterable[str]) -> List[str]:
+    """Replace runs of number words with their value ("five thousand" -> "5000")."""
+    result, total, current, in_number = [], 0, 0, False
+    for word in list(words) + [""]:
+        value = NUMBER_WORDS.get(word)
+        if value is not None:
+            value = int(value)
+            if value == 100:
+                current = (current or 1) * 100
+            elif value == 1000:
+                total += (current or 1) * 1000
+                current = 0
+            else:
+                current += value
+            in_number = True
+            continue
+        if in_number:
+            result.append(str(total + current))
+            total, current, in_number = 0, 0, False
+        if word:
+            result.append(word)
+    return result
+
+
+class IntentCache:
+    """
+    LRU cache of intent results with a time-to-live.
+
+    Not thread-safe: use it from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = INTENT_CACHE_SIZE,
+        ttl_seconds: float = INTENT_CACHE_TTL_SECONDS,
+        path: str = INTENT_CACHE_PATH,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Most entries kept before the least recently used is evicted
+            ttl_seconds: How long an entry stays valid
+            path: JSON file to persist to, persistence is disabled if empty
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        # key -> (expires_at wall-clock time, intent)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the intent for an utterance.
+
+        Args:
+            text: Transcript text
+
+        Returns:
+            A copy of the cached intent, or None on a miss
+        """
+        key = normalize_utterance(text)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            del self._entries[key]
+            self.counters["expirations"] += 1
+            entry = None
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.counters["hits"] += 1
+        return dict(entry[1])
+
+    def put(self, text: str, intent: Dict[str, Any]) -> None:
+        """
+        Store the intent for an utterance.
+
+        Args:
+            text: Transcript text
+            intent: Intent analysis result
+        """
+        key = normalize_utterance(text)
+        if not key:
+            return
+        self._entries[key] = (time.time() + self.ttl_seconds, dict(intent))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+
+    def load(self) -> int:
+        """
+        Load unexpired entries from the persistence file, if configured.
+
+        Returns:
+            Number of entries loaded
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, "r") as file:
+                entries = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading intent cache from {self.path}: {e}")
+            return 0
+
+        now = time.time()
+        try:
+            for key, expires_at, intent in entries[-self.max_entries:]:
+                if expires_at > now:
+                    self._entries[key] = (expires_at, intent)
+        except (ValueError, TypeError, KeyError) as e:
+            # Valid JSON of the wrong shape; start empty rather than fail startup
+            logger.error(f"Ignoring malformed intent cache in {self.path}: {e}")
+            self._entries.clear()
+            return 0
+        logger.info(f"Loaded {len(self._entries)} intent cache entries from {self.path}")
+        return len(self._entries)
+
+    def save(self) -> None:
+        """Write unexpired entries to the persistence file, if configured."""
+        if not self.path:
+            return
+        now = time.time()
+        entries = [
+            [key, expires_at, intent]
+            for key, (expires_at, intent) in self._entries.items()
+            if expires_at > now
+        ]
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(entries, file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"Error saving intent cache to {self.path}: {e}")
+            return
+        logger.info(f"Saved {len(entries)} intent cache entries to {self.path}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Report size, counters and hit rate."""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "counters": dict(self.counters),
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+        }
+
+
+# Shared by every session
+intent_cache = IntentCache()
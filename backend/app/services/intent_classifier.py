@@ -0,0 +1,248 @@
+"""
+Deterministic first-stage intent classifier.
+
+Obvious utterances ("what's Apple doing today", "I want to invest more
+sustainably") are classified locally with a multi-pattern matcher instead of
+an LLM round-trip. The matcher is an Aho-Corasick automaton over company
+aliases, ESG fund names from buckets.json and sustainability vocabulary, so
+one pass over the transcript finds every known phrase. Utterances that match
+nothing, or match in conflicting ways, get a low confidence and are left to
+the LLM.
+"""
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services.buckets_service import BucketsService
+from app.services.company_aliases import company_aliases, fund_aliases
+from app.services.config import BUCKETS_PATH
+from app.services.metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+# Pattern kinds
+STOCK = "stock"
+FUND = "fund"
+ESG = "esg"
+CHOICE = "choice"
+STOCK_CUE = "stock_cue"
+
+ESG_VOCABULARY = [
+    "esg", "sustainable", "sustainably", "sustainability", "ethical",
+    "ethically", "environmental", "environmentally friendly", "climate",
+    "carbon", "low carbon", "net zero", "fossil fuel", "fossil fuels",
+    "renewable", "renewables", "clean energy", "green investing",
+    "go green", "greener", "socially responsible", "responsible investing",
+    "impact investing", "governance",
+]
+
+# Phrases that signal the caller is picking a fund rather than browsing
+CHOICE_CUES = [
+    "switch", "switch to", "move", "move into", "go with", "going with",
+    "choose", "pick", "let s", "i ll take", "sounds good", "that one",
+    "put it in", "invest in",
+]
+
+# Phrases that make a single company mention more clearly about its stock
+STOCK_CUES = [
+    "stock", "stocks", "shares", "share price", "price", "trading", "doing",
+    "performance", "performing", "chart", "pull up", "how is", "how has",
+    "look at", "earnings", "going on with", "happening with", "holding",
+    "quarter", "lately", "has done", "been doing",
+]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Reduce text to lowercase alphanumeric words padded with single spaces.
+
+    The padding lets patterns such as " apple " match on word boundaries.
+    """
+    return " " + " ".join(re.findall(r"[a-z0-9]+", text.lower())) + " "
+
+
+class AhoCorasick:
+    """
+    Multi-pattern string matcher.
+
+    Patterns are added with a payload, the automaton is built once, and
+    iter_matches reports every occurrence of every pattern in a single pass.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, Any]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, payload: Any) -> None:
+        """
+        Add a pattern.
+
+        Args:
+            pattern: Text to look for
+            payload: Value reported with each match
+        """
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((pattern, payload))
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links; called automatically before matching."""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, Any]]:
+        """
+        Find every pattern occurrence in text.
+
+        Args:
+            text: Text to scan
+
+        Yields:
+            (start index, pattern, payload) for each match
+        """
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern, payload in out[state]:
+                yield index - len(pattern) + 1, pattern, payload
+
+
+class IntentClassifier:
+    """
+    Classifies utterances into stock_analysis, esg_card or highlight_esg.
+
+    Results use the same shape as the LLM intent analysis, plus a
+    "confidence" between 0 and 1 and "source": "local".
+    """
+
+    def __init__(self, buckets: Optional[List[Dict[str, Any]]] = None):
+        """
+        Build the matcher.
+
+        Args:
+            buckets: Fund buckets, loaded from buckets.json if omitted
+        """
+        if buckets is None:
+            buckets = BucketsService().get_buckets(BUCKETS_PATH)
+
+        self.matcher = AhoCorasick()
+        for alias, ticker in company_aliases().items():
+            self.matcher.add(f" {alias} ", (STOCK, ticker))
+        for bucket in buckets:
+            if bucket.get("esg"):
+                for alias in fund_aliases(bucket):
+                    self.matcher.add(f" {alias} ", (FUND, bucket["ticker"]))
+        for term in ESG_VOCABULARY:
+            self.matcher.add(f" {term} ", (ESG, term))
+        for cue in CHOICE_CUES:
+            self.matcher.add(f" {cue} ", (CHOICE, cue))
+        for cue in STOCK_CUES:
+            self.matcher.add(f" {cue} ", (STOCK_CUE, cue))
+        self.matcher.build()
+
+        self.counters = {"local": 0, "fallthrough": 0}
+        self.latency = LatencyRecorder()
+
+    def matches(self, text: str) -> Dict[str, List[str]]:
+        """
+        Collect the distinct values matched per pattern kind, in order.
+
+        Args:
+            text: Utterance to scan
+
+        Returns:
+            Mapping of pattern kind to matched values
+        """
+        found: Dict[str, List[str]] = {STOCK: [], FUND: [], ESG: [], CHOICE: [], STOCK_CUE: []}
+        for _, _, (kind, value) in self.matcher.iter_matches(normalize_text(text)):
+            if value not in found[kind]:
+                found[kind].append(value)
+        return found
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """
+        Classify an utterance.
+
+        Args:
+            text: Utterance to classify
+
+        Returns:
+            Dict with intent_type, parameters, confidence and source
+        """
+        start = time.perf_counter()
+        found = self.matches(text)
+        tickers, funds, esg_terms = found[STOCK], found[FUND], found[ESG]
+        intent_type, parameters, confidence = "unknown", {}, 0.0
+
+        if funds:
+            # A named ESG fund, ideally with a "switch to" or ESG framing
+            intent_type = "highlight_esg"
+            parameters = {"fund": funds[0]}
+            confidence = 0.9 if found[CHOICE] or esg_terms else 0.75
+            if tickers or len(funds) > 1:
+                confidence -= 0.3
+        elif esg_terms:
+            intent_type = "esg_card"
+            confidence = min(0.85 + 0.05 * (len(esg_terms) - 1), 0.95)
+            if tickers:
+                confidence = 0.4
+        elif tickers:
+            intent_type = "stock_analysis"
+            parameters = {"ticker": tickers[0]}
+            # A bare company word ("apple orchard", "amazon prime") may not be about
+            # the stock; without a cue it stays below the fast-path threshold
+            confidence = 0.95 if found[STOCK_CUE] else 0.6
+            if len(tickers) > 1:
+                # Comparisons and lists are left to the LLM
+                confidence = 0.5
+
+        self.latency.record(time.perf_counter() - start)
+        return {
+            "intent_type": intent_type,
+            "parameters": parameters,
+            "confidence": round(confidence, 2),
+            "source": "local",
+        }
+
+    def record_outcome(self, used_local: bool) -> None:
+        """Count whether a classification was used or fell through to the LLM."""
+        self.counters["local" if used_local else "fallthrough"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Report how many utterances bypassed the LLM, and classification latency."""
+        total = self.counters["local"] + self.counters["fallthrough"]
+        return {
+            "counters": dict(self.counters),
+            "local_fraction": round(self.counters["local"] / total, 4) if total else None,
+            "latency": self.latency.stats(),
+        }
@@ -1,58 +1,308 @@
 """
 Service to handle API key cycling for rate-limited APIs.
+
+Each key has a token bucket refilled at requests_per_minute / 60 tokens per
+second, tracked on the monotonic clock. The buckets live in a quota backend
+that every worker process can share. Callers await acquire() and are served
+by priority, earliest first within a priority, as soon as any key has a
+token, up to their deadline. Live-call cards therefore go ahead of
+speculative prefetches and dashboard refreshes. A key that gets a 429 is
+drained and blocked for its Retry-After.
+
+Backends with coroutine operations (Redis) are driven by a dispatcher task
+instead of being called inline, so the event loop never waits on them. If
+such a backend fails, the service falls back to per-process buckets.
 """
-from typing import List, Optional
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import math
 import time
-from datetime import datetime, timedelta
-from app.services.config import POLYGON_API_KEYS, POLYGON_REQUESTS_PER_MINUTE
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.services.config import (
+    POLYGON_API_KEYS,
+    POLYGON_KEY_BURST,
+    POLYGON_KEY_MAX_WAIT_SECONDS,
+    POLYGON_QUOTA_BACKEND,
+    POLYGON_QUOTA_PATH,
+    POLYGON_REQUESTS_PER_MINUTE,
+)
+from app.services.metrics import LatencyRecorder
+from app.services.quota_backend import MemoryQuotaBackend, create_quota_backend
+
+logger = logging.getLogger(__name__)
+
+# Request priorities, most urgent first
+LIVE = 0
+PREFETCH = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {LIVE: "live", PREFETCH: "prefetch", BACKGROUND: "background"}
+
+# Priority of the requests made in the current task; REST routes and anything
+# else not marked explicitly count as background work
+request_priority: ContextVar[int] = ContextVar("request_priority", default=BACKGROUND)
+
+
+@contextlib.contextmanager
+def use_priority(priority: int) -> Iterator[None]:
+    """Mark the upstream requests made inside the block with a priority."""
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given in seconds.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or not a number
+    """
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
+
 
 class KeyCyclingService:
-    def __init__(self, api_keys: List[str], requests_per_minute: int):
+    def __init__(
+        self,
+        api_keys: List[str],
+        requests_per_minute: int,
+        burst: Optional[int] = None,
+        max_wait: float = POLYGON_KEY_MAX_WAIT_SECONDS,
+        period: float = 60.0,
+        backend_spec: str = "memory",
+        quota_path: str = POLYGON_QUOTA_PATH,
+    ):
         """
         Initialize the key cycling service.
-        
+
         Args:
             api_keys: List of API keys to cycle through
             requests_per_minute: Maximum number of requests allowed per minute per key
+            burst: Requests a rested key may make back to back, defaults to requests_per_minute
+            max_wait: Default seconds acquire() waits for a key
+            period: Length of the rate-limit window in seconds; shortened by simulations
+            backend_spec: Where bucket state lives: "memory", "file" (shared by the
+                workers on this host) or a redis:// URL (shared across hosts)
+            quota_path: Shared file used by the "file" backend
         """
-        self.api_keys = api_keys
+        self.api_keys = [key for key in api_keys if key]
         self.requests_per_minute = requests_per_minute
+        self.max_wait = max_wait
+        self.backend = create_quota_backend(
+            backend_spec,
+            self.api_keys,
+            burst or requests_per_minute,
+            requests_per_minute / period,
+            quota_path,
+        )
+        self._index = {key: index for index, key in enumerate(self.api_keys)}
         self.current_key_index = 0
-        self.request_timestamps = {i: [] for i in range(len(api_keys))}
-        
+
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Async backends only: the running dispatcher, whether it should run again, and pending blocks
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._redispatch = False
+        self._blocks: Set[asyncio.Task] = set()
+
+        self.counters = {"granted": 0, "waited": 0, "timed_out": 0, "rate_limited": 0, "backend_errors": 0}
+        self.wait_latency = {priority: LatencyRecorder() for priority in PRIORITY_NAMES}
+
+    def _take(self, now: float) -> Optional[str]:
+        # Round-robin over keys, starting after the last one used
+        for offset in range(len(self.api_keys)):
+            index = (self.current_key_index + offset) % len(self.api_keys)
+            if self.backend.take(index, now):
+                self.current_key_index = (index + 1) % len(self.api_keys)
+                return self.api_keys[index]
+        return None
+
     def get_api_key(self) -> Optional[str]:
         """
-        Get the next available API key.
-        
+        Get an API key without waiting.
+
         Returns:
-            An API key that has not reached its rate limit, or None if all keys are rate-limited
-        """
-        # Check all keys (maximum one full cycle)
-        for _ in range(len(self.api_keys)):
-            key_index = self.current_key_index
-            key = self.api_keys[key_index]
-            
-            # Clean up old timestamps
-            current_time = datetime.now()
-            minute_ago = current_time - timedelta(minutes=1)
-            self.request_timestamps[key_index] = [
-                ts for ts in self.request_timestamps[key_index] 
-                if ts > minute_ago
-            ]
-            
-            # If this key has not reached its limit
-            if len(self.request_timestamps[key_index]) < self.requests_per_minute:
-                # Record this request
-                self.request_timestamps[key_index].append(current_time)
-                # Move to next key for future requests
-                self.current_key_index = (key_index + 1) % len(self.api_keys)
-                return key
-                
-            # Try next key
-            self.current_key_index = (key_index + 1) % len(self.api_keys)
-        
-        # If we've checked all keys and none are available
-        return None
+            An API key that has not reached its rate limit, or None if all keys
+            are rate-limited or the backend cannot be read without waiting
+        """
+        if self.backend.is_async:
+            return None
+        if any(not future.done() for _, _, future in self._waiters):
+            # Queued callers come first
+            return None
+        key = self._take(time.monotonic())
+        if key is not None:
+            self.counters["granted"] += 1
+        return key
+
+    async def acquire(self, priority: Optional[int] = None, deadline: Optional[float] = None) -> Optional[str]:
+        """
+        Wait for an API key.
+
+        Args:
+            priority: LIVE, PREFETCH or BACKGROUND; defaults to the task's request_priority
+            deadline: time.monotonic() by which to give up, defaults to max_wait from now;
+                math.inf waits indefinitely
+
+        Returns:
+            An API key, or None if no key became available before the deadline
+        """
+        if not self.api_keys:
+            return None
+        if priority is None:
+            priority = request_priority.get()
+        start = time.monotonic()
+        if deadline is None:
+            deadline = start + self.max_wait
+
+        key = self.get_api_key()
+        if key is not None:
+            self.wait_latency[priority].record(0.0)
+            return key
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.counters["waited"] += 1
+        self._dispatch()
+        timeout = None if math.isinf(deadline) else max(0.0, deadline - time.monotonic())
+        try:
+            key = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.counters["timed_out"] += 1
+            logger.warning(f"No API key became available within {timeout:.1f}s")
+            return None
+        self.wait_latency[priority].record(time.monotonic() - start)
+        return key
+
+    def _dispatch(self) -> None:
+        """Hand out available tokens to queued callers and schedule the next wake-up."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.backend.is_async:
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch_async())
+            else:
+                # Let the running dispatcher pick up new waiters when it finishes
+                self._redispatch = True
+            return
+        now = time.monotonic()
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                # Timed out or cancelled
+                heapq.heappop(self._waiters)
+                continue
+            key = self._take(now)
+            if key is None:
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(key)
+            self.counters["granted"] += 1
+        if self._waiters:
+            wake_at = min(self.backend.available_at(index, now) for index in range(len(self.api_keys)))
+            loop = asyncio.get_running_loop()
+            # A millisecond of slack so the wake-up does not land just short of a token
+            self._timer = loop.call_later(max(0.0, wake_at - now) + 0.001, self._dispatch)
+
+    async def _dispatch_async(self) -> None:
+        try:
+            while True:
+                self._redispatch = False
+                wait = await self._grant_async()
+                if not self._redispatch:
+                    break
+        except Exception as e:
+            self._fall_back(e)
+            self._dispatch()
+            return
+        if wait is not None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(wait + 0.001, self._dispatch)
+
+    async def _grant_async(self) -> Optional[float]:
+        """Grant keys to queued callers; returns seconds until the next token if any are left waiting."""
+        count = len(self.api_keys)
+        while True:
+            while self._waiters and self._waiters[0][2].done():
+                # Timed out or cancelled
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                return None
+            order = [(self.current_key_index + offset) % count for offset in range(count)]
+            index, wait = await self.backend.take_any(order)
+            if index is None:
+                return wait
+            self.current_key_index = (index + 1) % count
+            # Waiters may have come or gone during the round trip; serve the first one left
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if not self._waiters:
+                return None
+            heapq.heappop(self._waiters)[2].set_result(self.api_keys[index])
+            self.counters["granted"] += 1
+
+    def _fall_back(self, error: Exception) -> None:
+        self.counters["backend_errors"] += 1
+        if not self.backend.is_async:
+            # Another operation already fell back
+            return
+        logger.error(f"The {self.backend.name} quota backend failed, using per-process quotas: {error}")
+        self.backend = MemoryQuotaBackend(self.api_keys, self.backend.capacity, self.backend.rate)
+
+    async def _block_async(self, index: int, until: float, now: float) -> None:
+        try:
+            await self.backend.block(index, until, now)
+        except Exception as e:
+            self._fall_back(e)
+            self.backend.block(index, until, now)
+
+    def report_rate_limited(self, api_key: str, retry_after: Optional[float] = None) -> None:
+        """
+        Record an upstream 429 for a key.
+
+        Args:
+            api_key: The key that was rejected
+            retry_after: Seconds from the Retry-After header, if any
+        """
+        index = self._index.get(api_key)
+        if index is None:
+            return
+        self.counters["rate_limited"] += 1
+        now = time.monotonic()
+        # Without a hint, wait until the key has earned a full token back
+        wait = retry_after if retry_after is not None else 1 / self.backend.rate
+        if self.backend.is_async:
+            task = asyncio.create_task(self._block_async(index, now + wait, now))
+            self._blocks.add(task)
+            task.add_done_callback(self._blocks.discard)
+        else:
+            self.backend.block(index, now + wait, now)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report grants, waits, timeouts, upstream 429s and wait time per priority."""
+        return {
+            "backend": self.backend.name,
+            "keys": len(self.api_keys),
+            "queued": sum(1 for _, _, future in self._waiters if not future.done()),
+            "counters": dict(self.counters),
+            "wait": {name: self.wait_latency[priority].stats() for priority, name in PRIORITY_NAMES.items()},
+        }
 
 # Create singleton instance for Polygon API
-polygon_key_service = KeyCyclingService(POLYGON_API_KEYS, POLYGON_REQUESTS_PER_MINUTE) 
\ No newline at end of file
+polygon_key_service = KeyCyclingService(
+    POLYGON_API_KEYS,
+    POLYGON_REQUESTS_PER_MINUTE,
+    POLYGON_KEY_BURST,
+    backend_spec=POLYGON_QUOTA_BACKEND,
+)
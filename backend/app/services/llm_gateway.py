@@ -0,0 +1,341 @@
+"""
+Shared async gateway for LLM completions.
+
+Every LLM call in the backend goes through one AsyncOpenAI client on a pooled
+HTTP connection pool, so completions never block the event loop. Calls are
+tagged with a purpose ("intent", "summary"); each purpose has its own
+concurrency limit inside a global one, so long summary calls cannot hold the
+slots that latency-sensitive intent calls need. Each call has a deadline
+covering queueing and retries, transient errors are retried with jittered
+exponential backoff, and latency and token usage are accounted per purpose.
+Completions can be streamed to a callback so callers can act on the first
+tokens before the model has finished.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from app.services.config import (
+    LLM_BASE_URL,
+    LLM_INTENT_CONCURRENCY,
+    LLM_INTENT_DEADLINE_SECONDS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_RETRIES,
+    LLM_MODEL,
+    LLM_RETRY_BASE_DELAY_SECONDS,
+    LLM_SUMMARY_CONCURRENCY,
+    LLM_SUMMARY_DEADLINE_SECONDS,
+)
+from app.services.metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+INTENT = "intent"
+SUMMARY = "summary"
+
+# Errors worth another attempt; anything else (bad request, auth) is final
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class PurposeStats:
+    """Latency, retry and token accounting for one purpose."""
+
+    def __init__(self):
+        self.latency = LatencyRecorder()
+        self.queue_wait = LatencyRecorder()
+        self.first_token = LatencyRecorder()
+        self.counters = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "deadline_exceeded": 0,
+        }
+        self.in_flight = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "counters": dict(self.counters),
+            "tokens": {
+                "prompt": self.prompt_tokens,
+                "completion": self.completion_tokens,
+            },
+            "latency": self.latency.stats(),
+            "queue_wait": self.queue_wait.stats(),
+            "first_token": self.first_token.stats(),
+        }
+
+
+class LLMGateway:
+    """
+    Pooled, concurrency-limited access to the chat completions API.
+    """
+
+    def __init__(
+        self,
+        base_url: str = LLM_BASE_URL,
+        api_key: Optional[str] = None,
+        model: str = LLM_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        purpose_limits: Optional[Dict[str, int]] = None,
+        deadlines: Optional[Dict[str, float]] = None,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_delay: float = LLM_RETRY_BASE_DELAY_SECONDS,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+    ):
+        """
+        Initialize the gateway; the HTTP client is created on first use.
+
+        Args:
+            base_url: OpenAI-compatible API base URL
+            api_key: API key, OPENROUTER_API_KEY if omitted
+            model: Default model
+            max_concurrency: Most completions in flight across all purposes
+            purpose_limits: Most completions in flight per purpose
+            deadlines: Default deadline in seconds per purpose
+            max_retries: Retries after the first attempt for transient errors
+            retry_base_delay: Base of the exponential backoff, in seconds
+            max_connections: Size of the HTTP connection pool
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.max_connections = max_connections
+        self.purpose_limits = purpose_limits or {
+            INTENT: LLM_INTENT_CONCURRENCY,
+            SUMMARY: LLM_SUMMARY_CONCURRENCY,
+        }
+        self.deadlines = deadlines or {
+            INTENT: LLM_INTENT_DEADLINE_SECONDS,
+            SUMMARY: LLM_SUMMARY_DEADLINE_SECONDS,
+        }
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._purpose = {
+            purpose: asyncio.Semaphore(limit)
+            for purpose, limit in self.purpose_limits.items()
+        }
+        self._stats: Dict[str, PurposeStats] = {}
+        self._client: Optional[AsyncOpenAI] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """The AsyncOpenAI client on the pooled HTTP client."""
+        if self._client is None:
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            )
+            self._client = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key or os.getenv("OPENROUTER_API_KEY"),
+                http_client=self._http,
+                max_retries=0,
+            )
+        return self._client
+
+    def _purpose_stats(self, purpose: str) -> PurposeStats:
+        if purpose not in self._stats:
+            self._stats[purpose] = PurposeStats()
+        return self._stats[purpose]
+
+    def _purpose_semaphore(self, purpose: str) -> asyncio.Semaphore:
+        if purpose not in self._purpose:
+            self._purpose[purpose] = asyncio.Semaphore(
+                self.purpose_limits.get(purpose, 1)
+            )
+        return self._purpose[purpose]
+
+    async def complete(
+        self,
+        purpose: str,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        deadline: Optional[float] = None,
+        on_delta: Optional[Callable[[str], None]] = None,
+        **kwargs,
+    ) -> str:
+        """
+        Run a chat completion and return the message content.
+
+        Args:
+            purpose: Purpose of the call, selects the concurrency limit
+            messages: Chat messages
+            model: Model, the gateway default if omitted
+            deadline: Seconds allowed including queueing and retries
+            on_delta: If given, the response is streamed and this is called
+                with each piece of content as it arrives
+            **kwargs: Passed to chat.completions.create, e.g. response_format
+
+        Returns:
+            The content of the first choice
+
+        Raises:
+            TimeoutError: If the deadline passes
+            openai.OpenAIError: If the request fails and cannot be retried
+        """
+        stats = self._purpose_stats(purpose)
+        stats.counters["requests"] += 1
+        deadline = deadline or self.deadlines.get(purpose, LLM_SUMMARY_DEADLINE_SECONDS)
+        start = time.perf_counter()
+
+        try:
+            async with asyncio.timeout(deadline):
+                # Purpose first, so a saturated purpose waits without holding a global slot
+                async with self._purpose_semaphore(purpose), self._global:
+                    stats.queue_wait.record(time.perf_counter() - start)
+                    stats.in_flight += 1
+                    try:
+                        response = await self._create_with_retries(
+                            stats, start + deadline, model=model or self.model,
+                            messages=messages, stream=on_delta is not None, **kwargs,
+                        )
+                        if on_delta is None:
+                            content = response.choices[0].message.content
+                            usage = response.usage
+                        else:
+                            content, usage = await self._consume_stream(
+                                response, on_delta, stats, start
+                            )
+                    finally:
+                        stats.in_flight -= 1
+        except TimeoutError:
+            stats.counters["deadline_exceeded"] += 1
+            stats.counters["failed"] += 1
+            logger.error(f"LLM {purpose} call exceeded its {deadline}s deadline")
+            raise
+        except Exception:
+            stats.counters["failed"] += 1
+            raise
+
+        stats.counters["succeeded"] += 1
+        stats.latency.record(time.perf_counter() - start)
+        if usage is not None:
+            stats.prompt_tokens += usage.prompt_tokens or 0
+            stats.completion_tokens += usage.completion_tokens or 0
+        return content
+
+    async def complete_json(
+        self,
+        purpose: str,
+        prompt: str,
+        model: Optional[str] = None,
+        deadline: Optional[float] = None,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run a single-prompt completion in JSON mode and parse the result.
+
+        Args:
+            purpose: Purpose of the call
+            prompt: User prompt
+            model: Model, the gateway default if omitted
+            deadline: Seconds allowed including queueing and retries
+            on_delta: If given, the response is streamed to this callback
+
+        Returns:
+            The parsed JSON object
+
+        Raises:
+            TimeoutError: If the deadline passes
+            openai.OpenAIError: If the request fails and cannot be retried
+            json.JSONDecodeError: If the model did not return valid JSON
+        """
+        content = await self.complete(
+            purpose,
+            [{"role": "user", "content": prompt}],
+            model=model,
+            deadline=deadline,
+            on_delta=on_delta,
+            response_format={"type": "json_object"},
+        )
+        return json.loads(content)
+
+    async def _consume_stream(
+        self,
+        stream,
+        on_delta: Callable[[str], None],
+        stats: PurposeStats,
+        start: float,
+    ) -> Tuple[str, Any]:
+        """
+        Read a streamed completion, forwarding content as it arrives.
+
+        Returns:
+            The full content, and the usage if the provider sent it
+        """
+        parts: List[str] = []
+        usage = None
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if not parts:
+                stats.first_token.record(time.perf_counter() - start)
+            parts.append(delta)
+            on_delta(delta)
+        if usage is None:
+            # Without usage in the stream, count content chunks (about one token each)
+            stats.completion_tokens += len(parts)
+        return "".join(parts), usage
+
+    async def _create_with_retries(self, stats: PurposeStats, expires_at: float, **kwargs):
+        attempt = 0
+        while True:
+            remaining = expires_at - time.perf_counter()
+            try:
+                return await self.client.chat.completions.create(
+                    timeout=max(remaining, 0.001), **kwargs
+                )
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                # Full jitter, and never sleep past the deadline
+                delay = random.uniform(0, self.retry_base_delay * 2 ** attempt)
+                if time.perf_counter() + delay >= expires_at:
+                    raise
+                attempt += 1
+                stats.counters["retries"] += 1
+                logger.warning(f"LLM call failed ({e.__class__.__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        """Close the HTTP connection pool; it is recreated on next use."""
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+        self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Report per-purpose counters, tokens and latency."""
+        return {purpose: stats.stats() for purpose, stats in self._stats.items()}
+
+
+# Shared by every service that calls the LLM
+llm_gateway = LLMGateway()
@@ -0,0 +1,67 @@
+"""
+Lightweight in-process metrics helpers.
+"""
+import time
+from collections import deque
+from typing import Dict, Any
+
+
+class LatencyRecorder:
+    """
+    Keeps a rolling window of latency samples and summarises them.
+    """
+
+    def __init__(self, window: int = 512):
+        """
+        Initialize the recorder.
+
+        Args:
+            window: Number of most recent samples kept for percentiles
+        """
+        self._samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Record one latency sample, in seconds."""
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def time(self) -> "_Timer":
+        """Return a context manager that records the elapsed time of its block."""
+        return _Timer(self)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summarise the recorded samples in milliseconds.
+
+        Returns:
+            Dictionary with count, mean, p50, p95 and max
+        """
+        if not self._samples:
+            return {"count": self.count, "avg_ms": None, "p50_ms": None, "p95_ms": None, "max_ms": None}
+
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2),
+            "p50_ms": round(ordered[last // 2] * 1000, 2),
+            "p95_ms": round(ordered[int(last * 0.95)] * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+
+
+class _Timer:
+    def __init__(self, recorder: LatencyRecorder):
+        self._recorder = recorder
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._recorder.record(time.perf_counter() - self._start)
+        return False
@@ -0,0 +1,303 @@
+"""
+Cache of News API responses with stale-while-revalidate refresh.
+
+Headlines change over minutes and News API allows few requests per day, so
+responses are cached by request (endpoint, query and rolling date window). A fresh
+entry is served as is. An entry past its TTL but within the stale window is
+still served at once while a background refresh replaces it. Only a missing
+or very old entry makes the caller wait for News API, and once the day's
+quota is spent even very old entries are served.
+
+A background job keeps market news and the most requested tickers warm,
+refreshing them before anyone asks. Refreshes share a slice of the daily
+quota and are spread over the day, so they never starve requests that have
+to go upstream.
+"""
+import asyncio
+import copy
+import logging
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from app.services.config import (
+    NEWS_API_DAILY_QUOTA,
+    NEWS_CACHE_HOT_TICKERS,
+    NEWS_CACHE_REFRESH_CHECK_SECONDS,
+    NEWS_CACHE_REFRESH_SHARE,
+    NEWS_CACHE_SIZE,
+    NEWS_CACHE_STALE_SECONDS,
+    NEWS_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Fetches a response from News API; returns an error dict on failure
+NewsLoader = Callable[[], Awaitable[Dict[str, Any]]]
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+class DailyQuota:
+    """Counts requests against a limit that resets each UTC day."""
+
+    def __init__(self, limit: int = NEWS_API_DAILY_QUOTA):
+        self.limit = limit
+        self.day: Optional[str] = None
+        self.used = 0
+
+    def _roll(self) -> None:
+        today = datetime.now(timezone.utc).date().isoformat()
+        if today != self.day:
+            self.day, self.used = today, 0
+
+    def record(self) -> None:
+        """Count one request."""
+        self._roll()
+        self.used += 1
+
+    def remaining(self) -> int:
+        """Requests left today."""
+        self._roll()
+        return max(0, self.limit - self.used)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report today's usage."""
+        self._roll()
+        return {"day": self.day, "used": self.used, "limit": self.limit, "remaining": self.remaining()}
+
+
+class _Entry:
+    __slots__ = ("data", "load", "fetched_at")
+
+    def __init__(self, data: Dict[str, Any], load: NewsLoader):
+        self.data = data
+        self.load = load
+        self.fetched_at = time.monotonic()
+
+
+class NewsCache:
+    """
+    LRU cache of News API responses that serves stale entries while refreshing.
+
+    Not thread-safe: use it from the event loop only.
+    """
+
+    def __init__(
+        self,
+        quota: DailyQuota,
+        max_entries: int = NEWS_CACHE_SIZE,
+        ttl_seconds: float = NEWS_CACHE_TTL_SECONDS,
+        stale_seconds: float = NEWS_CACHE_STALE_SECONDS,
+        hot_tickers: int = NEWS_CACHE_HOT_TICKERS,
+        refresh_share: float = NEWS_CACHE_REFRESH_SHARE,
+        check_interval: float = NEWS_CACHE_REFRESH_CHECK_SECONDS,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            quota: Daily News API quota, also counting requests made elsewhere
+            max_entries: Most entries kept before the least recently used is evicted
+            ttl_seconds: How long an entry is served without refreshing it
+            stale_seconds: How long an entry may be served while it refreshes
+            hot_tickers: How many of the most requested tickers are kept warm
+            refresh_share: Share of the daily quota background refreshes may use
+            check_interval: Seconds between checks for warm entries due a refresh
+        """
+        self.quota = quota
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.hot_tickers = hot_tickers
+        self.check_interval = check_interval
+        self.refresh_budget = DailyQuota(int(quota.limit * refresh_share))
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        # Keys whose last refresh failed are not refreshed again before this time
+        self._retry_at: Dict[Hashable, float] = {}
+        # Requests per tag (a ticker) and the key each tag last asked for
+        self._requests: Counter = Counter()
+        self._tag_keys: Dict[str, Hashable] = {}
+        # Tags kept warm whether or not they are requested, with their loaders
+        self._pinned: Dict[str, NewsLoader] = {}
+        self._job: Optional[asyncio.Task] = None
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "refreshes_skipped": 0,
+            "evictions": 0,
+        }
+
+    async def get(self, key: Hashable, load: NewsLoader, tag: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get a response from the cache, loading it on a miss.
+
+        Args:
+            key: Canonical request key
+            load: Fetches the response from News API
+            tag: Ticker the request is for, counted towards the hot set
+
+        Returns:
+            A copy of the cached response, or the loaded response or error dict
+        """
+        if tag is not None:
+            self._requests[tag] += 1
+            self._tag_keys[tag] = key
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            # With the day's quota spent, an old answer beats none
+            if age < self.stale_seconds or self.quota.remaining() == 0:
+                self._entries.move_to_end(key)
+                if age < self.ttl_seconds:
+                    self.counters["hits"] += 1
+                else:
+                    self.counters["stale_hits"] += 1
+                    self._refresh_later(key, load)
+                return copy.deepcopy(entry.data)
+
+        self.counters["misses"] += 1
+        data = await load()
+        if "error" not in data:
+            self._store(key, copy.deepcopy(data), load)
+        return data
+
+    def pin(self, tag: str, key: Hashable, load: NewsLoader) -> None:
+        """
+        Keep a request warm whether or not it is asked for.
+
+        Args:
+            tag: Name of the request in the hot set
+            key: Canonical request key
+            load: Fetches the response from News API
+        """
+        self._pinned[tag] = load
+        self._tag_keys[tag] = key
+
+    def hot_tags(self) -> List[str]:
+        """Pinned tags followed by the most requested ones."""
+        ranked = [tag for tag, _ in self._requests.most_common(self.hot_tickers + len(self._pinned))]
+        return list(self._pinned) + [tag for tag in ranked if tag not in self._pinned][:self.hot_tickers]
+
+    def refresh_interval(self, hot: int) -> float:
+        """
+        Seconds between refreshes of each warm entry.
+
+        At least the TTL, and long enough that refreshing every warm entry
+        stays within the daily refresh budget.
+        """
+        if self.refresh_budget.limit <= 0:
+            return float("inf")
+        return max(self.ttl_seconds, DAY_SECONDS * hot / self.refresh_budget.limit)
+
+    async def refresh_hot(self) -> int:
+        """
+        Refresh the warm entries that are due, oldest first.
+
+        Returns:
+            Number of entries refreshed
+        """
+        tags = self.hot_tags()
+        interval = self.refresh_interval(len(tags))
+        now = time.monotonic()
+        due = []
+        for tag in tags:
+            key = self._tag_keys[tag]
+            entry = self._entries.get(key)
+            if entry is None:
+                load = self._pinned.get(tag)
+                if load is not None:
+                    due.append((0.0, key, load))
+            elif now - entry.fetched_at >= interval:
+                due.append((entry.fetched_at, key, entry.load))
+
+        refreshed = 0
+        for _, key, load in sorted(due, key=lambda item: item[0]):
+            if key in self._refreshing or self._retry_at.get(key, 0.0) > now:
+                continue
+            if not self._may_refresh():
+                break
+            await self._refresh(key, load)
+            refreshed += 1
+        return refreshed
+
+    def _may_refresh(self) -> bool:
+        if self.refresh_budget.remaining() > 0 and self.quota.remaining() > 0:
+            return True
+        self.counters["refreshes_skipped"] += 1
+        return False
+
+    def _refresh_later(self, key: Hashable, load: NewsLoader) -> None:
+        if key in self._refreshing or self._retry_at.get(key, 0.0) > time.monotonic():
+            return
+        if not self._may_refresh():
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key, load))
+
+    async def _refresh(self, key: Hashable, load: NewsLoader) -> None:
+        self.refresh_budget.record()
+        self.counters["refreshes"] += 1
+        try:
+            data = await load()
+        except Exception as e:
+            data = {"error": str(e)}
+        finally:
+            self._refreshing.pop(key, None)
+        if "error" in data:
+            # Keep serving the stale entry until it is too old
+            self.counters["refresh_errors"] += 1
+            self._retry_at[key] = time.monotonic() + self.ttl_seconds
+            logger.warning(f"Could not refresh cached news: {data['error']}")
+            return
+        self._retry_at.pop(key, None)
+        self._store(key, copy.deepcopy(data), load)
+
+    def _store(self, key: Hashable, data: Dict[str, Any], load: NewsLoader) -> None:
+        self._entries[key] = _Entry(data, load)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def start(self) -> None:
+        """Keep the hot set warm on the running loop."""
+        if self._job is None:
+            self._job = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background refreshes."""
+        tasks = [self._job, *self._refreshing.values()]
+        tasks = [task for task in tasks if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._job = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_hot()
+            except Exception as e:
+                logger.error(f"Error refreshing hot news: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report hit rates, the hot set and how much of the quota refreshes used."""
+        tags = self.hot_tags()
+        interval = self.refresh_interval(len(tags))
+        served = self.counters["hits"] + self.counters["stale_hits"]
+        lookups = served + self.counters["misses"]
+        return {
+            "entries": len(self._entries),
+            "counters": dict(self.counters),
+            "hit_rate": round(served / lookups, 4) if lookups else None,
+            "hot": tags,
+            "refresh_interval_seconds": round(interval, 1) if interval != float("inf") else None,
+            "refresh_budget": self.refresh_budget.stats(),
+        }
@@ -1,16 +1,84 @@
 """
 Service to handle News API requests.
 """
-import aiohttp
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Hashable, Optional, Tuple
 from datetime import datetime, timedelta
 
-from app.core.config import NEWS_API_KEY, NEWS_API_BASE_URL
+from app.services.config import NEWS_API_KEY, NEWS_API_BASE_URL, NEWS_CACHE_ENABLED
+from app.services.http_client import http_client
+from app.services.news_cache import DailyQuota, NewsCache, NewsLoader
+from app.services.single_flight import SingleFlight, canonical_key
 
 class NewsService:
     def __init__(self):
         self.api_key = NEWS_API_KEY
         self.base_url = NEWS_API_BASE_URL
+        self.single_flight = SingleFlight()
+        self.quota = DailyQuota()
+        self.cache = NewsCache(self.quota) if NEWS_CACHE_ENABLED else None
+
+    def start(self) -> None:
+        """Keep market news and the most requested tickers' news warm."""
+        if self.cache is None or not self.api_key:
+            return
+        key, load = self._news_loader("/top-headlines", self._market_params())
+        self.cache.pin("market", key, load)
+        self.cache.start()
+
+    async def stop(self) -> None:
+        """Stop refreshing cached news."""
+        if self.cache is not None:
+            await self.cache.stop()
+
+    async def _news_get(
+        self, path: str, params: Dict[str, Any], tag: Optional[str] = None, days: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Make a GET request to News API, served from the cache and sharing identical concurrent requests."""
+        key, load = self._news_loader(path, params, days)
+        if self.cache is None:
+            return await load()
+        return await self.cache.get(key, load, tag)
+
+    def _news_loader(
+        self, path: str, params: Dict[str, Any], days: Optional[int] = None
+    ) -> Tuple[Hashable, NewsLoader]:
+        """
+        Build the cache key and loader for a request.
+
+        Args:
+            path: Path below the API base URL
+            params: Query parameters
+            days: If given, the request covers the last this many days; the
+                key holds the rolling window and each load computes its dates,
+                so a cached entry refreshes into the current window
+
+        Returns:
+            (cache key, loader)
+        """
+        url = f"{self.base_url}{path}"
+        if days is None:
+            key = canonical_key(url, params)
+            return key, lambda: self.single_flight.do(key, lambda: self._news_request(url, params))
+
+        def load():
+            to_date = datetime.now()
+            from_date = to_date - timedelta(days=days)
+            dated = {**params, "from": from_date.strftime("%Y-%m-%d"), "to": to_date.strftime("%Y-%m-%d")}
+            return self.single_flight.do(canonical_key(url, dated), lambda: self._news_request(url, dated))
+
+        return canonical_key(url, {**params, "days": days}), load
+
+    async def _news_request(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.quota.record()
+        try:
+            async with http_client.session.get(url, params=params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data
+                else:
+                    return {"error": f"API error: {response.status}"}
+        except Exception as e:
+            return {"error": str(e)}
         
     async def get_stock_news(self, ticker: str, company_name: Optional[str] = None, days: int = 7) -> Dict[str, Any]:
         """Get news articles related to a stock ticker.
@@ -23,61 +91,44 @@ class NewsService:
         if not self.api_key:
             return {"error": "No API key available"}
         
-        # Calculate date range
-        to_date = datetime.now()
-        from_date = to_date - timedelta(days=days)
-        
         # Build search query
         query = ticker
         if company_name:
             query = f"{ticker} OR {company_name}"
             
-        url = f"{self.base_url}/everything"
         params = {
             "apiKey": self.api_key,
             "q": query,
             "language": "en",
             "sortBy": "publishedAt",
-            "from": from_date.strftime("%Y-%m-%d"),
-            "to": to_date.strftime("%Y-%m-%d"),
             "pageSize": 10
         }
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data
-                    else:
-                        return {"error": f"API error: {response.status}"}
-            except Exception as e:
-                return {"error": str(e)}
+
+        # The from/to dates are filled in from days when the request is made
+        return await self._news_get("/everything", params, tag=ticker.upper(), days=days)
     
     async def get_market_news(self) -> Dict[str, Any]:
         """Get general market news."""
         if not self.api_key:
             return {"error": "No API key available"}
-        
-        url = f"{self.base_url}/top-headlines"
-        params = {
+
+        return await self._news_get("/top-headlines", self._market_params())
+
+    def _market_params(self) -> Dict[str, Any]:
+        return {
             "apiKey": self.api_key,
             "category": "business",
             "language": "en",
             "country": "us",
             "pageSize": 10
         }
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data
-                    else:
-                        return {"error": f"API error: {response.status}"}
-            except Exception as e:
-                return {"error": str(e)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the cache and today's News API quota usage."""
+        return {
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "quota": self.quota.stats(),
+        }
 
 # Create singleton instance
 news_service = NewsService() 
\ No newline at end of file
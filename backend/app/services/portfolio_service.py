@@ -3,6 +3,9 @@ import os
 from pathlib import Path
 import logging
 
+from app.services.config import DAILY_SNAPSHOT_ENABLED
+from app.services.daily_snapshot import daily_snapshot
+
 logger = logging.getLogger(__name__)
 
 class PortfolioService:
@@ -26,5 +29,20 @@ class PortfolioService:
             logger.error(f"Error loading portfolio from {url}: {str(e)}")
             return []
 
+    def with_latest_closes(self, portfolio):
+        """Add each holding's latest close and its date from the daily snapshot, where it has one."""
+        if not DAILY_SNAPSHOT_ENABLED or not isinstance(portfolio, dict):
+            return portfolio
+        holdings = portfolio.get("portfolio", {}).get("holdings", [])
+        closes = daily_snapshot.latest_many(
+            holding["ticker"] for holding in holdings if holding.get("ticker")
+        )
+        for holding in holdings:
+            bar = closes.get(str(holding.get("ticker", "")).upper())
+            if bar is not None:
+                holding["last_close"] = bar["c"]
+                holding["last_close_date"] = bar["date"]
+        return portfolio
+
         
         
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""
+Live price updates for stock cards on the dashboard WebSocket.
+
+A client subscribes to the tickers of the cards it shows. One poller
+refreshes every subscribed ticker with a multi-ticker snapshot request each
+interval, however many clients watch them, so upstream load grows with the
+number of distinct tickers and not with viewers. When a quote changes, a
+compact update is queued for every subscriber. Updates queued for a client
+are coalesced, keeping only the latest per ticker, and sent at most once per
+client interval. A slow client therefore receives fewer, fresher messages
+instead of a growing backlog.
+
+Failed polls double the interval up to PRICE_FEED_MAX_BACKOFF_SECONDS, and a
+plan without snapshot access stops polling altogether, so an outage or a
+refused endpoint does not keep spending the key budget.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.services.config import (
+    PRICE_FEED_CLIENT_INTERVAL_SECONDS,
+    PRICE_FEED_MAX_BACKOFF_SECONDS,
+    PRICE_FEED_MAX_TICKERS_PER_CLIENT,
+    PRICE_FEED_POLL_SECONDS,
+    PRICE_FEED_TICKERS_PER_REQUEST,
+)
+from app.services.stock_service import stock_service
+
+logger = logging.getLogger(__name__)
+
+# Takes tickers; returns ticker -> {"price", "change", "change_percent", ...} or an error dict
+QuoteFetcher = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+
+class _Client:
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.tickers: Set[str] = set()
+        # Latest unsent update per ticker
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.last_sent = 0.0
+        self.sender: Optional[asyncio.Task] = None
+
+
+class PriceFeed:
+    """
+    Shared quote poller with per-client subscriptions. All methods must be
+    called on the event loop thread.
+    """
+
+    def __init__(
+        self,
+        fetch_quotes: Optional[QuoteFetcher] = None,
+        poll_interval: float = PRICE_FEED_POLL_SECONDS,
+        client_interval: float = PRICE_FEED_CLIENT_INTERVAL_SECONDS,
+        max_tickers_per_client: int = PRICE_FEED_MAX_TICKERS_PER_CLIENT,
+        tickers_per_request: int = PRICE_FEED_TICKERS_PER_REQUEST,
+        max_backoff: float = PRICE_FEED_MAX_BACKOFF_SECONDS,
+    ):
+        """
+        Initialize the feed; polling starts with the first subscription.
+
+        Args:
+            fetch_quotes: Quote source, defaults to StockService.get_quotes
+            poll_interval: Seconds between refreshes of every subscribed ticker
+            client_interval: Least seconds between two messages to one client
+            max_tickers_per_client: Most tickers one client may watch
+            tickers_per_request: Most tickers per upstream request
+            max_backoff: Longest interval between polls after repeated failures
+        """
+        self.fetch_quotes = fetch_quotes or stock_service.get_quotes
+        self.poll_interval = poll_interval
+        self.client_interval = client_interval
+        self.max_tickers_per_client = max_tickers_per_client
+        self.tickers_per_request = tickers_per_request
+        self.max_backoff = max_backoff
+        # Polls in a row that failed, and why polling stopped for good, if it did
+        self.failures = 0
+        self.disabled: Optional[str] = None
+        self.quotes: Dict[str, Dict[str, Any]] = {}
+        self.subscribers: Dict[str, Set[int]] = {}
+        self.clients: Dict[int, _Client] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.counters = {
+            "polls": 0,
+            "upstream_requests": 0,
+            "upstream_errors": 0,
+            "updates": 0,
+            "coalesced": 0,
+            "messages_sent": 0,
+            "send_errors": 0,
+        }
+
+    def subscribe(self, websocket, tickers: Iterable[str]) -> List[str]:
+        """
+        Start sending a client updates for some tickers.
+
+        The last known quote of each ticker is sent straight away; tickers
+        not seen before are fetched without waiting for the next poll.
+
+        Args:
+            websocket: The client's connection
+            tickers: Tickers to watch
+
+        Returns:
+            The tickers now watched by this subscription, upper-cased; tickers
+            over the client's limit are left out
+        """
+        client = self.clients.setdefault(id(websocket), _Client(websocket))
+        accepted = []
+        for ticker in tickers:
+            ticker = str(ticker).strip().upper()
+            if not ticker:
+                continue
+            if ticker not in client.tickers:
+                if len(client.tickers) >= self.max_tickers_per_client:
+                    continue
+                client.tickers.add(ticker)
+                self.subscribers.setdefault(ticker, set()).add(id(websocket))
+            accepted.append(ticker)
+            if ticker in self.quotes:
+                self._queue(client, ticker, self.quotes[ticker])
+
+        if self.disabled is not None:
+            return accepted
+        if any(ticker not in self.quotes for ticker in accepted):
+            self._wake.set()
+        if self.subscribers and (self._poller is None or self._poller.done()):
+            self._poller = asyncio.create_task(self._run())
+        return accepted
+
+    def unsubscribe(self, websocket, tickers: Iterable[str]) -> None:
+        """Stop sending a client updates for some tickers."""
+        client = self.clients.get(id(websocket))
+        if client is None:
+            return
+        for ticker in tickers:
+            ticker = str(ticker).strip().upper()
+            client.tickers.discard(ticker)
+            client.pending.pop(ticker, None)
+            watchers = self.subscribers.get(ticker)
+            if watchers is not None:
+                watchers.discard(id(websocket))
+                if not watchers:
+                    del self.subscribers[ticker]
+                    self.quotes.pop(ticker, None)
+
+    def remove(self, websocket) -> None:
+        """Drop every subscription of a disconnected client."""
+        client = self.clients.get(id(websocket))
+        if client is None:
+            return
+        self.unsubscribe(websocket, list(client.tickers))
+        if client.sender is not None and not client.sender.done():
+            client.sender.cancel()
+        del self.clients[id(websocket)]
+
+    async def poll(self, tickers: List[str]) -> bool:
+        """
+        Refresh quotes for some tickers and queue updates for the ones that changed.
+
+        Args:
+            tickers: Tickers to refresh
+
+        Returns:
+            True if every request succeeded
+        """
+        self.counters["polls"] += 1
+        ok = True
+        for start in range(0, len(tickers), self.tickers_per_request):
+            chunk = tickers[start:start + self.tickers_per_request]
+            self.counters["upstream_requests"] += 1
+            quotes = await self.fetch_quotes(chunk)
+            if quotes.get("not_authorized"):
+                # Every later request would be refused too
+                self.disabled = quotes["error"]
+                self.counters["upstream_errors"] += 1
+                logger.error(f"Live prices are not available on this Polygon plan, stopping the price feed: {quotes['error']}")
+                return False
+            if "error" in quotes:
+                # Keep the last quotes and try again at the next poll
+                ok = False
+                self.counters["upstream_errors"] += 1
+                logger.error(f"Could not refresh quotes for {len(chunk)} tickers: {quotes['error']}")
+                continue
+            for ticker, quote in quotes.items():
+                self._publish(ticker, quote)
+        return ok
+
+    def _publish(self, ticker: str, quote: Dict[str, Any]) -> None:
+        watchers = self.subscribers.get(ticker)
+        if not watchers:
+            return
+        update = {
+            "price": quote.get("price"),
+            "change": quote.get("change"),
+            "change_percent": quote.get("change_percent"),
+        }
+        if self.quotes.get(ticker) == update:
+            return
+        self.quotes[ticker] = update
+        self.counters["updates"] += 1
+        for client_id in watchers:
+            self._queue(self.clients[client_id], ticker, update)
+
+    def _queue(self, client: _Client, ticker: str, update: Dict[str, Any]) -> None:
+        if ticker in client.pending:
+            self.counters["coalesced"] += 1
+        client.pending[ticker] = update
+        # A running sender picks up whatever is pending when it next sends
+        if client.sender is None or client.sender.done():
+            client.sender = asyncio.create_task(self._send(client))
+
+    async def _send(self, client: _Client) -> None:
+        while client.pending:
+            delay = client.last_sent + self.client_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            updates, client.pending = client.pending, {}
+            client.last_sent = time.monotonic()
+            try:
+                await client.websocket.send_json({"type": "price_update", "updates": updates})
+                self.counters["messages_sent"] += 1
+            except Exception as e:
+                # The connection is gone; its handler removes the client
+                self.counters["send_errors"] += 1
+                logger.error(f"Error sending price update: {e}")
+                return
+
+    def _interval(self) -> float:
+        return min(self.poll_interval * 2 ** min(self.failures, 16), max(self.max_backoff, self.poll_interval))
+
+    async def _run(self) -> None:
+        next_full = 0.0
+        while self.subscribers and self.disabled is None:
+            # Cleared before polling so a subscription during the poll still wakes the next wait
+            self._wake.clear()
+            try:
+                if time.monotonic() >= next_full:
+                    ok = await self.poll(list(self.subscribers))
+                    self.failures = 0 if ok else self.failures + 1
+                    next_full = time.monotonic() + self._interval()
+                elif self.failures == 0:
+                    # Woken by a subscription: fetch only tickers with no quote yet
+                    fresh = [ticker for ticker in self.subscribers if ticker not in self.quotes]
+                    if fresh:
+                        await self.poll(fresh)
+            except Exception as e:
+                self.failures += 1
+                next_full = time.monotonic() + self._interval()
+                logger.error(f"Error polling quotes: {e}")
+            if self.disabled is not None:
+                return
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, next_full - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        """Stop polling and sending."""
+        tasks = [self._poller] + [client.sender for client in self.clients.values()]
+        tasks = [task for task in tasks if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._poller = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Report subscriptions, upstream polling and how many updates were coalesced."""
+        return {
+            "clients": len(self.clients),
+            "tickers": len(self.subscribers),
+            "subscriptions": sum(len(watchers) for watchers in self.subscribers.values()),
+            "poll_interval_seconds": self._interval(),
+            "failures": self.failures,
+            "disabled": self.disabled,
+            "counters": dict(self.counters),
+        }
+
+
+# Shared by every dashboard connection
+price_feed = PriceFeed()
@@ -0,0 +1,331 @@
+"""
+Storage backends for per-key token buckets.
+
+KeyCyclingService keeps its priority queue in-process but delegates the
+buckets themselves to a backend, so that several uvicorn workers can share
+one quota per key. A backend provides three atomic operations on a key's
+bucket: take a token, report when the next token is due, and block the key
+after an upstream 429.
+
+- MemoryQuotaBackend: process-local. Suits a single worker and tests.
+- FileQuotaBackend: a memory-mapped table in a shared file, updated under
+  flock. Every worker on the host coordinates through it at a cost of a few
+  microseconds per operation.
+- RedisQuotaBackend: the same operations as a Lua script, for workers spread
+  over several hosts. Its operations are coroutines (is_async), so a round
+  trip to Redis never blocks the event loop. Needs the optional redis package
+  (see requirements.txt).
+"""
+import contextlib
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A stored time this far ahead of the clock means the host rebooted since
+CLOCK_RESET_SECONDS = 3600.0
+
+
+def _refill(state: List[float], capacity: float, rate: float, now: float) -> None:
+    # state is [tokens, updated, blocked_until]
+    if state[1] - now > CLOCK_RESET_SECONDS:
+        # Written before a reboot reset the monotonic clock
+        state[0], state[1], state[2] = capacity, now, 0.0
+    state[0] = min(capacity, state[0] + max(0.0, now - state[1]) * rate)
+    state[1] = now
+
+
+def _take(state: List[float], capacity: float, rate: float, now: float) -> bool:
+    _refill(state, capacity, rate, now)
+    if now < state[2] or state[0] < 1:
+        return False
+    state[0] -= 1
+    return True
+
+
+def _available_at(state: List[float], capacity: float, rate: float, now: float) -> float:
+    _refill(state, capacity, rate, now)
+    return max(state[2], now + max(0.0, 1 - state[0]) / rate)
+
+
+def _block(state: List[float], until: float, now: float) -> None:
+    state[0], state[1], state[2] = 0.0, now, max(state[2], until)
+
+
+class MemoryQuotaBackend:
+    """
+    Token buckets held in this process.
+    """
+
+    name = "memory"
+    is_async = False
+
+    def __init__(self, keys: List[str], capacity: float, rate: float):
+        """
+        Initialize full buckets.
+
+        Args:
+            keys: API keys; operations address them by index
+            capacity: Tokens a rested key holds
+            rate: Tokens added per second
+        """
+        self.capacity = capacity
+        self.rate = rate
+        now = time.monotonic()
+        self._state = [[capacity, now, 0.0] for _ in keys]
+
+    def take(self, index: int, now: float) -> bool:
+        """Take a token from a key if it has one and is not blocked."""
+        return _take(self._state[index], self.capacity, self.rate, now)
+
+    def available_at(self, index: int, now: float) -> float:
+        """Get the monotonic time at which the key will next have a token."""
+        return _available_at(self._state[index], self.capacity, self.rate, now)
+
+    def block(self, index: int, until: float, now: float) -> None:
+        """Drain a key and keep it unavailable until the given monotonic time."""
+        _block(self._state[index], until, now)
+
+
+class FileQuotaBackend:
+    """
+    Token buckets in a memory-mapped file shared by every process on the host.
+
+    The file is a table of fixed-size slots. Each slot holds a key fingerprint,
+    so keys never appear on disk, followed by the bucket state. Slots are
+    claimed on first use and found again by fingerprint, so workers agree on
+    them whatever order their keys are configured in. Each operation takes an
+    exclusive flock on the file. Times come from the monotonic clock, which
+    every process on a host shares.
+    """
+
+    name = "file"
+    is_async = False
+
+    _SLOT = struct.Struct("<8sddd")
+    _SLOTS = 256
+
+    def __init__(self, keys: List[str], capacity: float, rate: float, path: str):
+        """
+        Open or create the shared table and find or claim a slot per key.
+
+        Args:
+            keys: API keys; operations address them by index
+            capacity: Tokens a rested key holds
+            rate: Tokens added per second
+            path: Shared file; workers coordinate by using the same path
+        """
+        self.capacity = capacity
+        self.rate = rate
+        self.path = path
+        size = self._SLOT.size * self._SLOTS
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        with self._locked():
+            self._offsets = [self._claim(key) for key in keys]
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _claim(self, key: str) -> int:
+        fingerprint = hashlib.sha256(key.encode()).digest()[:8]
+        empty = None
+        for slot in range(self._SLOTS):
+            offset = slot * self._SLOT.size
+            stored = self._SLOT.unpack_from(self._map, offset)[0]
+            if stored == fingerprint:
+                return offset
+            if empty is None and stored == bytes(8):
+                empty = offset
+        if empty is None:
+            raise RuntimeError(f"Quota table {self.path} has no free slots")
+        self._SLOT.pack_into(self._map, empty, fingerprint, self.capacity, time.monotonic(), 0.0)
+        return empty
+
+    def _update(self, index: int, operation: Callable[[List[float]], Any]) -> Any:
+        offset = self._offsets[index]
+        with self._locked():
+            fingerprint, *state = self._SLOT.unpack_from(self._map, offset)
+            result = operation(state)
+            self._SLOT.pack_into(self._map, offset, fingerprint, *state)
+        return result
+
+    def take(self, index: int, now: float) -> bool:
+        """Take a token from a key if it has one and is not blocked."""
+        return self._update(index, lambda state: _take(state, self.capacity, self.rate, now))
+
+    def available_at(self, index: int, now: float) -> float:
+        """Get the monotonic time at which the key will next have a token."""
+        return self._update(index, lambda state: _available_at(state, self.capacity, self.rate, now))
+
+    def block(self, index: int, until: float, now: float) -> None:
+        """Drain a key and keep it unavailable until the given monotonic time."""
+        self._update(index, lambda state: _block(state, until, now))
+
+    def close(self) -> None:
+        """Unmap and close the shared file."""
+        self._map.close()
+        os.close(self._fd)
+
+
+# KEYS are bucket hashes in the order to try; ARGV holds capacity, rate, the
+# operation and its argument. "take" takes a token from the first key that has
+# one and returns {position in KEYS, "0"}, or {0, seconds until the soonest key
+# has a token}. "block" drains every key given. Time comes from the Redis
+# server so that every host shares one clock; waits are strings because Redis
+# truncates Lua numbers to integers.
+_REDIS_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local soonest = nil
+for position, key in ipairs(KEYS) do
+    local state = redis.call('HMGET', key, 'tokens', 'updated', 'blocked_until')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    local blocked_until = tonumber(state[3]) or 0
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    local taken = false
+    if ARGV[3] == 'take' then
+        if now >= blocked_until and tokens >= 1 then
+            tokens = tokens - 1
+            taken = true
+        end
+    elseif ARGV[3] == 'block' then
+        tokens = 0
+        blocked_until = math.max(blocked_until, now + tonumber(ARGV[4]))
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'updated', now, 'blocked_until', blocked_until)
+    redis.call('EXPIRE', key, 86400)
+    if taken then
+        return {position, '0'}
+    end
+    local wait = math.max(blocked_until, now + math.max(0, 1 - tokens) / rate) - now
+    if soonest == nil or wait < soonest then
+        soonest = wait
+    end
+end
+return {0, tostring(soonest or 0)}
+"""
+
+# Seconds to wait for Redis before an operation fails
+REDIS_TIMEOUT_SECONDS = 2.0
+
+
+class RedisQuotaBackend:
+    """
+    Token buckets in Redis, updated atomically by a Lua script.
+
+    Operations are coroutines. take_any tries every key in one round trip, so
+    granting a key costs one request to Redis however many keys are
+    configured. Intervals are converted between the Redis server clock and
+    each host's monotonic clock, so the monotonic times passed in are only
+    compared with each other.
+    """
+
+    name = "redis"
+    is_async = True
+
+    def __init__(self, keys: List[str], capacity: float, rate: float, url: str):
+        """
+        Check that Redis answers and register the bucket script.
+
+        Args:
+            keys: API keys; operations address them by index
+            capacity: Tokens a rested key holds
+            rate: Tokens added per second
+            url: Redis URL, e.g. redis://localhost:6379/0
+
+        Raises:
+            RuntimeError: If the redis package is not installed
+            redis.exceptions.ConnectionError: If Redis cannot be reached
+        """
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as e:
+            raise RuntimeError("The redis quota backend needs the redis package installed") from e
+        self.capacity = capacity
+        self.rate = rate
+        # Connections are lazy, so ping once here for create_quota_backend to fall back on failure
+        probe = redis.Redis.from_url(url, socket_connect_timeout=REDIS_TIMEOUT_SECONDS)
+        try:
+            probe.ping()
+        finally:
+            probe.close()
+        self._client = redis.asyncio.Redis.from_url(
+            url, socket_connect_timeout=REDIS_TIMEOUT_SECONDS, socket_timeout=REDIS_TIMEOUT_SECONDS
+        )
+        self._script = self._client.register_script(_REDIS_SCRIPT)
+        # The {polygon} hash tag keeps every bucket in one cluster slot, as the script needs
+        self._names = [
+            f"quota:{{polygon}}:{hashlib.sha256(key.encode()).hexdigest()[:16]}" for key in keys
+        ]
+
+    async def _run(self, indices: List[int], operation: str, argument: float = 0.0) -> Tuple[int, float]:
+        position, wait = await self._script(
+            keys=[self._names[index] for index in indices],
+            args=[self.capacity, self.rate, operation, argument],
+        )
+        return int(position), float(wait)
+
+    async def take_any(self, order: List[int]) -> Tuple[Optional[int], float]:
+        """
+        Take a token from the first key in order that has one.
+
+        Args:
+            order: Key indices in the order to try
+
+        Returns:
+            (index, 0.0) for the key a token was taken from, or (None, seconds
+            until the soonest key has a token)
+        """
+        position, wait = await self._run(order, "take")
+        return (order[position - 1], 0.0) if position else (None, wait)
+
+    async def block(self, index: int, until: float, now: float) -> None:
+        """Drain a key and keep it unavailable until the given monotonic time."""
+        await self._run([index], "block", max(0.0, until - now))
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self._client.aclose()
+
+
+def create_quota_backend(spec: str, keys: List[str], capacity: float, rate: float, path: str):
+    """
+    Build the backend named by configuration.
+
+    Args:
+        spec: "memory", "file" or a redis:// URL
+        keys: API keys
+        capacity: Tokens a rested key holds
+        rate: Tokens added per second
+        path: Shared file for the file backend
+
+    Returns:
+        The backend, falling back to memory if the configured one cannot be opened
+    """
+    try:
+        if spec.startswith(("redis://", "rediss://", "unix://")):
+            return RedisQuotaBackend(keys, capacity, rate, spec)
+        if spec == "file":
+            return FileQuotaBackend(keys, capacity, rate, path)
+    except Exception as e:
+        logger.error(f"Could not open the {spec} quota backend, using per-process quotas: {e}")
+    return MemoryQuotaBackend(keys, capacity, rate)
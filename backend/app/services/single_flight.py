@@ -0,0 +1,102 @@
+"""
+Request coalescing for identical concurrent upstream calls.
+
+While a call for a key is in flight, later callers with the same key wait on
+it instead of making their own. The shared call runs in its own task, so a
+waiter that is cancelled, for example because its WebSocket closed, does not
+cancel it for the others. The call is only cancelled once nobody is waiting.
+"""
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+# Query parameters that do not change the response
+IGNORED_PARAMS = {"apiKey"}
+
+
+def canonical_key(endpoint: str, params: Optional[Mapping[str, Any]] = None) -> Tuple:
+    """
+    Build a key identifying a request regardless of parameter order or API key.
+
+    Args:
+        endpoint: URL or path of the request
+        params: Query parameters
+
+    Returns:
+        A hashable key
+    """
+    normalized = tuple(
+        sorted((name, str(value)) for name, value in (params or {}).items() if name not in IGNORED_PARAMS)
+    )
+    return endpoint, normalized
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.joined = 0
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call between concurrent callers with the same key.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.counters = {"calls": 0, "executed": 0, "coalesced": 0, "abandoned": 0}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run call, or join the identical call already in flight.
+
+        Callers that shared a flight each get their own deep copy of the
+        result, so they can modify it freely.
+
+        Args:
+            key: Canonical request key
+            call: Makes the request when no identical one is in flight
+
+        Returns:
+            The result of the call; its exception is raised to every caller
+        """
+        self.counters["calls"] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.counters["executed"] += 1
+        else:
+            self.counters["coalesced"] += 1
+
+        flight.waiters += 1
+        flight.joined += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                # The last interested caller left; stop the upstream call and
+                # make sure nobody new joins it
+                flight.task.cancel()
+                self._forget(key, flight)
+                self.counters["abandoned"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+        return copy.deepcopy(result) if flight.joined > 1 else result
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Report how many calls were executed and how many were coalesced."""
+        calls = self.counters["calls"]
+        return {
+            "counters": dict(self.counters),
+            "in_flight": len(self._flights),
+            "coalesced_fraction": round(self.counters["coalesced"] / calls, 4) if calls else None,
+        }
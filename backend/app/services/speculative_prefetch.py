@@ -0,0 +1,162 @@
+"""
+Speculative market-data prefetch driven by interim transcripts.
+
+While the speaker is still talking, interim transcripts are scanned for ticker
+or company mentions and the stock bars and news for those tickers are fetched
+in the background. When the final transcript resolves to a stock card for a
+prefetched ticker, the card is served from that result; any other speculative
+work for the utterance is cancelled.
+"""
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from app.services.company_aliases import find_tickers
+from app.services.config import SPECULATIVE_MAX_TICKERS
+from app.services.key_cycling_service import PREFETCH, use_priority
+from app.services.news_service import news_service
+from app.services.stock_service import StockService, stock_service
+
+if TYPE_CHECKING:
+    from app.services.call_warmup import CallWarmup
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculationStats:
+    """Process-wide counters for speculative prefetching."""
+
+    def __init__(self):
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the speculative hit rate.
+
+        hit_rate is the share of stock cards served from a prefetch;
+        precision is the share of prefetches that ended up being used.
+        """
+        cards = self.hits + self.misses
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled,
+            "hit_rate": round(self.hits / cards, 4) if cards else None,
+            "precision": round(self.hits / self.started, 4) if self.started else None,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+class Speculation:
+    """The prefetches started while one utterance was being spoken."""
+
+    def __init__(self, tasks: Optional[Dict[str, asyncio.Task]] = None):
+        self.tasks = tasks or {}
+        # The call's warm-up, consulted when nothing was prefetched for a ticker
+        self.warmup: Optional["CallWarmup"] = None
+
+    def merge(self, other: "Speculation") -> None:
+        """Absorb the prefetches of another utterance merged into this one."""
+        for ticker, task in other.tasks.items():
+            if ticker in self.tasks:
+                task.cancel()
+                speculation_stats.cancelled += 1
+            else:
+                self.tasks[ticker] = task
+        other.tasks = {}
+
+    async def claim(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """
+        Take the prefetched data for a ticker, if any.
+
+        Args:
+            ticker: Ticker the final intent resolved to
+
+        Returns:
+            Dict with "bars" and "news", or None on a miss
+        """
+        task = self.tasks.pop(ticker.upper(), None)
+        if task is None:
+            speculation_stats.misses += 1
+            return self.warmup.claim(ticker) if self.warmup is not None else None
+        try:
+            result = await task
+        except Exception as e:
+            logger.error(f"Speculative prefetch for {ticker} failed: {e}")
+            speculation_stats.misses += 1
+            return None
+        speculation_stats.hits += 1
+        return result
+
+    def cancel(self) -> None:
+        """Cancel every prefetch that was not claimed."""
+        for task in self.tasks.values():
+            if not task.done():
+                task.cancel()
+            speculation_stats.cancelled += 1
+        self.tasks = {}
+
+
+class SpeculativePrefetcher:
+    """
+    Watches one call's interim transcripts and warms data for likely tickers.
+
+    All methods must be called on the event loop thread.
+    """
+
+    def __init__(self, max_tickers: int = SPECULATIVE_MAX_TICKERS):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            max_tickers: Most tickers prefetched per utterance
+        """
+        self.max_tickers = max_tickers
+        self.stock_service = stock_service
+        self.news_service = news_service
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def observe(self, text: str) -> None:
+        """
+        Scan an interim transcript and start prefetches for new mentions.
+
+        Args:
+            text: Interim transcript text
+        """
+        for ticker in find_tickers(text):
+            if ticker in self._pending or len(self._pending) >= self.max_tickers:
+                continue
+            logger.info(f"Speculatively prefetching {ticker}")
+            self._pending[ticker] = asyncio.create_task(self._fetch(ticker))
+            speculation_stats.started += 1
+
+    def take(self) -> Speculation:
+        """Close the current utterance and hand over its prefetches."""
+        speculation = Speculation(self._pending)
+        self._pending = {}
+        return speculation
+
+    def discard(self) -> None:
+        """Cancel the current utterance's prefetches."""
+        self.take().cancel()
+
+    async def _fetch(self, ticker: str) -> Dict[str, Any]:
+        company = StockService.TICKER_TO_COMPANY.get(ticker)
+        with use_priority(PREFETCH):
+            bars, news = await asyncio.gather(
+                self.stock_service.get_stock_bars(ticker),
+                self.news_service.get_stock_news(ticker, company),
+                return_exceptions=True,
+            )
+        if isinstance(bars, Exception):
+            raise bars
+        if isinstance(news, Exception):
+            logger.error(f"Speculative news fetch for {ticker} failed: {news}")
+            news = None
+        return {"bars": bars, "news": news}
@@ -0,0 +1,94 @@
+"""
+Market data for many tickers in one request.
+
+The dashboard and portfolio views ask for prices and bars for every holding
+at once. A batch is deduplicated first: each distinct ticker's price is
+fetched once however many ranges ask for it, and identical ranges are fetched
+once. The remaining Polygon requests fan out through a bounded pool. Each one
+still goes through the key scheduler as background work, so live-call cards
+keep priority over a dashboard load. Results are yielded as each item
+completes, so the first holdings render while the rest are still loading.
+"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.services.config import STOCK_BATCH_CONCURRENCY
+from app.services.stock_service import stock_service
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItem(NamedTuple):
+    ticker: str
+    timespan: str = "day"
+    from_date: Optional[str] = None
+    to_date: Optional[str] = None
+    max_points: Optional[int] = None
+
+
+async def stream_batch(
+    items: List[BatchItem],
+    include_price: bool = True,
+    include_bars: bool = True,
+    concurrency: int = STOCK_BATCH_CONCURRENCY,
+) -> AsyncIterator[Tuple[List[int], Dict[str, Any]]]:
+    """
+    Fetch prices and bars for a batch of tickers, yielding each item as it completes.
+
+    Args:
+        items: Tickers and ranges; tickers are upper-cased
+        include_price: Fetch each ticker's previous-close bar
+        include_bars: Fetch each item's aggregate bars for charting
+        concurrency: Most Polygon requests in flight for this batch
+
+    Yields:
+        (indices, result) once per distinct item, where indices are the
+        positions in items it answers and result holds the Polygon "price"
+        and "bars" responses, each possibly an error dict
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await call()
+            except Exception as e:
+                logger.error(f"Batch request failed: {e}")
+                return {"error": str(e)}
+
+    distinct: Dict[BatchItem, List[int]] = {}
+    for index, item in enumerate(items):
+        distinct.setdefault(item._replace(ticker=item.ticker.upper()), []).append(index)
+
+    async def complete(item: BatchItem) -> Tuple[BatchItem, Dict[str, Any]]:
+        result: Dict[str, Any] = {}
+        if include_bars:
+            result["bars"] = await bounded(
+                lambda: stock_service.get_stock_chart_data(
+                    item.ticker, item.timespan, item.from_date, item.to_date, item.max_points
+                )
+            )
+        if include_price:
+            # Shared by every item for the ticker; shield so one cancellation cannot fail the rest
+            result["price"] = await asyncio.shield(prices[item.ticker])
+        return item, result
+
+    # Start each ticker's price just before its bars, so the pool serves
+    # items in order and the first ones complete early
+    prices: Dict[str, asyncio.Task] = {}
+    tasks = []
+    for item in distinct:
+        if include_price and item.ticker not in prices:
+            prices[item.ticker] = asyncio.create_task(
+                bounded(lambda ticker=item.ticker: stock_service.get_stock_price(ticker))
+            )
+        tasks.append(asyncio.create_task(complete(item)))
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item, result = await next_done
+            yield distinct[item], result
+    finally:
+        for task in [*tasks, *prices.values()]:
+            if not task.done():
+                task.cancel()
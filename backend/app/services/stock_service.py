@@ -1,16 +1,37 @@
 """
 Service to handle Polygon.io API requests.
 """
-import aiohttp
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Union
 from datetime import datetime, timedelta
+import asyncio
+import contextlib
 import logging
+import time
+
+import aiohttp
+import numpy as np
 
-from app.services.config import POLYGON_BASE_URL
-from app.services.key_cycling_service import polygon_key_service
+from app.services.bar_analytics import analyze, columns_from_results, format_dates, results_from_columns
+from app.services.bar_store import DAY_MS, SPAN_MS, BarKey, bar_store, date_to_ms
+from app.services.config import (
+    BAR_STORE_ENABLED,
+    CHART_DOWNSAMPLING,
+    CHART_MAX_POINTS,
+    DAILY_SNAPSHOT_ENABLED,
+    POLYGON_BASE_URL,
+    POLYGON_MAX_ATTEMPTS,
+)
+from app.services.downsampling import downsample
+from app.services.http_client import http_client
+from app.services.incremental_json import JSONArrayStream
+from app.services.key_cycling_service import parse_retry_after, polygon_key_service
+from app.services.single_flight import SingleFlight, canonical_key
 
 logger = logging.getLogger(__name__)
 
+# Read size for streamed Polygon responses
+STREAM_CHUNK_BYTES = 64 * 1024
+
 
 
 class StockService:
@@ -42,6 +63,439 @@ class StockService:
         """Initialize the Polygon.io service."""
         self.base_url = POLYGON_BASE_URL
         self.key_service = polygon_key_service
+        self.single_flight = SingleFlight()
+
+    def company_name(self, ticker: str) -> str:
+        """
+        Get the company name for a ticker.
+
+        Args:
+            ticker: Stock ticker symbol
+
+        Returns:
+            The company name, or the ticker itself if it is not indexed
+        """
+        # Imported here because the resolver is seeded from TICKER_TO_COMPANY
+        from app.services.ticker_resolver import ticker_resolver
+
+        return ticker_resolver.company_name(ticker) or ticker
+
+    async def _polygon_get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Make a GET request to the Polygon API, sharing identical concurrent requests.
+
+        Args:
+            path: Path below the API base URL
+            params: Query parameters
+
+        Returns:
+            The decoded JSON response or error information
+        """
+        return await self.single_flight.do(
+            canonical_key(path, params), lambda: self._polygon_request(path, params)
+        )
+
+    async def _polygon_request(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Make a GET request to the Polygon API with the next available key.
+
+        Args:
+            path: Path below the API base URL
+            params: Query parameters
+
+        Returns:
+            The decoded JSON response or error information
+        """
+        try:
+            async with self._polygon_response(path, params) as response:
+                return await response.json()
+        except RuntimeError as e:
+            return {"error": str(e)}
+        except Exception as e:
+            logger.error(f"Error accessing Polygon API: {str(e)}")
+            return {"error": str(e)}
+
+    @contextlib.asynccontextmanager
+    async def _polygon_response(
+        self, path: str, params: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Open a GET request to the Polygon API with the next available key, retrying after a 429.
+
+        Args:
+            path: Path below the API base URL
+            params: Query parameters
+
+        Yields:
+            The response, with status 200 and its body not yet read
+
+        Raises:
+            RuntimeError: If no key became available in time or Polygon returned an error
+        """
+        # One deadline for the whole request, including retries after a 429
+        deadline = time.monotonic() + self.key_service.max_wait
+        for _ in range(POLYGON_MAX_ATTEMPTS):
+            api_key = await self.key_service.acquire(deadline=deadline)
+            if not api_key:
+                logger.error("No available API keys for Polygon.io")
+                raise RuntimeError("Rate limit exceeded for all API keys")
+
+            async with http_client.session.get(
+                f"{self.base_url}{path}", params={**(params or {}), "apiKey": api_key}
+            ) as response:
+                if response.status == 200:
+                    yield response
+                    return
+                error_data = await response.text()
+                if response.status == 429:
+                    logger.warning(f"Polygon rate-limited a key, retrying: {error_data}")
+                    self.key_service.report_rate_limited(
+                        api_key, parse_retry_after(response.headers.get("Retry-After"))
+                    )
+                    continue
+                logger.error(f"Polygon API error: {response.status} - {error_data}")
+                raise RuntimeError(f"API error: {response.status}")
+        raise RuntimeError("API error: 429")
+
+    async def get_stock_price(self, ticker: str) -> Dict[str, Any]:
+        """
+        Get the previous day's OHLC bar for a ticker.
+
+        Answered from the daily snapshot when it holds the ticker's bar for
+        the previous trading day or later, and from Polygon otherwise, so an
+        older close is never passed off as the latest.
+
+        Args:
+            ticker: Stock ticker symbol
+
+        Returns:
+            Polygon's previous-close response, with the bar's start in "t", or error information
+        """
+        if DAILY_SNAPSHOT_ENABLED:
+            # Imported here because the snapshot job fetches through this service
+            from app.services.daily_snapshot import BAR_FIELDS, daily_snapshot, previous_trading_day
+
+            bar = daily_snapshot.latest(ticker)
+            if bar is not None and bar["date"] >= previous_trading_day():
+                result = {field: bar[field] for field in BAR_FIELDS if bar[field] is not None}
+                result["T"] = bar["ticker"]
+                result.setdefault("t", date_to_ms(bar["date"]))
+                return {
+                    "ticker": bar["ticker"],
+                    "adjusted": True,
+                    "status": "OK",
+                    "queryCount": 1,
+                    "resultsCount": 1,
+                    "results": [result],
+                }
+        return await self._polygon_get(
+            f"/v2/aggs/ticker/{ticker}/prev", {"adjusted": "true"}
+        )
+
+    async def get_quotes(self, tickers: List[str]) -> Dict[str, Any]:
+        """
+        Get the current price and day change for several tickers in one request.
+
+        Args:
+            tickers: Stock ticker symbols
+
+        Returns:
+            Mapping of ticker to {"price", "change", "change_percent", "updated"}
+            for the tickers Polygon knows, or error information, with
+            "not_authorized" set if the API plan does not include snapshots
+        """
+        data = await self._polygon_get(
+            "/v2/snapshot/locale/us/markets/stocks/tickers", {"tickers": ",".join(tickers)}
+        )
+        if "error" in data:
+            # Plans without snapshot access are refused with a 403 on every request
+            if data["error"] == "API error: 403":
+                return {**data, "not_authorized": True}
+            return data
+        quotes = {}
+        for snapshot in data.get("tickers") or []:
+            # Outside trading hours the last trade or minute bar may be missing
+            price = None
+            for section, field in (("lastTrade", "p"), ("min", "c"), ("day", "c"), ("prevDay", "c")):
+                price = (snapshot.get(section) or {}).get(field)
+                if price:
+                    break
+            if not price:
+                continue
+            quotes[snapshot["ticker"]] = {
+                "price": price,
+                "change": snapshot.get("todaysChange"),
+                "change_percent": snapshot.get("todaysChangePerc"),
+                "updated": snapshot.get("updated"),
+            }
+        return quotes
+
+    async def get_grouped_daily(self, date: str, adjusted: bool = True) -> Dict[str, Any]:
+        """
+        Get every US stock's daily bar for a date in one request.
+
+        Args:
+            date: Trading date (YYYY-MM-DD)
+            adjusted: Whether to include split adjustments
+
+        Returns:
+            Polygon's grouped daily response, with the ticker of each bar in "T", or error information
+        """
+        return await self._polygon_get(
+            f"/v2/aggs/grouped/locale/us/market/stocks/{date}", {"adjusted": str(adjusted).lower()}
+        )
+
+    async def _fetch_aggregates(
+        self,
+        key: BarKey,
+        from_bound: Union[str, int],
+        to_bound: Union[str, int],
+    ) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Fetch every aggregate bar in a range from Polygon, following pagination.
+
+        Args:
+            key: Series to fetch
+            from_bound: Start date (YYYY-MM-DD) or epoch milliseconds
+            to_bound: End date (YYYY-MM-DD) or epoch milliseconds
+
+        Returns:
+            The aggregate results or error information
+        """
+        path = f"/v2/aggs/ticker/{key.ticker}/range/{key.multiplier}/{key.timespan}/{from_bound}/{to_bound}"
+        params: Optional[Dict[str, Any]] = {
+            "adjusted": str(key.adjusted).lower(),
+            "sort": "asc",
+            "limit": 50000,
+        }
+        results: List[Dict[str, Any]] = []
+        while path:
+            data = await self._polygon_get(path, params)
+            if "error" in data:
+                return data
+            results.extend(data.get("results") or [])
+            # next_url already carries the query parameters
+            next_url = data.get("next_url")
+            path = next_url[len(self.base_url):] if next_url else None
+            params = None
+        return results
+
+    async def _stream_aggregates(
+        self,
+        key: BarKey,
+        from_bound: Union[str, int],
+        to_bound: Union[str, int],
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream every aggregate bar in a range from Polygon, following pagination.
+
+        Each page is parsed as its body downloads, so bars are yielded while
+        the rest of the page is still in flight and no page is held whole.
+
+        Args:
+            key: Series to fetch
+            from_bound: Start date (YYYY-MM-DD) or epoch milliseconds
+            to_bound: End date (YYYY-MM-DD) or epoch milliseconds
+
+        Yields:
+            Lists of aggregate results, ascending
+
+        Raises:
+            RuntimeError: If Polygon fails or a page ends early
+        """
+        path: Optional[str] = (
+            f"/v2/aggs/ticker/{key.ticker}/range/{key.multiplier}/{key.timespan}/{from_bound}/{to_bound}"
+        )
+        params: Optional[Dict[str, Any]] = {
+            "adjusted": str(key.adjusted).lower(),
+            "sort": "asc",
+            "limit": 50000,
+        }
+        while path:
+            parser = JSONArrayStream("results")
+            try:
+                async with self._polygon_response(path, params) as response:
+                    async for chunk in response.content.iter_chunked(STREAM_CHUNK_BYTES):
+                        bars = parser.feed(chunk)
+                        if bars:
+                            yield bars
+                document = parser.close()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.error(f"Error streaming from Polygon API: {str(e)}")
+                raise RuntimeError(str(e) or type(e).__name__) from e
+            # next_url already carries the query parameters
+            next_url = document.get("next_url")
+            path = next_url[len(self.base_url):] if next_url else None
+            params = None
+
+    async def stream_aggregates(
+        self,
+        ticker: str,
+        multiplier: int = 1,
+        timespan: str = "day",
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        adjusted: bool = True,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream aggregate bars over a range of any length without buffering it.
+
+        Cached ranges come from the bar store and gaps are streamed from
+        Polygon page by page, filling the store as they arrive.
+
+        Args:
+            ticker: Stock ticker symbol
+            multiplier: The size of the timespan multiplier
+            timespan: The size of the time window (minute, hour, day, ...)
+            from_date: The start date (YYYY-MM-DD), defaults to 30 days ago
+            to_date: The end date (YYYY-MM-DD), defaults to today
+            adjusted: Whether to include split/dividend adjustments
+
+        Yields:
+            Lists of Polygon-style bars, ascending
+
+        Raises:
+            RuntimeError: If Polygon fails
+            ValueError: If a date is malformed
+        """
+        if not to_date:
+            to_date = datetime.now().strftime("%Y-%m-%d")
+        if not from_date:
+            from_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        key = BarKey(ticker, multiplier, timespan, adjusted)
+
+        def fetch(from_bound, to_bound):
+            return self._stream_aggregates(key, from_bound, to_bound)
+
+        if BAR_STORE_ENABLED:
+            batches = bar_store.stream(key, from_date, to_date, fetch)
+        else:
+            batches = fetch(from_date, to_date)
+        async with contextlib.aclosing(batches):
+            async for bars in batches:
+                yield bars
+
+    async def get_aggregate_columns(
+        self,
+        ticker: str,
+        multiplier: int = 1,
+        timespan: str = "day",
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        adjusted: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Get aggregate bars as column arrays, served from the bar store where already cached.
+
+        Args:
+            ticker: Stock ticker symbol
+            multiplier: The size of the timespan multiplier
+            timespan: The size of the time window (minute, hour, day, ...)
+            from_date: The start date (YYYY-MM-DD), defaults to 30 days ago
+            to_date: The end date (YYYY-MM-DD), defaults to today
+
+        Returns:
+            Mapping of column name (t, o, h, l, c, v, vw) to array, or error information
+        """
+        if not to_date:
+            to_date = datetime.now().strftime("%Y-%m-%d")
+        if not from_date:
+            from_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        key = BarKey(ticker, multiplier, timespan, adjusted)
+
+        if not BAR_STORE_ENABLED:
+            results = await self._fetch_aggregates(key, from_date, to_date)
+            if isinstance(results, dict):
+                return results
+            return columns_from_results(results)
+
+        async def fetch(from_bound, to_bound):
+            return await self._fetch_aggregates(key, from_bound, to_bound)
+
+        try:
+            return await bar_store.read_columns(key, from_date, to_date, fetch)
+        except ValueError as e:
+            return {"error": f"Invalid date range: {e}"}
+
+    async def get_aggregates(
+        self,
+        ticker: str,
+        multiplier: int = 1,
+        timespan: str = "day",
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        adjusted: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Get aggregate bars, served from the bar store where already cached.
+
+        Args:
+            ticker: Stock ticker symbol
+            multiplier: The size of the timespan multiplier
+            timespan: The size of the time window (minute, hour, day, ...)
+            from_date: The start date (YYYY-MM-DD), defaults to 30 days ago
+            to_date: The end date (YYYY-MM-DD), defaults to today
+
+        Returns:
+            A Polygon-style aggregates response (ascending) or error information
+        """
+        if not to_date:
+            to_date = datetime.now().strftime("%Y-%m-%d")
+        if not from_date:
+            from_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+        key = BarKey(ticker, multiplier, timespan, adjusted)
+
+        if not BAR_STORE_ENABLED:
+            results = await self._fetch_aggregates(key, from_date, to_date)
+            if isinstance(results, dict):
+                return results
+            return {"ticker": ticker, "resultsCount": len(results), "results": results}
+
+        async def fetch(from_bound, to_bound):
+            return await self._fetch_aggregates(key, from_bound, to_bound)
+
+        try:
+            return await bar_store.read(key, from_date, to_date, fetch)
+        except ValueError as e:
+            return {"error": f"Invalid date range: {e}"}
+
+    async def get_stock_chart_data(
+        self,
+        ticker: str,
+        timespan: str = "day",
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        max_points: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Get aggregate bars for charting, downsampled to a bounded number of points.
+
+        Args:
+            ticker: Stock ticker symbol
+            timespan: The size of the time window (minute, hour, day, ...)
+            from_date: The start date (YYYY-MM-DD), defaults to 30 days ago
+            to_date: The end date (YYYY-MM-DD), defaults to today
+            max_points: Most bars to return, defaults to CHART_MAX_POINTS; 0 returns every bar
+
+        Returns:
+            Polygon-style aggregates response or error information
+        """
+        if max_points is None:
+            max_points = CHART_MAX_POINTS
+        if not max_points:
+            return await self.get_aggregates(ticker, 1, timespan, from_date, to_date)
+
+        columns = await self.get_aggregate_columns(ticker, 1, timespan, from_date, to_date)
+        if "error" in columns:
+            return columns
+        count = len(columns["t"])
+        results = results_from_columns(downsample(columns, max_points, CHART_DOWNSAMPLING))
+        return {
+            "ticker": ticker,
+            "resultsCount": len(results),
+            "barsCount": count,
+            "results": results,
+        }
         
     async def get_stock_bars(
         self, 
@@ -52,7 +506,8 @@ class StockService:
         to_date: str = None, 
         adjusted: bool = True, 
         sort: str = "asc", 
-        limit: int = 120
+        limit: Optional[int] = None,
+        max_points: Optional[int] = None,
     ) -> Dict[str, Any]:
         """
         Get OHLC (Open, High, Low, Close) data for a specified stock ticker.
@@ -61,11 +516,14 @@ class StockService:
             ticker: Stock ticker symbol
             multiplier: The size of the timespan multiplier
             timespan: The size of the time window (minute, hour, day, week, month, quarter, year)
-            from_date: The start date (YYYY-MM-DD), defaults to 7 days ago
+            from_date: The start date (YYYY-MM-DD), defaults to 30 days ago
             to_date: The end date (YYYY-MM-DD), defaults to yesterday
             adjusted: Whether to include split/dividend adjustments
             sort: Sort order ("asc" or "desc")
-            limit: Maximum number of results
+            limit: Maximum number of entries, defaults to all of them; the window
+                is bounded by max_points rather than truncated
+            max_points: Downsample longer windows to this many bars, defaults to
+                CHART_MAX_POINTS; 0 keeps every bar
             
         Returns:
             Dictionary containing the OHLC data or error information
@@ -79,61 +537,53 @@ class StockService:
             seven_days_ago = datetime.now() - timedelta(days=30)
             from_date = seven_days_ago.strftime("%Y-%m-%d")
         
-        api_key = self.key_service.get_api_key()
-        if not api_key:
-            logger.error("No available API keys for Polygon.io")
-            return {"error": "Rate limit exceeded for all API keys"}
-        
-        url = f"{self.base_url}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{from_date}/{to_date}"
-        params = {
-            "apiKey": api_key,
-            "adjusted": str(adjusted).lower(),
-            "sort": sort,
-            "limit": limit
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # return data
-                    else:
-                        error_data = await response.text()
-                        logger.error(f"Polygon API error: {response.status} - {error_data}")
-                        return {"error": f"API error: {response.status}"}
-            except Exception as e:
-                logger.error(f"Error accessing Polygon API: {str(e)}")
-                return {"error": str(e)}
-        
-        historical_entries = []
-        print(f"Data: {data}")
-        for item in data["results"]:
-            historical_entries.append({
-                "date": datetime.fromtimestamp(item["t"]/1000).strftime("%Y-%m-%d"),
-                "price": item["c"],
-                "volume": item["v"]
-            })
-        
-        print(f"Historical entries: {historical_entries}")
+        # Daily and longer bars fetch a year of history for the 52-week range;
+        # the bar store makes that a one-off cost per ticker
+        history_from = from_date
+        if SPAN_MS.get(timespan, DAY_MS) >= DAY_MS:
+            year_before = (datetime.strptime(to_date, "%Y-%m-%d") - timedelta(days=365)).strftime("%Y-%m-%d")
+            history_from = min(from_date, year_before)
 
+        columns = await self.get_aggregate_columns(ticker, multiplier, timespan, history_from, to_date, adjusted)
+        if "error" in columns:
+            return columns
+        window_start = date_to_ms(from_date)
+        first = int(np.searchsorted(columns["t"], window_start))
+        if first >= len(columns["t"]):
+            return {"error": f"No data found for ticker {ticker}"}
+
+        if max_points is None:
+            max_points = CHART_MAX_POINTS
+        shown = {name: columns[name][first:] for name in ("t", "c", "v")}
+        if max_points:
+            shown = downsample(shown, max_points, CHART_DOWNSAMPLING)
+        dates = format_dates(shown["t"])
+        prices = shown["c"].tolist()
+        volumes = shown["v"].tolist()
+        historical_entries = [
+            {"date": date, "price": price, "volume": volume}
+            for date, price, volume in zip(dates, prices, volumes)
+        ]
+        if sort == "desc":
+            historical_entries.reverse()
+        historical_entries = historical_entries[:limit]
+
+        first_open, last_close = columns["o"][first], columns["c"][-1]
         data_to_return = {
             "symbol": ticker,
-            "company": self.TICKER_TO_COMPANY[ticker],
-            "price": data["results"][-1]["c"],
-            "change": data["results"][-1]["c"] - data["results"][0]["o"],
-            "changePercent": ((data["results"][-1]["c"] - data["results"][0]["o"]) / data["results"][0]["o"]) * 100,
-            "volume": data["results"][-1]["v"],
+            "company": self.company_name(ticker),
+            "price": float(last_close),
+            "change": float(last_close - first_open),
+            "changePercent": float((last_close - first_open) / first_open * 100),
+            "volume": float(columns["v"][-1]),
             "historical_data": historical_entries,
-            "relatedNews": [
-                {
-                    "headline": "Stocks slide as Trump threatens more tariffs.",
-                    "source": "The Financial Times",
-                    "timestamp": "12 hours ago",
-                    "sentiment": "negative"
-                }
-            ]
+            "analytics": analyze(columns, timespan, window_start),
+            # Filled in by callers that fetch news alongside the bars
+            "relatedNews": [],
         }
 
         return data_to_return
 
+
+# Shared instance for the API routes
+stock_service = StockService()
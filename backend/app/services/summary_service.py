@@ -1,9 +1,10 @@
 import logging
-import os
-import json
-from typing import Dict, Any, List
+from collections import deque
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-from openai import OpenAI
+
+from app.services.config import SESSION_MAX_TRANSCRIPT_CHARS
+from app.services.llm_gateway import SUMMARY, LLMGateway, llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +15,23 @@ class SummaryService:
     Stores transcribed sentences and provides functionality to generate meeting summaries.
     """
 
-    def __init__(self):
-        """Initialize the summary service with required components."""
-        self.conversation_history = []
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-        )
+    def __init__(
+        self,
+        max_chars: int = SESSION_MAX_TRANSCRIPT_CHARS,
+        llm: Optional[LLMGateway] = None,
+    ):
+        """
+        Initialize the summary service with required components.
+
+        Args:
+            max_chars: Cap on the stored transcript size; oldest entries are dropped beyond it
+            llm: LLM gateway to use, the shared one if omitted
+        """
+        self.conversation_history = deque()
+        self.max_chars = max_chars
+        self.total_chars = 0
+        self.dropped_entries = 0
+        self.llm = llm or llm_gateway
 
     def add_transcript(self, text: str) -> None:
         """
@@ -35,6 +46,14 @@ class SummaryService:
         self.conversation_history.append(
             {"timestamp": datetime.now().isoformat(), "text": text}
         )
+        self.total_chars += len(text)
+
+        # Keep memory bounded by dropping the oldest entries
+        while self.total_chars > self.max_chars and len(self.conversation_history) > 1:
+            dropped = self.conversation_history.popleft()
+            self.total_chars -= len(dropped["text"])
+            self.dropped_entries += 1
+
         logger.info(
             f"Added transcript to history. Total entries: {len(self.conversation_history)}"
         )
@@ -105,16 +124,7 @@ class SummaryService:
         Respond with ONLY the JSON object, nothing else.        """
 
         try:
-            # Call the Qwen model to generate the summary
-            completion = self.client.chat.completions.create(
-                model="openai/gpt-4o-mini",  # Using Qwen 32b model
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"},
-            )
-
-            # Parse the response
-            response_content = completion.choices[0].message.content
-            summary_data = json.loads(response_content)
+            summary_data = await self.llm.complete_json(SUMMARY, prompt)
 
             logger.info("Successfully generated meeting summary")
             return summary_data
@@ -128,7 +138,3 @@ class SummaryService:
                 "action_items": [],
                 "investment_goal_changes": [],
             }
-
-
-# Create a global instance for use across the application
-summary_service = SummaryService()
\ No newline at end of file
@@ -0,0 +1,445 @@
+"""
+Company name -> ticker entity resolution.
+
+Keeps an in-memory index of tickers, company names and spoken aliases, seeded
+from StockService.TICKER_TO_COMPANY, the portfolio holdings, the bucket ETFs
+and, when present, a local dump of Polygon's reference tickers. Lookups are:
+
+- exact: ticker symbols and normalized names/aliases, via dicts
+- prefix: a trie whose nodes keep their best few entries precomputed, for
+  search-as-you-type
+- fuzzy: a one-deletion neighbourhood index (edit distance) plus a phonetic
+  key index, so "palenteer" or "berkshear" from speech-to-text still resolve
+
+Refresh the Polygon dump with:
+    python -m app.services.ticker_resolver --download
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.services.buckets_service import BucketsService
+from app.services.company_aliases import (
+    company_aliases,
+    fund_aliases,
+    load_holdings,
+    normalize_name,
+)
+from app.services.config import BUCKETS_PATH, POLYGON_BASE_URL, REFERENCE_TICKERS_PATH
+from app.services.http_client import http_client
+from app.services.key_cycling_service import BACKGROUND, polygon_key_service
+from app.services.stock_service import StockService
+
+logger = logging.getLogger(__name__)
+
+# Sources, best first; used to rank equally good matches
+SOURCE_CURATED = 0
+SOURCE_REFERENCE = 1
+
+TRIE_TOP_K = 10
+MIN_FUZZY_SIMILARITY = 0.7
+# Least similarity for resolve() to replace a name with a fuzzy match; one
+# edit in four letters (0.75) is too ambiguous to act on
+MIN_RESOLVE_SIMILARITY = 0.76
+PHONETIC_BONUS = 0.1
+
+# Uppercase, at most five letters, optional share class: written like a symbol
+TICKER_SHAPE = re.compile(r"[A-Z]{1,5}(\.[A-Z])?")
+
+_PHONETIC_RULES = [
+    ("ph", "f"), ("ck", "k"), ("qu", "kw"), ("gh", ""), ("wr", "r"),
+    ("kn", "n"), ("dg", "j"), ("sch", "sk"), ("x", "ks"),
+]
+_PHONETIC_MAP = str.maketrans({"q": "k", "z": "s", "v": "f"})
+
+
+def phonetic_key(text: str) -> str:
+    """
+    Reduce a word or phrase to a rough pronunciation key.
+
+    Spelling variants that sound alike ("palantir", "palenteer") share a key:
+    common digraphs are simplified, soft c becomes s, vowels and h/w/y after
+    the first letter are dropped and repeated consonants collapse.
+    """
+    text = re.sub(r"[^a-z]", "", text.lower())
+    if not text:
+        return ""
+    for pattern, replacement in _PHONETIC_RULES:
+        text = text.replace(pattern, replacement)
+    text = re.sub(r"c(?=[eiy])", "s", text).replace("c", "k").translate(_PHONETIC_MAP)
+    if not text:
+        return ""
+    key = [text[0]]
+    for char in text[1:]:
+        if char in "aeiouhwy" or char == key[-1]:
+            continue
+        key.append(char)
+    return "".join(key)
+
+
+def _deletes(word: str) -> Set[str]:
+    """Every string one deletion away from word, and word itself."""
+    return {word} | {word[:index] + word[index + 1:] for index in range(len(word))}
+
+
+def edit_distance(a: str, b: str, limit: int = 3) -> int:
+    """
+    Optimal string alignment distance, giving up once it exceeds limit.
+
+    Returns:
+        The distance, or limit + 1 if it is larger than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j, char_b in enumerate(b, 1):
+            cost = 0 if char_a == char_b else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class _TrieNode:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.top: List[int] = []
+
+
+class TickerResolver:
+    """
+    Resolves free-form company mentions and tickers to ticker symbols.
+    """
+
+    def __init__(self, reference_path: str = REFERENCE_TICKERS_PATH):
+        """
+        Initialize an empty resolver; sources are loaded on first lookup.
+
+        Args:
+            reference_path: Local Polygon reference-tickers dump, optional
+        """
+        self.reference_path = reference_path
+        self.entries: List[Dict[str, Any]] = []
+        self._by_ticker: Dict[str, int] = {}
+        self._aliases: Dict[str, List[int]] = {}
+        self._deletes: Dict[str, Set[str]] = {}
+        self._phonetic: Dict[str, Set[str]] = {}
+        self._phonetic_of: Dict[str, str] = {}
+        self._trie = _TrieNode()
+        self._loaded = False
+
+    def add(self, ticker: str, name: str, aliases: Iterable[str] = (), source: int = SOURCE_CURATED, **info) -> None:
+        """
+        Add a symbol to the index; call build() afterwards.
+
+        Args:
+            ticker: Ticker symbol
+            name: Company or fund name
+            aliases: Extra lowercase spoken aliases
+            source: SOURCE_CURATED or SOURCE_REFERENCE, used for ranking
+            **info: Extra fields returned with matches (market, locale, ...)
+        """
+        ticker = ticker.upper()
+        if ticker in self._by_ticker:
+            entry_id = self._by_ticker[ticker]
+        else:
+            entry_id = len(self.entries)
+            self._by_ticker[ticker] = entry_id
+            self.entries.append({"ticker": ticker, "name": name, "source": source, **info})
+
+        keys = {ticker.lower(), normalize_name(name), *aliases}
+        for key in keys:
+            if not key:
+                continue
+            ids = self._aliases.setdefault(key, [])
+            if entry_id not in ids:
+                ids.append(entry_id)
+        self._loaded = True
+
+    def build(self) -> None:
+        """Build the fuzzy and prefix indexes from the added entries."""
+        self._deletes = {}
+        self._phonetic = {}
+        self._phonetic_of = {}
+        self._trie = _TrieNode()
+
+        for key in self._aliases:
+            compact = key.replace(" ", "")
+            for deleted in _deletes(compact):
+                self._deletes.setdefault(deleted, set()).add(key)
+            code = phonetic_key(key)
+            self._phonetic_of[key] = code
+            self._phonetic.setdefault(code, set()).add(key)
+
+        # Insert best entries first so every node's top list is already ranked
+        def rank(item):
+            key, ids = item
+            entry = self.entries[ids[0]]
+            return entry["source"], len(entry["ticker"]), len(key)
+
+        for key, ids in sorted(self._aliases.items(), key=rank):
+            for word_start in [0] + [m.end() for m in re.finditer(" ", key)]:
+                node = self._trie
+                for char in key[word_start:]:
+                    node = node.children.setdefault(char, _TrieNode())
+                    for entry_id in ids:
+                        if len(node.top) < TRIE_TOP_K and entry_id not in node.top:
+                            node.top.append(entry_id)
+
+    def load(self) -> None:
+        """Load every configured source and build the indexes."""
+        aliases_by_ticker: Dict[str, List[str]] = {}
+        for alias, ticker in company_aliases().items():
+            aliases_by_ticker.setdefault(ticker, []).append(alias)
+
+        companies = dict(StockService.TICKER_TO_COMPANY)
+        companies.update(load_holdings())
+        for ticker, company in companies.items():
+            self.add(ticker, company, aliases_by_ticker.get(ticker, ()), market="stocks", locale="us")
+
+        for bucket in BucketsService().get_buckets(BUCKETS_PATH):
+            self.add(
+                bucket["ticker"], bucket["name"], fund_aliases(bucket),
+                market="stocks", locale="us", type="ETF",
+            )
+
+        for item in self._read_reference():
+            if item.get("ticker") and item.get("name"):
+                self.add(
+                    item["ticker"],
+                    item["name"],
+                    source=SOURCE_REFERENCE,
+                    market=item.get("market"),
+                    locale=item.get("locale"),
+                    primary_exchange=item.get("primary_exchange"),
+                    type=item.get("type"),
+                )
+
+        self.build()
+        logger.info(f"Ticker resolver indexed {len(self.entries)} symbols and {len(self._aliases)} aliases")
+
+    def _read_reference(self) -> List[Dict[str, Any]]:
+        if not self.reference_path or not os.path.exists(self.reference_path):
+            return []
+        try:
+            with open(self.reference_path, "r") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading reference tickers from {self.reference_path}: {e}")
+            return []
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def _match(self, entry_id: int, score: float, method: str) -> Dict[str, Any]:
+        entry = dict(self.entries[entry_id])
+        entry.pop("source")
+        entry.update({"score": round(score, 3), "method": method})
+        return entry
+
+    def company_name(self, ticker: str) -> Optional[str]:
+        """Return the indexed name for a ticker, or None."""
+        self._ensure_loaded()
+        entry_id = self._by_ticker.get(ticker.upper())
+        return self.entries[entry_id]["name"] if entry_id is not None else None
+
+    def resolve(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a ticker or company mention to the single best symbol.
+
+        Input written like a symbol only resolves to an exact ticker or alias:
+        the index does not hold every listed symbol, and AAL is not a
+        misspelling of AAPL. Prefix and fuzzy matching are for names.
+
+        Args:
+            query: Ticker, company name or misheard name
+
+        Returns:
+            Entry with ticker, name, score and method, or None if nothing is close enough
+        """
+        self._ensure_loaded()
+        stripped = query.strip()
+        entry_id = self._by_ticker.get(stripped.upper())
+        if entry_id is not None:
+            return self._match(entry_id, 1.0, "ticker")
+
+        key = normalize_name(stripped)
+        ids = self._aliases.get(key)
+        if ids:
+            return self._match(self._best(ids), 1.0, "alias")
+        if TICKER_SHAPE.fullmatch(stripped):
+            return None
+
+        # A complete word prefix of a longer name ("ishares esg aware")
+        node = self._prefix_node(key) if len(key) >= 4 else None
+        if node is not None and node.top:
+            return self._match(node.top[0], 0.9, "prefix")
+
+        matches = self.fuzzy(key, limit=1)
+        if matches and matches[0]["score"] >= MIN_RESOLVE_SIMILARITY:
+            return matches[0]
+        return None
+
+    def fuzzy(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find symbols whose aliases are spelled or sound like the query.
+
+        Args:
+            query: Normalized query text
+            limit: Maximum number of matches
+
+        Returns:
+            Matches ordered by similarity
+        """
+        self._ensure_loaded()
+        compact = query.replace(" ", "")
+        if len(compact) < 3:
+            return []
+
+        code = phonetic_key(query)
+        candidates: Set[str] = set(self._phonetic.get(code, ()))
+        for deleted in _deletes(compact):
+            candidates.update(self._deletes.get(deleted, ()))
+
+        scored: Dict[int, float] = {}
+        for key in candidates:
+            key_compact = key.replace(" ", "")
+            distance = edit_distance(compact, key_compact)
+            similarity = 1 - distance / max(len(compact), len(key_compact))
+            # Sounding alike breaks ties and rescues phonetic misspellings
+            if self._phonetic_of[key] == code:
+                similarity = min(similarity + PHONETIC_BONUS, 0.99)
+            if similarity < MIN_FUZZY_SIMILARITY:
+                continue
+            entry_id = self._best(self._aliases[key])
+            scored[entry_id] = max(scored.get(entry_id, 0.0), similarity)
+
+        ranked = sorted(
+            scored.items(),
+            key=lambda item: (-item[1], self.entries[item[0]]["source"], len(self.entries[item[0]]["ticker"])),
+        )
+        return [self._match(entry_id, score, "fuzzy") for entry_id, score in ranked[:limit]]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Search-as-you-type over tickers, names and aliases.
+
+        Prefix matches come first; fuzzy matches fill the remaining slots.
+
+        Args:
+            query: Partial ticker or company name
+            limit: Maximum number of results
+
+        Returns:
+            Matching entries, best first
+        """
+        self._ensure_loaded()
+        key = " ".join(re.findall(r"[a-z0-9]+", query.lower()))
+        results: List[Dict[str, Any]] = []
+        seen: Set[str] = set()
+
+        node = self._prefix_node(key) if key else None
+        if node is not None:
+            for entry_id in node.top[:limit]:
+                match = self._match(entry_id, 1.0, "prefix")
+                results.append(match)
+                seen.add(match["ticker"])
+
+        if len(results) < limit:
+            for match in self.fuzzy(key, limit=limit):
+                if match["ticker"] not in seen and len(results) < limit:
+                    results.append(match)
+                    seen.add(match["ticker"])
+        return results
+
+    def _prefix_node(self, key: str) -> Optional[_TrieNode]:
+        node = self._trie
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _best(self, ids: List[int]) -> int:
+        return min(ids, key=lambda entry_id: (self.entries[entry_id]["source"], entry_id))
+
+
+async def download_reference_tickers(path: str = REFERENCE_TICKERS_PATH, market: str = "stocks") -> int:
+    """
+    Download Polygon's active reference tickers to a local JSON file.
+
+    Args:
+        path: File to write
+        market: Polygon market filter
+
+    Returns:
+        Number of tickers written
+    """
+    url = f"{POLYGON_BASE_URL}/v3/reference/tickers"
+    params: Optional[Dict[str, Any]] = {"market": market, "active": "true", "limit": 1000}
+    tickers: List[Dict[str, Any]] = []
+
+    session = http_client.session
+    while url:
+        # Free-tier keys allow a few requests per minute, so this waits between pages
+        api_key = await polygon_key_service.acquire(BACKGROUND, deadline=math.inf)
+        if not api_key:
+            raise RuntimeError("No Polygon API keys configured")
+        async with session.get(url, params={**(params or {}), "apiKey": api_key}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Polygon API error: {response.status} - {await response.text()}")
+            data = await response.json()
+        for item in data.get("results", []):
+            tickers.append(
+                {
+                    key: item.get(key)
+                    for key in ("ticker", "name", "market", "locale", "primary_exchange", "type")
+                }
+            )
+        logger.info(f"Downloaded {len(tickers)} reference tickers")
+        # next_url already carries the query parameters
+        url, params = data.get("next_url"), None
+
+    with open(path, "w") as file:
+        json.dump(tickers, file)
+    return len(tickers)
+
+
+# Shared index, loaded on first use
+ticker_resolver = TickerResolver()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ticker resolver utilities")
+    parser.add_argument("--download", action="store_true", help="Download Polygon reference tickers")
+    parser.add_argument("--path", default=REFERENCE_TICKERS_PATH, help="Reference tickers file")
+    parser.add_argument("query", nargs="*", help="Resolve these queries")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.download:
+        count = asyncio.run(download_reference_tickers(args.path))
+        print(f"Wrote {count} tickers to {args.path}")
+    resolver = TickerResolver(args.path)
+    for query in args.query:
+        print(query, "->", resolver.resolve(query))
+
+
+if __name__ == "__main__":
+    main()
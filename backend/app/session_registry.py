@@ -0,0 +1,290 @@
+"""
+Per-call session registry.
+
+Each Twilio media stream gets its own CallSession owning the call's transcript
+buffer, summary state and card stream, so concurrent calls never share state.
+Sessions are looked up in O(1) by their id, Twilio streamSid or callSid, and
+are evicted after an idle timeout.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from app.services.config import (
+    SESSION_IDLE_TIMEOUT_SECONDS,
+    SESSION_REAPER_INTERVAL_SECONDS,
+    SESSION_MAX_ACTIVE,
+    SESSION_MAX_TRANSCRIPT_CHARS,
+    SESSION_CARD_HISTORY,
+    SPECULATIVE_PREFETCH_ENABLED,
+    CALL_WARMUP_ENABLED,
+)
+from app.services.call_warmup import CallWarmup
+from app.services.speculative_prefetch import SpeculativePrefetcher
+from app.services.summary_service import SummaryService
+from app.websocket_manager import send_card
+
+if TYPE_CHECKING:
+    from app.voice_activity import VoiceActivityGate
+
+logger = logging.getLogger(__name__)
+
+
+class CallSession:
+    """State belonging to a single advisor call."""
+
+    def __init__(self, session_id: str):
+        """
+        Initialize the session.
+
+        Args:
+            session_id: Unique identifier of the session
+        """
+        self.session_id = session_id
+        self.stream_sid: Optional[str] = None
+        self.call_sid: Optional[str] = None
+        self.active = True
+        self.created_at = time.time()
+        self.last_active = time.monotonic()
+        self.summary = SummaryService(max_chars=SESSION_MAX_TRANSCRIPT_CHARS)
+        self.cards = deque(maxlen=SESSION_CARD_HISTORY)
+        self.voice_gate: Optional["VoiceActivityGate"] = None
+        self.prefetcher = (
+            SpeculativePrefetcher() if SPECULATIVE_PREFETCH_ENABLED else None
+        )
+        self.warmup = CallWarmup() if CALL_WARMUP_ENABLED else None
+
+    def touch(self) -> None:
+        """Mark the session as active now. Safe to call from any thread."""
+        self.last_active = time.monotonic()
+
+    def add_transcript(self, text: str) -> None:
+        """Store a final transcript in this call's summary buffer."""
+        self.touch()
+        self.summary.add_transcript(text)
+
+    async def send_card(self, content: Dict[str, Any]) -> bool:
+        """
+        Record a card in this call's card stream and push it to its viewers.
+
+        Args:
+            content: The card payload
+
+        Returns:
+            True if there was at least one connection to send to
+        """
+        content = {**content, "session_id": self.session_id}
+        self.cards.append(content)
+        self.touch()
+        return await send_card(content, self.session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report the session's size and activity."""
+        return {
+            "session_id": self.session_id,
+            "stream_sid": self.stream_sid,
+            "call_sid": self.call_sid,
+            "active": self.active,
+            "idle_seconds": round(time.monotonic() - self.last_active, 1),
+            "transcript_entries": len(self.summary.conversation_history),
+            "transcript_chars": self.summary.total_chars,
+            "dropped_transcript_entries": self.summary.dropped_entries,
+            "cards": len(self.cards),
+            "voice_activity": self.voice_gate.stats() if self.voice_gate else None,
+            "warmup": self.warmup.stats() if self.warmup else None,
+        }
+
+
+class SessionRegistry:
+    """
+    Registry of live call sessions keyed by session id, streamSid and callSid.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = SESSION_IDLE_TIMEOUT_SECONDS,
+        max_sessions: int = SESSION_MAX_ACTIVE,
+        reaper_interval: float = SESSION_REAPER_INTERVAL_SECONDS,
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            idle_timeout: Seconds of inactivity after which a session is evicted
+            max_sessions: Maximum number of sessions kept at once
+            reaper_interval: Seconds between idle sweeps
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.reaper_interval = reaper_interval
+        self._sessions: Dict[str, CallSession] = {}
+        self._aliases: Dict[str, str] = {}
+        self._latest: Optional[str] = None
+        self._reaper: Optional[asyncio.Task] = None
+        self.evicted = 0
+
+    def create(self, session_id: Optional[str] = None) -> CallSession:
+        """
+        Create and register a new session.
+
+        Args:
+            session_id: Optional identifier, a random one is generated otherwise
+
+        Returns:
+            The new session
+        """
+        if len(self._sessions) >= self.max_sessions:
+            self._evict_least_recent()
+
+        session = CallSession(session_id or uuid.uuid4().hex)
+        self._sessions[session.session_id] = session
+        self._latest = session.session_id
+        logger.info(
+            f"Created session {session.session_id}. Total sessions: {len(self._sessions)}"
+        )
+        return session
+
+    def bind(
+        self,
+        session: CallSession,
+        stream_sid: Optional[str] = None,
+        call_sid: Optional[str] = None,
+    ) -> None:
+        """
+        Make a session reachable by its Twilio streamSid and callSid.
+
+        Args:
+            session: The session to bind
+            stream_sid: Twilio media stream identifier
+            call_sid: Twilio call identifier
+        """
+        if stream_sid:
+            session.stream_sid = stream_sid
+            self._aliases[stream_sid] = session.session_id
+        if call_sid:
+            session.call_sid = call_sid
+            self._aliases[call_sid] = session.session_id
+
+    def get(self, key: str) -> Optional[CallSession]:
+        """
+        Look up a session by session id, streamSid or callSid.
+
+        Args:
+            key: Any of the identifiers the session is known by
+
+        Returns:
+            The session, or None if unknown or evicted
+        """
+        session = self._sessions.get(key)
+        if session is None:
+            session_id = self._aliases.get(key)
+            if session_id is not None:
+                session = self._sessions.get(session_id)
+        return session
+
+    def latest(self) -> Optional[CallSession]:
+        """Return the most recently created session that is still registered."""
+        if self._latest is None:
+            return None
+        return self._sessions.get(self._latest)
+
+    def end(self, session: CallSession) -> None:
+        """Mark a session's call as finished; it stays readable until evicted."""
+        session.active = False
+        session.touch()
+        if session.prefetcher is not None:
+            session.prefetcher.discard()
+        if session.warmup is not None:
+            session.warmup.cancel()
+
+    def remove(self, session_id: str) -> None:
+        """Drop a session and its aliases."""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+        for alias in (session.stream_sid, session.call_sid):
+            if alias and self._aliases.get(alias) == session_id:
+                del self._aliases[alias]
+        if self._latest == session_id:
+            self._latest = None
+
+    def evict_idle(self) -> int:
+        """
+        Remove every session idle for longer than the timeout.
+
+        Returns:
+            Number of sessions evicted
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [
+            session_id
+            for session_id, session in self._sessions.items()
+            if session.last_active < cutoff
+        ]
+        for session_id in idle:
+            self.remove(session_id)
+        if idle:
+            self.evicted += len(idle)
+            logger.info(
+                f"Evicted {len(idle)} idle sessions. Remaining: {len(self._sessions)}"
+            )
+        return len(idle)
+
+    def _evict_least_recent(self) -> None:
+        """Make room by evicting the least recently active session."""
+        session_id = min(
+            self._sessions, key=lambda key: self._sessions[key].last_active
+        )
+        logger.warning(f"Session limit reached, evicting session {session_id}")
+        self.remove(session_id)
+        self.evicted += 1
+
+    def start(self) -> None:
+        """Start the background idle sweep on the running loop."""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def stop(self) -> None:
+        """Stop the background idle sweep."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(self.reaper_interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f"Error evicting idle sessions: {e}")
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report registry size and per-session usage."""
+        sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "active": sum(1 for session in sessions if session.active),
+            "evicted": self.evicted,
+            "transcript_chars": sum(session.summary.total_chars for session in sessions),
+            "suppressed_audio_fraction": self._suppressed_fraction(sessions),
+        }
+
+    @staticmethod
+    def _suppressed_fraction(sessions) -> Optional[float]:
+        gates = [session.voice_gate for session in sessions if session.voice_gate]
+        total_ms = sum(gate.total_ms for gate in gates)
+        if not total_ms:
+            return None
+        sent_ms = sum(gate.sent_ms for gate in gates)
+        return round(max(total_ms - sent_ms, 0.0) / total_ms, 4)
+
+
+# Create a global instance for use across the application
+session_registry = SessionRegistry()
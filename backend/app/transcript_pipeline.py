@@ -0,0 +1,290 @@
+"""
+Event-loop-native pipeline that turns final transcripts into cards.
+
+AssemblyAI delivers transcripts on its own reader thread. Instead of spinning
+up a fresh event loop per utterance, the callback hands the text to a bounded
+queue owned by the FastAPI loop, and a fixed pool of async workers runs
+intent -> data fetch -> send_card.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from app.services.config import (
+    TRANSCRIPT_PIPELINE_WORKERS,
+    TRANSCRIPT_QUEUE_SIZE,
+    TRANSCRIPT_MERGE_WINDOW_SECONDS,
+)
+from app.services.context_manager import ContextManager, EarlyFetch
+from app.services.metrics import LatencyRecorder
+from app.services.speculative_prefetch import Speculation, speculation_stats
+from app.websocket_manager import send_card
+
+if TYPE_CHECKING:
+    from app.session_registry import CallSession
+
+logger = logging.getLogger(__name__)
+
+MIN_WORDS = 3
+
+
+class TranscriptItem:
+    """A final transcript waiting to be processed."""
+
+    __slots__ = ("session", "text", "speculation", "enqueued_at", "updated_at")
+
+    def __init__(self, session: Optional["CallSession"], text: str):
+        self.session = session
+        self.text = text
+        self.speculation = Speculation()
+        self.enqueued_at = time.perf_counter()
+        self.updated_at = self.enqueued_at
+
+
+class TranscriptPipeline:
+    """
+    Bounded queue plus worker pool processing final transcripts on one loop.
+
+    When the queue is full, a new transcript is merged into the newest queued
+    transcript of the same session if it arrived within the merge window;
+    otherwise the oldest queued transcript is dropped, since a card for a
+    stale utterance is worth less than one for what is being said now.
+    """
+
+    def __init__(
+        self,
+        workers: int = TRANSCRIPT_PIPELINE_WORKERS,
+        max_queue: int = TRANSCRIPT_QUEUE_SIZE,
+        merge_window: float = TRANSCRIPT_MERGE_WINDOW_SECONDS,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            workers: Number of concurrent async workers
+            max_queue: Maximum number of queued transcripts
+            merge_window: Seconds within which queued transcripts may be merged
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.merge_window = merge_window
+        self.context_manager = ContextManager()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._items = deque()
+        self._available: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.counters = {
+            "submitted": 0,
+            "skipped": 0,
+            "merged": 0,
+            "dropped": 0,
+            "processed": 0,
+            "errors": 0,
+        }
+        # Counters are updated on the loop; this guards the one update made off it
+        self._counters_lock = threading.Lock()
+        self.max_depth = 0
+        self.in_flight = 0
+        self.latency = {
+            "queue_wait": LatencyRecorder(),
+            "intent": LatencyRecorder(),
+            "fetch": LatencyRecorder(),
+            "send": LatencyRecorder(),
+            "total": LatencyRecorder(),
+        }
+
+    def start(self) -> None:
+        """Bind the pipeline to the running loop and start the workers."""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._available = asyncio.Semaphore(0)
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info(f"Transcript pipeline started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Cancel the workers and discard anything still queued."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._items.clear()
+        self._loop = None
+        logger.info("Transcript pipeline stopped")
+
+    def submit_threadsafe(
+        self, text: str, session: Optional["CallSession"] = None
+    ) -> bool:
+        """
+        Hand a final transcript to the pipeline from any thread.
+
+        The transcript is also stored in the session's summary buffer. That
+        happens on the loop too, since the summary reads the buffer there.
+
+        Args:
+            text: The final transcript text
+            session: The call session the transcript belongs to
+
+        Returns:
+            True if the transcript was scheduled for enqueueing
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            if session is not None:
+                session.add_transcript(text)
+            logger.error("Transcript pipeline is not running, dropping transcript")
+            # No loop to hand the count to, and callers may be on several threads
+            with self._counters_lock:
+                self.counters["dropped"] += 1
+            return False
+        if session is not None:
+            loop.call_soon_threadsafe(session.add_transcript, text)
+
+        word_count = len(text.split())
+        if word_count < MIN_WORDS:
+            logger.info(
+                f"Skipping processing for short transcript ({word_count} words): '{text}'"
+            )
+            loop.call_soon_threadsafe(self._skip, session)
+            return False
+
+        loop.call_soon_threadsafe(self._enqueue, TranscriptItem(session, text))
+        return True
+
+    def observe_partial_threadsafe(self, text: str, session: "CallSession") -> None:
+        """
+        Hand an interim transcript to the session's speculative prefetcher.
+
+        Args:
+            text: The interim transcript text
+            session: The call session the transcript belongs to
+        """
+        loop = self._loop
+        if session.prefetcher is None or loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(session.prefetcher.observe, text)
+
+    def _skip(self, session: Optional["CallSession"]) -> None:
+        """Count a transcript too short to process. Loop thread only."""
+        self.counters["skipped"] += 1
+        if session is not None and session.prefetcher is not None:
+            session.prefetcher.discard()
+
+    def _enqueue(self, item: TranscriptItem) -> None:
+        """Add an item to the queue, applying the merge/drop rules. Loop thread only."""
+        self.counters["submitted"] += 1
+
+        # Claim what was prefetched while this utterance was being spoken
+        if item.session is not None and item.session.prefetcher is not None:
+            item.speculation = item.session.prefetcher.take()
+        if item.session is not None:
+            item.speculation.warmup = item.session.warmup
+
+        if len(self._items) >= self.max_queue:
+            newest = self._items[-1]
+            if (
+                newest.session is item.session
+                and item.enqueued_at - newest.updated_at <= self.merge_window
+            ):
+                newest.text = f"{newest.text} {item.text}"
+                newest.speculation.merge(item.speculation)
+                newest.updated_at = item.enqueued_at
+                self.counters["merged"] += 1
+                return
+
+            dropped = self._items.popleft()
+            dropped.speculation.cancel()
+            self.counters["dropped"] += 1
+            logger.warning(
+                f"Transcript queue full, dropping oldest transcript: '{dropped.text}'"
+            )
+            self._items.append(item)
+            return
+
+        self._items.append(item)
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._available.release()
+
+    async def _worker(self, index: int) -> None:
+        """Process queued transcripts until cancelled."""
+        while True:
+            await self._available.acquire()
+            item = self._items.popleft()
+            self.in_flight += 1
+            try:
+                await self._process(item)
+                self.counters["processed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["errors"] += 1
+                logger.error(f"Worker {index} failed to process transcript: {e}")
+            finally:
+                item.speculation.cancel()
+                self.in_flight -= 1
+
+    async def _process(self, item: TranscriptItem) -> None:
+        """Run one transcript through intent, data fetch and card delivery."""
+        self.latency["queue_wait"].record(time.perf_counter() - item.enqueued_at)
+
+        # A streamed LLM answer can start the fetch before the intent is complete
+        early = EarlyFetch(self.context_manager, item.text, item.speculation)
+        try:
+            with self.latency["intent"].time():
+                intent = await self.context_manager.analyze_intent(
+                    item.text, on_partial=early.start
+                )
+
+            with self.latency["fetch"].time():
+                result = await early.result_for(intent)
+        finally:
+            early.cancel()
+        logger.info(f"Processing result: {result}")
+
+        if result.get("status") != "skipped":
+            with self.latency["send"].time():
+                if item.session is not None:
+                    await item.session.send_card(result)
+                else:
+                    await send_card(result)
+
+        self.latency["total"].record(time.perf_counter() - item.enqueued_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report queue depth, counters and per-stage latency.
+
+        Returns:
+            Dictionary of pipeline metrics
+        """
+        return {
+            "running": bool(self._tasks),
+            "workers": self.workers,
+            "queue_depth": len(self._items),
+            "in_flight": self.in_flight,
+            "max_queue": self.max_queue,
+            "max_depth": self.max_depth,
+            "counters": dict(self.counters),
+            "latency": {
+                stage: recorder.stats() for stage, recorder in self.latency.items()
+            },
+            "speculation": speculation_stats.stats(),
+            "intent_classifier": (
+                self.context_manager.intent_classifier.stats()
+                if self.context_manager.intent_classifier is not None
+                else None
+            ),
+            "intent_cache": self.context_manager.intent_cache.stats(),
+            "early_fetch": dict(self.context_manager.early_fetch_counters),
+        }
+
+
+# Create a global instance for use across the application
+transcript_pipeline = TranscriptPipeline()
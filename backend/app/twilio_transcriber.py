@@ -1,13 +1,12 @@
 import os
-import asyncio
 import logging
-import threading
 
 import assemblyai as aai
 from dotenv import load_dotenv
-from app.services.context_manager import ContextManager
-from app.services.summary_service import summary_service
-from app.websocket_manager import send_card
+from app.services.config import VAD_ENABLED
+from app.session_registry import CallSession
+from app.transcript_pipeline import transcript_pipeline
+from app.voice_activity import VoiceActivityGate
 
 load_dotenv()
 
@@ -20,65 +19,12 @@ verbose = False
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Global context manager instance
-context_manager = ContextManager()
-
 
 def on_open(session_opened: aai.RealtimeSessionOpened):
     "Called when the connection has been established."
     logger.info(f"Session ID: {session_opened.session_id}")
 
 
-def on_data(transcript: aai.RealtimeTranscript):
-    "Called when a new transcript has been received."
-    if not transcript.text:
-        return
-
-    if isinstance(transcript, aai.RealtimeFinalTranscript):
-        logger.info(f"FINAL TRANSCRIPT: {transcript.text}")
-
-        # Store the final transcript in the summary service
-        summary_service.add_transcript(transcript.text)
-
-        # Process the final transcript using the context manager
-        result = process_final_transcript(transcript.text)
-
-        # Send to frontend - run in a new event loop since we're in a callback
-        try:
-            if result.get("status") != "skipped":
-                asyncio.run(send_card(result))
-        except RuntimeError as e:
-            # This might happen if there's already an event loop running
-            logger.error(f"Error sending card: {e}")
-            # Alternative approach using a new thread
-            if result.get("status") != "skipped":
-                threading.Thread(
-                    target=lambda: asyncio.run(send_card(result))
-                ).start()
-
-    elif verbose:
-        logger.info(f"INTERIM TRANSCRIPT: {transcript.text}")
-
-
-def process_final_transcript(text: str):
-    """Process a final transcript using the context manager."""
-    word_count = len(text.split())
-    if word_count < 3:
-        logger.info(
-            f"Skipping processing for short transcript ({word_count} words): '{text}'"
-        )
-        return {"status": "skipped", "reason": "transcript too short"}
-
-    try:
-        # Simpler way to run an async function from sync code
-        result = asyncio.run(context_manager.process_text(text))
-        logger.info(f"Processing result: {result}")
-        return result
-    except Exception as e:
-        logger.error(f"Error processing transcript: {e}")
-        return {"error": str(e)}
-
-
 def on_error(error: aai.RealtimeError):
     "Called when the connection has been closed."
     logger.error(f"An error occurred: {error}")
@@ -90,30 +36,55 @@ def on_close():
 
 
 class TwilioTranscriber(aai.RealtimeTranscriber):
-    def __init__(self):
+    def __init__(self, session: CallSession):
+        self.session = session
         super().__init__(
-            on_data=on_data,
+            on_data=self.on_data,
             on_error=on_error,
             on_open=on_open,  # optional
             on_close=on_close,  # optional
             sample_rate=TWILIO_SAMPLE_RATE,
             encoding=aai.AudioEncoding.pcm_mulaw,
         )
+        self._attach_voice_gate()
+
+    def _attach_voice_gate(self):
+        "Put a voice-activity gate in front of stream() if VAD is enabled."
+        self.voice_gate = VoiceActivityGate(self.stream) if VAD_ENABLED else None
+        self.session.voice_gate = self.voice_gate
+
+    def on_data(self, transcript: aai.RealtimeTranscript):
+        "Called when a new transcript has been received."
+        if not transcript.text:
+            return
+
+        if isinstance(transcript, aai.RealtimeFinalTranscript):
+            logger.info(f"FINAL TRANSCRIPT: {transcript.text}")
+
+            # Hand the transcript to the pipeline running on the main event loop,
+            # which also stores it in this call's summary buffer there
+            transcript_pipeline.submit_threadsafe(transcript.text, self.session)
+
+        else:
+            if verbose:
+                logger.info(f"INTERIM TRANSCRIPT: {transcript.text}")
+
+            # Warm data for tickers mentioned before the sentence is finished
+            transcript_pipeline.observe_partial_threadsafe(transcript.text, self.session)
+
+    def stream_chunk(self, chunk: memoryview):
+        "Stream a coalesced chunk of mu-law audio from the media ingest buffer."
+        if self.voice_gate:
+            self.voice_gate.process(chunk)
+        else:
+            self.stream(bytes(chunk))
+
+    async def send_start(self):
+        await self.session.send_card(
+            {"status": "start", "message": "Starting transcription..."}
+        )
 
-    def send_start(self):
-        threading.Thread(
-            target=lambda: asyncio.run(
-                send_card(
-                    {"status": "start", "message": "Starting transcription..."}
-                )
-            )
-        ).start()
-
-    def send_stop(self):
-        threading.Thread(
-            target=lambda: asyncio.run(
-                send_card(
-                    {"status": "stop", "message": "Stopping transcription..."}
-                )
-            )
-        ).start()
\ No newline at end of file
+    async def send_stop(self):
+        await self.session.send_card(
+            {"status": "stop", "message": "Stopping transcription..."}
+        )
@@ -0,0 +1,156 @@
+"""
+Voice-activity gating for 8 kHz mu-law audio.
+
+Sits between the media ingest buffer and the realtime transcriber so silence
+is not streamed to AssemblyAI. Energy is computed over 20 ms sub-frames with a
+precomputed mu-law -> linear power lookup table. A hangover keeps audio
+flowing briefly after speech ends, a pre-roll buffer replays the audio just
+before speech starts so word onsets are not clipped, and a silent keep-alive
+chunk is sent only when nothing else has been sent for a while.
+"""
+import logging
+import math
+from collections import deque
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+from app.services.config import (
+    MEDIA_CHUNK_MS,
+    VAD_THRESHOLD_DBFS,
+    VAD_HANGOVER_MS,
+    VAD_PREROLL_MS,
+    VAD_KEEPALIVE_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_PER_MS = 8
+SUBFRAME_SAMPLES = 20 * SAMPLES_PER_MS
+MULAW_SILENCE = 0xFF
+FULL_SCALE = 32768.0
+
+
+def _build_mulaw_table() -> np.ndarray:
+    """Decode every mu-law byte value to 16-bit linear PCM (ITU-T G.711)."""
+    inverted = ~np.arange(256, dtype=np.uint8)
+    sign = inverted & 0x80
+    exponent = (inverted >> 4).astype(np.int32) & 0x07
+    mantissa = inverted.astype(np.int32) & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(sign, -magnitude, magnitude).astype(np.int16)
+
+
+MULAW_TO_LINEAR = _build_mulaw_table()
+MULAW_TO_POWER = MULAW_TO_LINEAR.astype(np.float64) ** 2
+
+
+def frame_energy_dbfs(chunk) -> np.ndarray:
+    """
+    Compute the energy of each 20 ms sub-frame of a mu-law chunk.
+
+    Args:
+        chunk: Bytes-like mu-law audio
+
+    Returns:
+        Array of sub-frame energies in dBFS
+    """
+    samples = np.frombuffer(chunk, dtype=np.uint8)
+    usable = len(samples) - len(samples) % SUBFRAME_SAMPLES
+    if usable:
+        power = MULAW_TO_POWER[samples[:usable]].reshape(-1, SUBFRAME_SAMPLES)
+        mean_power = power.mean(axis=1)
+    else:
+        mean_power = MULAW_TO_POWER[samples].mean(keepdims=True)
+    return 10.0 * np.log10(mean_power / (FULL_SCALE * FULL_SCALE) + 1e-12)
+
+
+class VoiceActivityGate:
+    """
+    Forwards speech chunks to a sink and suppresses silence.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[bytes], None],
+        threshold_dbfs: float = VAD_THRESHOLD_DBFS,
+        hangover_ms: int = VAD_HANGOVER_MS,
+        preroll_ms: int = VAD_PREROLL_MS,
+        keepalive_ms: int = VAD_KEEPALIVE_MS,
+        chunk_ms: int = MEDIA_CHUNK_MS,
+    ):
+        """
+        Initialize the gate.
+
+        Args:
+            sink: Called with every chunk that should reach the transcriber
+            threshold_dbfs: Sub-frame energy above which a chunk counts as speech
+            hangover_ms: Audio still forwarded after the last speech chunk
+            preroll_ms: Audio replayed from before the first speech chunk
+            keepalive_ms: Longest stretch without sending before a silent chunk goes out
+            chunk_ms: Nominal duration of incoming chunks
+        """
+        self.sink = sink
+        self.threshold_dbfs = threshold_dbfs
+        self.hangover_chunks = math.ceil(hangover_ms / chunk_ms)
+        self.keepalive_ms = keepalive_ms
+        self._preroll = deque(maxlen=math.ceil(preroll_ms / chunk_ms))
+        self._hangover = 0
+        self._since_sent_ms = 0.0
+        self._silence = bytes([MULAW_SILENCE]) * (chunk_ms * SAMPLES_PER_MS)
+
+        self.total_ms = 0.0
+        self.sent_ms = 0.0
+        self.keepalive_chunks = 0
+        self.speech_onsets = 0
+
+    def process(self, chunk) -> None:
+        """
+        Gate one chunk of mu-law audio.
+
+        Args:
+            chunk: Bytes-like mu-law audio, only valid for the duration of the call
+        """
+        duration_ms = len(chunk) / SAMPLES_PER_MS
+        self.total_ms += duration_ms
+
+        if frame_energy_dbfs(chunk).max() >= self.threshold_dbfs:
+            if self._hangover == 0:
+                self.speech_onsets += 1
+                while self._preroll:
+                    self._send(self._preroll.popleft())
+            self._hangover = self.hangover_chunks
+            self._send(bytes(chunk))
+            return
+
+        if self._hangover > 0:
+            self._hangover -= 1
+            self._send(bytes(chunk))
+            return
+
+        # Silence: hold it for pre-roll and only send a keep-alive when due
+        self._preroll.append(bytes(chunk))
+        self._since_sent_ms += duration_ms
+        if self._since_sent_ms >= self.keepalive_ms:
+            self.keepalive_chunks += 1
+            self.sink(self._silence)
+            self._since_sent_ms = 0.0
+
+    def _send(self, data: bytes) -> None:
+        self.sent_ms += len(data) / SAMPLES_PER_MS
+        self._since_sent_ms = 0.0
+        self.sink(data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Report how much of the session's audio was suppressed."""
+        suppressed_ms = max(self.total_ms - self.sent_ms, 0.0)
+        return {
+            "audio_ms": round(self.total_ms),
+            "sent_ms": round(self.sent_ms),
+            "suppressed_ms": round(suppressed_ms),
+            "suppressed_fraction": round(suppressed_ms / self.total_ms, 4)
+            if self.total_ms
+            else 0.0,
+            "keepalive_chunks": self.keepalive_chunks,
+            "speech_onsets": self.speech_onsets,
+        }
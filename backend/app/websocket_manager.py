@@ -1,5 +1,9 @@
 import asyncio
+import json
 import logging
+from typing import Dict, Optional
+
+from app.services.price_feed import price_feed
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -7,34 +11,72 @@ logger = logging.getLogger(__name__)
 # Store active WebSocket connections
 active_connections = []
 
-async def connect(websocket):
-    """Register a new WebSocket connection"""
+# Session each connection is scoped to (None receives every session's cards)
+connection_sessions: Dict[int, Optional[str]] = {}
+
+async def connect(websocket, session_id: Optional[str] = None):
+    """Register a new WebSocket connection, optionally scoped to one call session"""
     await websocket.accept()
     active_connections.append(websocket)
+    connection_sessions[id(websocket)] = session_id
     logger.info(f"New WebSocket connection. Total connections: {len(active_connections)}")
     return websocket
 
 def disconnect(websocket):
-    """Unregister a WebSocket connection"""
+    """Unregister a WebSocket connection and drop its price subscriptions"""
+    price_feed.remove(websocket)
     if websocket in active_connections:
         active_connections.remove(websocket)
+        connection_sessions.pop(id(websocket), None)
         logger.info(f"WebSocket disconnected. Remaining connections: {len(active_connections)}")
 
-async def send_card(content):
-    """Send a card to all connected clients"""
+async def send_card(content, session_id: Optional[str] = None):
+    """Send a card to all connected clients watching the given session"""
     if not active_connections:
         logger.warning("No active connections to send card to")
         return False
-    
-    logger.info(f"Sending card to {len(active_connections)} connections")
-    
+
+    targets = [
+        connection for connection in active_connections
+        if connection_sessions.get(id(connection)) in (None, session_id)
+    ]
+    logger.info(f"Sending card to {len(targets)} connections")
+
     # Send to all connected clients
-    for connection in active_connections:
+    for connection in targets:
         try:
             # Use create_task to avoid blocking
             asyncio.create_task(connection.send_json(content))
         except Exception as e:
             logger.error(f"Error sending to WebSocket: {e}")
             # Don't remove here to avoid modifying the list during iteration
-    
-    return True 
\ No newline at end of file
+
+    return True
+
+async def handle_message(websocket, text: str):
+    """
+    Handle a message from a dashboard client.
+
+    Clients subscribe to live prices for the tickers on their cards with
+    {"action": "subscribe", "tickers": [...]} and stop with "unsubscribe".
+    """
+    try:
+        message = json.loads(text)
+        action, tickers = message.get("action"), message.get("tickers") or []
+        if isinstance(tickers, str):
+            tickers = [tickers]
+    except (ValueError, AttributeError):
+        await websocket.send_json({"type": "error", "error": "Messages must be JSON objects"})
+        return
+    if not isinstance(tickers, list) or not all(isinstance(ticker, str) for ticker in tickers):
+        await websocket.send_json({"type": "error", "error": "tickers must be a list of ticker symbols"})
+        return
+
+    if action == "subscribe":
+        subscribed = price_feed.subscribe(websocket, tickers)
+        await websocket.send_json({"type": "subscribed", "tickers": subscribed})
+    elif action == "unsubscribe":
+        price_feed.unsubscribe(websocket, tickers)
+        await websocket.send_json({"type": "unsubscribed", "tickers": [str(ticker).upper() for ticker in tickers]})
+    else:
+        await websocket.send_json({"type": "error", "error": f"Unknown action: {action}"})
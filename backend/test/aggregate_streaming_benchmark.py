@@ -0,0 +1,130 @@
+"""
+Benchmark for streamed Polygon aggregate pagination.
+
+Serves a long range of synthetic minute bars from a stand-in Polygon server
+running in a separate process. The server pages them with next_url and writes
+each page in chunks. The benchmark fetches the whole range in two ways and
+reports, for each, the time to the first bars, the total time, and the peak
+Python memory of the client:
+
+- buffered: StockService._fetch_aggregates, which decodes each page whole
+  and collects every bar before returning
+- streamed: StockService._stream_aggregates, which parses pages as they
+  download and hands over bars batch by batch (counted and dropped here, as
+  the NDJSON chart route does)
+
+Run from the backend directory:
+    python test/aggregate_streaming_benchmark.py --days 250 --page 50000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("POLYGON_API_KEYS", "benchmark-key")
+os.environ.setdefault("POLYGON_QUOTA_BACKEND", "memory")
+
+from aiohttp import web  # noqa: E402
+
+from app.services.bar_store import BarKey  # noqa: E402
+from app.services.http_client import http_client  # noqa: E402
+from app.services.stock_service import StockService  # noqa: E402
+
+PORT = 8119
+START_MS = 1_700_000_000_000
+
+
+def serve(bars, page_size, ready):
+    async def aggregates(request):
+        cursor = int(request.query.get("cursor", 0))
+        page = range(cursor, min(cursor + page_size, bars))
+        response = web.StreamResponse()
+        response.content_type = "application/json"
+        await response.prepare(request)
+        await response.write(b'{"ticker":"TEST","queryCount":%d,"results":[' % len(page))
+        for offset in range(page.start, page.stop, 2000):
+            rows = [
+                json.dumps({"t": START_MS + i * 60_000, "o": 100.0, "h": 101.0, "l": 99.0,
+                            "c": 100.5, "v": 1200.0, "vw": 100.2, "n": 15})
+                for i in range(offset, min(offset + 2000, page.stop))
+            ]
+            await response.write((("," if offset > page.start else "") + ",".join(rows)).encode())
+        tail = {"status": "OK", "resultsCount": len(page)}
+        if page.stop < bars:
+            tail["next_url"] = f"http://127.0.0.1:{PORT}{request.path}?cursor={page.stop}"
+        await response.write(b"]," + json.dumps(tail)[1:].encode())
+        await response.write_eof()
+        return response
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start}/{end}", aggregates)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", PORT).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+async def buffered(service, key):
+    started = time.perf_counter()
+    results = await service._fetch_aggregates(key, "2023-11-14", "2024-11-14")
+    elapsed = time.perf_counter() - started
+    return len(results), elapsed, elapsed
+
+
+async def streamed(service, key):
+    started = time.perf_counter()
+    first, count = None, 0
+    async for bars in service._stream_aggregates(key, "2023-11-14", "2024-11-14"):
+        if first is None:
+            first = time.perf_counter() - started
+        count += len(bars)
+    return count, first, time.perf_counter() - started
+
+
+async def run(bars):
+    service = StockService()
+    service.base_url = f"http://127.0.0.1:{PORT}"
+    key = BarKey("TEST", 1, "minute", True)
+    await http_client.start()
+    for name, method in (("buffered", buffered), ("streamed", streamed)):
+        tracemalloc.start()
+        count, first, total = await method(service, key)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(
+            f"{name:<9} bars={count:<7} first bars={first * 1000:8.1f} ms  "
+            f"total={total * 1000:8.1f} ms  peak memory={peak / 1e6:7.1f} MB"
+        )
+        assert count == bars
+    await http_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streamed Polygon aggregate pagination")
+    parser.add_argument("--days", type=int, default=250, help="Trading days of minute bars")
+    parser.add_argument("--page", type=int, default=50000, help="Bars per Polygon page")
+    args = parser.parse_args()
+    bars = args.days * 390
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(bars, args.page, ready), daemon=True)
+    server.start()
+    ready.wait(10)
+    print(f"{bars} minute bars ({args.days} trading days), pages of {args.page}")
+    try:
+        asyncio.run(run(bars))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark for server-side chart downsampling.
+
+Builds weeks of synthetic minute bars and measures, for every bar and for
+each downsampling method: the time to select points, the time to build and
+serialize the StockChartData response as the /stocks/chart route does, and
+the JSON payload size. For LTTB it also reports how far the chosen points
+stray from the full series (largest gap between the full close and the
+line through the chosen points) and whether the minmax points keep the
+exact high and low.
+
+Run from the backend directory:
+    python test/chart_downsampling_benchmark.py --days 20 --max-points 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.schemas.stock import StockChartData  # noqa: E402
+from app.services.bar_analytics import results_from_columns  # noqa: E402
+from app.services.downsampling import downsample  # noqa: E402
+
+BARS_PER_DAY = 390
+
+
+def synthetic_columns(days, seed=5):
+    rng = np.random.default_rng(seed)
+    count = days * BARS_PER_DAY
+    close = 150 * np.exp(np.cumsum(rng.normal(0, 0.0008, count)))
+    return {
+        "t": 1_700_000_000_000 + np.arange(count, dtype=np.int64) * 60_000,
+        "o": np.concatenate([[150.0], close[:-1]]),
+        "h": close * 1.0005,
+        "l": close * 0.9995,
+        "c": close,
+        "v": rng.integers(100, 50_000, count).astype(float),
+    }
+
+
+def serialize(columns):
+    points = [
+        {
+            "timestamp": bar["t"],
+            "open": bar["o"],
+            "high": bar["h"],
+            "low": bar["l"],
+            "close": bar["c"],
+            "volume": bar["v"],
+        }
+        for bar in results_from_columns(columns)
+    ]
+    return StockChartData(
+        ticker="TEST", timespan="minute", from_date="2024-01-01", to_date="2024-02-01", data=points
+    ).model_dump_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chart downsampling")
+    parser.add_argument("--days", type=int, default=20, help="Trading days of minute bars")
+    parser.add_argument("--max-points", type=int, default=500)
+    args = parser.parse_args()
+
+    columns = synthetic_columns(args.days)
+    print(f"{len(columns['t'])} minute bars ({args.days} trading days), max_points={args.max_points}")
+
+    for method in (None, "lttb", "minmax"):
+        started = time.perf_counter()
+        shown = columns if method is None else downsample(columns, args.max_points, method)
+        select_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        payload = serialize(shown)
+        serialize_ms = (time.perf_counter() - started) * 1000
+
+        note = ""
+        if method == "lttb":
+            line = np.interp(columns["t"], shown["t"], shown["c"])
+            note = f"max deviation {np.abs(line - columns['c']).max() / columns['c'].mean() * 100:.2f}%"
+        elif method == "minmax":
+            kept = shown["c"].max() == columns["c"].max() and shown["c"].min() == columns["c"].min()
+            note = f"extremes kept: {kept}"
+        print(
+            f"{method or 'none':<7} points={len(shown['t']):<6} select={select_ms:7.2f} ms  "
+            f"serialize={serialize_ms:8.2f} ms  payload={len(payload) / 1024:8.1f} KiB  {note}"
+        )
+
+
+if __name__ == "__main__":
+    main()
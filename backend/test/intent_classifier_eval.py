@@ -0,0 +1,125 @@
+"""
+Offline evaluation of the local intent classifier.
+
+Runs every utterance of a labelled corpus through the local classifier and
+reports, per path, how many utterances took it, how accurate it was and how
+long it took. Utterances below the confidence threshold would fall through to
+the LLM; with --llm they are also sent to the LLM so the accuracy and latency
+of the combined router can be compared with the LLM on its own.
+
+Run from the backend directory:
+    python test/intent_classifier_eval.py
+    OPENROUTER_API_KEY=... python test/intent_classifier_eval.py --llm
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("OPENROUTER_API_KEY", "unset")
+
+from app.services.config import INTENT_FAST_PATH_MIN_CONFIDENCE  # noqa: E402
+from app.services.intent_classifier import IntentClassifier  # noqa: E402
+from app.services.metrics import LatencyRecorder  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "intent_corpus.jsonl")
+
+
+def load_corpus(path):
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def is_correct(intent, example):
+    """An intent is correct if its type matches and, for stocks, so does the ticker."""
+    intent_type = intent.get("intent_type") or "unknown"
+    if intent_type != example["intent"]:
+        return False
+    if intent_type == "stock_analysis":
+        ticker = (intent.get("parameters") or {}).get("ticker") or ""
+        return ticker.upper() == example["ticker"]
+    return True
+
+
+def summarize(name, results, recorder):
+    correct = sum(1 for ok in results if ok)
+    accuracy = f"{correct / len(results):.1%}" if results else "n/a"
+    stats = recorder.stats()
+    print(
+        f"{name:<12} n={len(results):<4} accuracy={accuracy:<7}"
+        f" p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms max={stats['max_ms']}ms"
+    )
+
+
+async def evaluate(args):
+    corpus = load_corpus(args.corpus)
+    classifier = IntentClassifier()
+    context_manager = None
+    if args.llm:
+        from app.services.context_manager import ContextManager
+
+        context_manager = ContextManager()
+
+    local_results, local_latency = [], LatencyRecorder()
+    fallthrough_results, fallthrough_latency = [], LatencyRecorder()
+    llm_results, llm_latency = [], LatencyRecorder()
+    local_samples, fallthrough_samples = [], []
+    fallthrough = 0
+
+    for example in corpus:
+        start = time.perf_counter()
+        local = classifier.classify(example["text"])
+        local_seconds = time.perf_counter() - start
+
+        llm, llm_seconds = None, 0.0
+        if context_manager is not None:
+            start = time.perf_counter()
+            llm = await context_manager._analyze_intent(example["text"])
+            llm_seconds = time.perf_counter() - start
+            llm_latency.record(llm_seconds)
+            llm_results.append(is_correct(llm, example))
+
+        if local["confidence"] >= args.threshold:
+            local_latency.record(local_seconds)
+            local_samples.append(local_seconds)
+            ok = is_correct(local, example)
+            local_results.append(ok)
+            if not ok and args.verbose:
+                print(f"LOCAL MISS  {example['text']!r}: {local} (expected {example['intent']} {example['ticker']})")
+        else:
+            fallthrough += 1
+            if llm is not None:
+                fallthrough_latency.record(local_seconds + llm_seconds)
+                fallthrough_samples.append(local_seconds + llm_seconds)
+                fallthrough_results.append(is_correct(llm, example))
+            elif args.verbose:
+                print(f"FALLTHROUGH {example['text']!r}: {local}")
+
+    print(f"Corpus: {len(corpus)} utterances, threshold {args.threshold}")
+    print(f"Handled locally: {len(local_results)} ({len(local_results) / len(corpus):.1%}), fell through: {fallthrough}")
+    summarize("local", local_results, local_latency)
+    if context_manager is not None:
+        summarize("fallthrough", fallthrough_results, fallthrough_latency)
+        combined = local_results + fallthrough_results
+        combined_latency = LatencyRecorder()
+        for sample in local_samples + fallthrough_samples:
+            combined_latency.record(sample)
+        summarize("combined", combined, combined_latency)
+        summarize("llm only", llm_results, llm_latency)
+        await context_manager.llm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local intent classifier")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="Labelled corpus (.jsonl)")
+    parser.add_argument("--threshold", type=float, default=INTENT_FAST_PATH_MIN_CONFIDENCE)
+    parser.add_argument("--llm", action="store_true", help="Also run the LLM on every utterance")
+    parser.add_argument("--verbose", action="store_true", help="Print every misclassification")
+    asyncio.run(evaluate(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Offline check of the LLM gateway against the local stub server.
+
+Starts test/llm_stub_server.py in-process and runs three scenarios:
+  isolation  - a burst of slow summary calls followed by intent calls; intent
+               latency should stay near the stub's intent latency
+  retries    - a share of requests fail with 503 and are retried
+  deadline   - an intent call whose deadline is shorter than the stub latency
+
+Run from the backend directory:
+    python test/llm_gateway_check.py
+"""
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.llm_gateway import INTENT, SUMMARY, LLMGateway  # noqa: E402
+from llm_stub_server import create_app  # noqa: E402
+
+INTENT_PROMPT = 'Analyze the following text. The text is: "how is apple doing"'
+SUMMARY_PROMPT = "Generate a structured meeting summary from the following conversation"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _serve(app):
+    port = _free_port()
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, f"http://127.0.0.1:{port}/v1"
+
+
+async def isolation():
+    runner, base_url = await _serve(create_app(intent_latency=0.1, summary_latency=1.0))
+    gateway = LLMGateway(
+        base_url=base_url,
+        api_key="stub",
+        max_concurrency=8,
+        purpose_limits={INTENT: 6, SUMMARY: 2},
+    )
+    try:
+        summaries = [
+            asyncio.create_task(gateway.complete_json(SUMMARY, SUMMARY_PROMPT))
+            for _ in range(10)
+        ]
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        intents = await asyncio.gather(
+            *(gateway.complete_json(INTENT, INTENT_PROMPT) for _ in range(12))
+        )
+        intent_wall = time.perf_counter() - start
+        await asyncio.gather(*summaries)
+        stats = gateway.stats()
+    finally:
+        await gateway.close()
+        await runner.cleanup()
+
+    assert all(intent["parameters"]["ticker"] == "AAPL" for intent in intents)
+    return {
+        "intent_wall_seconds": round(intent_wall, 3),
+        "intent_p95_ms": stats[INTENT]["latency"]["p95_ms"],
+        "summary_p95_ms": stats[SUMMARY]["latency"]["p95_ms"],
+        "summary_queue_wait_p95_ms": stats[SUMMARY]["queue_wait"]["p95_ms"],
+        "tokens": {purpose: stats[purpose]["tokens"] for purpose in stats},
+        "intents_isolated": stats[INTENT]["latency"]["p95_ms"] < 1000,
+    }
+
+
+async def retries():
+    runner, base_url = await _serve(create_app(intent_latency=0.02, error_rate=0.3))
+    gateway = LLMGateway(base_url=base_url, api_key="stub", max_retries=3, retry_base_delay=0.05)
+    results = []
+    try:
+        for _ in range(40):
+            try:
+                await gateway.complete_json(INTENT, INTENT_PROMPT)
+                results.append(True)
+            except Exception:
+                results.append(False)
+        counters = gateway.stats()[INTENT]["counters"]
+    finally:
+        await gateway.close()
+        await runner.cleanup()
+    return {
+        "succeeded": sum(results),
+        "failed": len(results) - sum(results),
+        "retries": counters["retries"],
+        "stub_errors": runner.app["stats"]["errors"],
+    }
+
+
+async def deadline():
+    runner, base_url = await _serve(create_app(intent_latency=0.5))
+    gateway = LLMGateway(base_url=base_url, api_key="stub")
+    start = time.perf_counter()
+    try:
+        await gateway.complete_json(INTENT, INTENT_PROMPT, deadline=0.1)
+        outcome = "completed"
+    except TimeoutError:
+        outcome = "deadline_exceeded"
+    finally:
+        elapsed = time.perf_counter() - start
+        await gateway.close()
+        await runner.cleanup()
+    return {"outcome": outcome, "elapsed_ms": round(elapsed * 1000, 1)}
+
+
+async def main():
+    report = {
+        "isolation": await isolation(),
+        "retries": await retries(),
+        "deadline": await deadline(),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
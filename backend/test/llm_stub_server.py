@@ -0,0 +1,150 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+Answers POST /v1/chat/completions with canned JSON after a configurable delay,
+either in one response or streamed as server-sent events, and can fail a
+share of requests with 503 to exercise retries. Intent prompts
+get a stock_analysis/unknown intent, summary prompts a fixed meeting summary.
+
+Run the whole backend offline against it:
+    python test/llm_stub_server.py --port 8099 --summary-latency 5
+    LLM_BASE_URL=http://127.0.0.1:8099/v1 OPENROUTER_API_KEY=stub uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+from aiohttp import web
+
+TICKERS = {"apple": "AAPL", "tesla": "TSLA", "coca cola": "KO", "walmart": "WMT", "pfizer": "PFE"}
+
+
+def _intent_for(prompt):
+    match = re.search(r'The text is: "(.*?)"', prompt, re.S)
+    text = match.group(1).lower() if match else ""
+    for name, ticker in TICKERS.items():
+        if name in text:
+            return {
+                "intent_type": "stock_analysis",
+                "parameters": {"ticker": ticker},
+                "explanation": f"The user asks how {name} is doing.",
+            }
+    return {"intent_type": "unknown", "parameters": {}}
+
+
+def _summary():
+    return {
+        "meeting_summary": "Meeting Summary: stub",
+        "discussion_points": ["Portfolio review"],
+        "action_items": [],
+        "investment_goal_changes": [],
+    }
+
+
+async def _stream(request, body, content, duration):
+    """Send content as chat.completion.chunk events spread over duration seconds."""
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    pieces = [content[index:index + 4] for index in range(0, len(content), 4)]
+    for index, piece in enumerate(pieces):
+        if index:
+            await asyncio.sleep(duration / len(pieces))
+        chunk = {
+            "id": "stub-stream",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }
+        await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+
+def create_app(intent_latency=0.2, summary_latency=3.0, error_rate=0.0):
+    """
+    Build the stub application.
+
+    Args:
+        intent_latency: Seconds before answering an intent prompt
+        summary_latency: Seconds before answering a summary prompt
+        error_rate: Share of requests answered with 503
+    """
+    stats = {"requests": 0, "errors": 0, "max_concurrent": 0, "concurrent": 0}
+
+    async def completions(request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        is_summary = "meeting summary" in prompt.lower()
+
+        latency = summary_latency if is_summary else intent_latency
+        content = json.dumps(_summary() if is_summary else _intent_for(prompt))
+
+        stats["requests"] += 1
+        stats["concurrent"] += 1
+        stats["max_concurrent"] = max(stats["max_concurrent"], stats["concurrent"])
+        try:
+            if body.get("stream"):
+                # The first token arrives after a quarter of the latency
+                await asyncio.sleep(latency / 4)
+            else:
+                await asyncio.sleep(latency)
+            if random.random() < error_rate:
+                stats["errors"] += 1
+                return web.json_response({"error": {"message": "stub overloaded"}}, status=503)
+            if body.get("stream"):
+                return await _stream(request, body, content, latency * 3 / 4)
+        finally:
+            stats["concurrent"] -= 1
+
+        return web.json_response(
+            {
+                "id": f"stub-{stats['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": (len(prompt) + len(content)) // 4,
+                },
+            }
+        )
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    app.router.add_get("/stats", get_stats)
+    app["stats"] = stats
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--intent-latency", type=float, default=0.2)
+    parser.add_argument("--summary-latency", type=float, default=3.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(
+        create_app(args.intent_latency, args.summary_latency, args.error_rate),
+        host="127.0.0.1",
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
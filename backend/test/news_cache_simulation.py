@@ -0,0 +1,104 @@
+"""
+Simulation of the News API cache under dashboard and live-call traffic.
+
+Sends requests for market news and for tickers drawn from a Zipf-like
+popularity curve through a NewsCache backed by a stand-in loader with News API
+like latency. Time is scaled down: TTL, stale window and the refresh budget
+are in simulated seconds, so a day of traffic runs in a few seconds. After
+the run it reports:
+
+- how requests were served (fresh hit, stale hit, miss) and the latency of each
+- upstream requests, split between misses and background refreshes, against
+  the daily quota
+- the hot set the refresher kept warm
+
+Run from the backend directory:
+    python test/news_cache_simulation.py --requests 5000 --tickers 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.news_cache import DailyQuota, NewsCache  # noqa: E402
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    weights = [1 / (rank + 1) for rank in range(args.tickers)]
+    quota = DailyQuota(args.quota)
+    scale = args.day_seconds / (24 * 60 * 60)
+    cache = NewsCache(
+        quota,
+        ttl_seconds=300 * scale,
+        stale_seconds=6 * 60 * 60 * scale,
+        hot_tickers=10,
+        check_interval=30 * scale,
+    )
+    # The refresh interval is computed in real seconds per day; scale it too
+    cache.refresh_interval = lambda hot, interval=cache.refresh_interval: interval(hot) * scale
+    upstream = {"misses": 0, "refreshes": 0}
+
+    def loader(name):
+        async def load():
+            quota.record()
+            await asyncio.sleep(rng.uniform(0.15, 0.6) * args.latency_scale)
+            return {"status": "ok", "articles": [{"title": f"{name} headline"}]}
+        return load
+
+    cache.pin("market", "market", loader("market"))
+    cache.start()
+    latencies = []
+    gap = args.day_seconds / args.requests
+    for _ in range(args.requests):
+        if rng.random() < 0.2:
+            tag, key = None, "market"
+        else:
+            tag = key = rng.choices(tickers, weights)[0]
+        misses = cache.counters["misses"]
+        started = time.perf_counter()
+        await cache.get(key, loader(key), tag)
+        latencies.append(time.perf_counter() - started)
+        upstream["misses"] += cache.counters["misses"] - misses
+        await asyncio.sleep(gap)
+    await cache.stop()
+    upstream["refreshes"] = cache.counters["refreshes"]
+
+    stats = cache.stats()
+    latencies.sort()
+    print(f"{args.requests} requests over one simulated day, {args.tickers} tickers, quota {args.quota}/day")
+    print(
+        f"fresh hits={stats['counters']['hits']}  stale hits={stats['counters']['stale_hits']}  "
+        f"misses={stats['counters']['misses']}  hit rate={stats['hit_rate']}"
+    )
+    print(
+        f"latency p50={statistics.median(latencies) * 1e6:9.1f} us  "
+        f"p99={latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms"
+    )
+    print(
+        f"upstream requests={quota.used} (misses {upstream['misses']}, refreshes {upstream['refreshes']}, "
+        f"skipped refreshes {stats['counters']['refreshes_skipped']})"
+    )
+    print(f"hot set: {', '.join(stats['hot'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the News API cache")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--quota", type=int, default=1000, help="News API requests per day")
+    parser.add_argument("--day-seconds", type=float, default=10, help="Real seconds one simulated day takes")
+    parser.add_argument("--latency-scale", type=float, default=0.01, help="Scale of the stand-in News API latency")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Simulation of the live price feed with many dashboards.
+
+Connects simulated dashboard clients, each watching a random handful of
+tickers from a shared pool, to a PriceFeed whose quotes come from a random
+walk instead of Polygon. A share of the clients are slow and take a while to
+accept each message. After the run it reports:
+
+- the upstream requests the feed made, against what per-client polling of
+  every watched ticker at the same interval would have made
+- messages sent per client and how many updates were coalesced
+- the largest gap between a quote change and its delivery, for fast and for
+  slow clients
+
+Run from the backend directory:
+    python test/price_feed_simulation.py --clients 200 --tickers 60 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("POLYGON_API_KEYS", "simulation-key")
+os.environ.setdefault("POLYGON_QUOTA_BACKEND", "memory")
+
+from app.services.price_feed import PriceFeed  # noqa: E402
+
+
+class Quotes:
+    def __init__(self, tickers, seed):
+        self.rng = random.Random(seed)
+        self.prices = {ticker: 100.0 for ticker in tickers}
+        self.changed_at = {}
+
+    async def fetch(self, tickers):
+        await asyncio.sleep(0.02)
+        now = time.monotonic()
+        quotes = {}
+        for ticker in tickers:
+            if self.rng.random() < 0.7:
+                self.prices[ticker] = round(self.prices[ticker] * (1 + self.rng.gauss(0, 0.002)), 2)
+                self.changed_at[ticker] = now
+            price = self.prices[ticker]
+            quotes[ticker] = {"price": price, "change": round(price - 100, 2), "change_percent": round(price - 100, 2)}
+        return quotes
+
+
+class Client:
+    def __init__(self, quotes, delay):
+        self.quotes = quotes
+        self.delay = delay
+        self.messages = 0
+        self.worst_lag = 0.0
+
+    async def send_json(self, message):
+        await asyncio.sleep(self.delay)
+        now = time.monotonic()
+        self.messages += 1
+        for ticker in message["updates"]:
+            self.worst_lag = max(self.worst_lag, now - self.quotes.changed_at.get(ticker, now))
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    pool = [f"T{i:03d}" for i in range(args.tickers)]
+    quotes = Quotes(pool, args.seed)
+    feed = PriceFeed(quotes.fetch, poll_interval=args.poll, client_interval=args.client_interval)
+    clients = []
+    watched = 0
+    for i in range(args.clients):
+        client = Client(quotes, args.slow_delay if i < args.clients * args.slow_share else 0.0)
+        tickers = rng.sample(pool, rng.randint(1, args.per_client))
+        watched += len(feed.subscribe(client, tickers))
+        clients.append(client)
+
+    await asyncio.sleep(args.seconds)
+    stats = feed.stats()
+    await feed.stop()
+
+    counters = stats["counters"]
+    naive = watched * (int(args.seconds / args.poll) + 1)
+    fast = [client for client in clients if client.delay == 0]
+    slow = [client for client in clients if client.delay > 0]
+    print(f"{args.clients} clients watching {stats['tickers']} tickers ({watched} subscriptions), {args.seconds:.0f} s")
+    print(f"upstream requests: {counters['upstream_requests']} (per-client polling: {naive})")
+    print(
+        f"updates={counters['updates']}  messages={counters['messages_sent']}  "
+        f"coalesced={counters['coalesced']}  send errors={counters['send_errors']}"
+    )
+    for name, group in (("fast", fast), ("slow", slow)):
+        if group:
+            print(
+                f"{name:<4} clients={len(group):<4} messages/client={sum(c.messages for c in group) / len(group):6.1f}  "
+                f"worst lag={max(c.worst_lag for c in group) * 1000:7.1f} ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the live price feed")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--tickers", type=int, default=60, help="Size of the shared ticker pool")
+    parser.add_argument("--per-client", type=int, default=10, help="Most tickers per client")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds between upstream polls")
+    parser.add_argument("--client-interval", type=float, default=0.5, help="Least seconds between messages")
+    parser.add_argument("--slow-share", type=float, default=0.1, help="Share of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="Seconds a slow client takes per message")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
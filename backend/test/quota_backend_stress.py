@@ -0,0 +1,114 @@
+"""
+Multi-process stress test for the shared Polygon quota backends.
+
+Starts several worker processes, each with its own KeyCyclingService as
+separate uvicorn workers would have. Every worker takes keys as fast as it
+can for a few seconds and logs each grant. The parent then checks that no
+key was granted more than its bucket allows over any window, counted across
+all workers together, and reports the per-operation overhead.
+
+With the per-process memory backend each worker grants the full quota, so
+the limit is exceeded by roughly the number of workers. The file backend
+keeps every worker within one shared quota.
+
+Run from the backend directory:
+    python test/quota_backend_stress.py --workers 8 --seconds 3
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.key_cycling_service import KeyCyclingService  # noqa: E402
+
+KEYS = ["key-a", "key-b", "key-c"]
+
+
+def worker(backend_spec, path, rpm, period, seconds, start_at, results):
+    service = KeyCyclingService(KEYS, rpm, period=period, backend_spec=backend_spec, quota_path=path)
+    while time.monotonic() < start_at:
+        time.sleep(0.001)
+
+    grants, timings = [], []
+    deadline = start_at + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        key = service.get_api_key()
+        timings.append(time.perf_counter() - started)
+        if key is not None:
+            grants.append((key, time.monotonic()))
+        else:
+            time.sleep(0.0005)
+    results.put((grants, timings))
+
+
+def worst_window(timestamps, window):
+    """Most grants inside any window of the given length."""
+    timestamps.sort()
+    worst, low = 0, 0
+    for high, stamp in enumerate(timestamps):
+        while stamp - timestamps[low] > window:
+            low += 1
+        worst = max(worst, high - low + 1)
+    return worst
+
+
+def run(backend_spec, args):
+    path = os.path.join(tempfile.mkdtemp(), "quota")
+    results = multiprocessing.Queue()
+    start_at = time.monotonic() + 1.0
+    processes = [
+        multiprocessing.Process(
+            target=worker,
+            args=(backend_spec, path, args.rpm, args.period, args.seconds, start_at, results),
+        )
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    per_key = {key: [] for key in KEYS}
+    timings = []
+    for grants, worker_timings in outcomes:
+        timings.extend(worker_timings)
+        for key, stamp in grants:
+            per_key[key].append(stamp)
+
+    # A token bucket admits at most capacity + rate * window requests per window
+    allowed = args.rpm + args.rpm
+    worst = max(worst_window(stamps, args.period) for stamps in per_key.values())
+    total = sum(len(stamps) for stamps in per_key.values())
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    verdict = "OK" if worst <= allowed else "OVER LIMIT"
+    print(
+        f"{backend_spec:<7} workers={args.workers} grants={total:<5} "
+        f"worst key/window={worst} allowed={allowed} {verdict}  "
+        f"op p50={p50:.1f}us p99={p99:.1f}us ({len(timings)} ops)"
+    )
+    return worst <= allowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the Polygon quota backends across processes")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--rpm", type=int, default=20, help="Requests per window per key")
+    parser.add_argument("--period", type=float, default=1.0, help="Window length in seconds")
+    args = parser.parse_args()
+
+    run("memory", args)
+    if not run("file", args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark for the ticker resolver over a large synthetic symbol universe.
+
+Writes a synthetic Polygon reference-tickers dump (pronounceable company
+names with unique tickers), loads it together with the curated sources, and
+reports build time and per-lookup latency for exact ticker, exact name,
+prefix search and fuzzy (misspelled) lookups, plus fuzzy top-1 accuracy.
+
+Run from the backend directory:
+    python test/ticker_resolver_benchmark.py --symbols 12000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.ticker_resolver import TickerResolver  # noqa: E402
+
+CONSONANTS = "bcdfgklmnprstvz"
+VOWELS = "aeiou"
+SUFFIXES = ["Inc.", "Corp.", "Holdings Inc.", "Group plc", "Technologies Inc.", "Company"]
+
+
+def _word(rng, syllables):
+    return "".join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(syllables))
+
+
+def synthetic_universe(count, seed=7):
+    rng = random.Random(seed)
+    tickers, names, universe = set(), set(), []
+    while len(universe) < count:
+        ticker = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.choice((3, 4, 4))))
+        name = " ".join(_word(rng, rng.choice((2, 3, 4))).capitalize() for _ in range(rng.choice((1, 2))))
+        if ticker in tickers or name in names:
+            continue
+        tickers.add(ticker)
+        names.add(name)
+        universe.append(
+            {
+                "ticker": ticker,
+                "name": f"{name} {rng.choice(SUFFIXES)}",
+                "market": "stocks",
+                "locale": "us",
+                "primary_exchange": "XNAS",
+                "type": "CS",
+                "spoken": name.lower(),
+            }
+        )
+    return universe
+
+
+def misspell(rng, text):
+    """Apply one random substitution, deletion or transposition."""
+    index = rng.randrange(1, len(text) - 1)
+    operation = rng.choice(("substitute", "delete", "transpose"))
+    if operation == "substitute":
+        return text[:index] + rng.choice(VOWELS if text[index] in VOWELS else CONSONANTS) + text[index + 1:]
+    if operation == "delete":
+        return text[:index] + text[index + 1:]
+    return text[:index - 1] + text[index] + text[index - 1] + text[index + 1:]
+
+
+def timed(samples, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def report(name, samples):
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1e6
+    p95 = ordered[int(len(ordered) * 0.95)] * 1e6
+    print(f"{name:<14} n={len(ordered):<6} p50={p50:7.1f}us p95={p95:7.1f}us max={ordered[-1] * 1e6:8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ticker resolver")
+    parser.add_argument("--symbols", type=int, default=12000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    universe = synthetic_universe(args.symbols)
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "reference_tickers.json")
+        with open(path, "w") as file:
+            json.dump(universe, file)
+
+        resolver = TickerResolver(path)
+        start = time.perf_counter()
+        resolver.load()
+        build_seconds = time.perf_counter() - start
+
+    print(f"Indexed {len(resolver.entries)} symbols in {build_seconds:.2f}s")
+
+    sample = rng.sample(universe, min(args.queries, len(universe)))
+    exact_ticker, exact_name, prefix, fuzzy = [], [], [], []
+    fuzzy_correct = 0
+    for item in sample:
+        timed(exact_ticker, resolver.resolve, item["ticker"])
+        timed(exact_name, resolver.resolve, item["spoken"])
+        timed(prefix, resolver.search, item["spoken"][:3], 10)
+        match = timed(fuzzy, resolver.resolve, misspell(rng, item["spoken"]))
+        if match and match["ticker"] == item["ticker"]:
+            fuzzy_correct += 1
+
+    report("exact ticker", exact_ticker)
+    report("exact name", exact_name)
+    report("prefix search", prefix)
+    report("fuzzy resolve", fuzzy)
+    print(f"Fuzzy top-1 accuracy on one-edit misspellings: {fuzzy_correct / len(sample):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -36,12 +36,17 @@ const Index = () => {
           } else if (data.status === 'stop') {
             setIsTranscribing(false);
             
-            // Fetch summary data when transcription stops
-            fetchSummaryAndAddCard();
+            // Fetch summary data for this call when transcription stops
+            fetchSummaryAndAddCard(data.session_id);
           }
         }
 
       
+        // Live prices for the stock cards this dashboard subscribed to
+        if (data.type === 'price_update') {
+          applyPriceUpdates(data.updates);
+        }
+
         // Handle card data if available
         if (data.card) {
           addCardToInterface(data);
@@ -175,6 +180,7 @@ const Index = () => {
       counter++;
       setCards(prevCards => [newCard, ...prevCards]);
       setLastCardType('stock');
+      sendSocketMessage({ action: 'subscribe', tickers: [cardData.data.symbol] });
       console.log("stock card created with data:", newCard.stockData);
     }
     else if (cardData.card === "esg_card") {
@@ -208,8 +214,41 @@ const Index = () => {
     console.log(cardData);
   }
 
-  function fetchSummaryAndAddCard() {
-    fetch('/api/summary')
+  function sendSocketMessage(message) {
+    if (socketRef.current && socketRef.current.readyState === WebSocket.OPEN) {
+      socketRef.current.send(JSON.stringify(message));
+    }
+  }
+
+  function applyPriceUpdates(updates) {
+    setCards(prevCards =>
+      prevCards.map(card => {
+        const update = card.stockData && updates[card.stockData.symbol];
+        if (!update || update.price == null) {
+          return card;
+        }
+        // The card shows the change over its chart window; move it by the price delta
+        const stockData = card.stockData;
+        const windowOpen = stockData.price - stockData.change;
+        const change = stockData.change + (update.price - stockData.price);
+        return {
+          ...card,
+          stockData: {
+            ...stockData,
+            price: update.price,
+            change,
+            changePercent: windowOpen ? (change / windowOpen) * 100 : stockData.changePercent
+          }
+        };
+      })
+    );
+  }
+
+  function fetchSummaryAndAddCard(sessionId?: string) {
+    const summaryUrl = sessionId
+      ? `/api/summary?session_id=${encodeURIComponent(sessionId)}`
+      : '/api/summary';
+    fetch(summaryUrl)
       .then(response => {
         if (!response.ok) {
           throw new Error(`HTTP error! Status: ${response.status}`);
@@ -253,7 +292,14 @@ const Index = () => {
   };
 
   const handleCardDelete = (id: string) => {
-    setCards(prevCards => prevCards.filter(card => card.id !== id));
+    setCards(prevCards => {
+      const remaining = prevCards.filter(card => card.id !== id);
+      const symbol = prevCards.find(card => card.id === id)?.stockData?.symbol;
+      if (symbol && !remaining.some(card => card.stockData?.symbol === symbol)) {
+        sendSocketMessage({ action: 'unsubscribe', tickers: [symbol] });
+      }
+      return remaining;
+    });
   };
 
   const isEmpty = cards.length === 0;